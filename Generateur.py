@@ -1,9 +1,9 @@
 import streamlit as st
 import pandas as pd
-import time, logging, httpx
+import logging
 from datetime import datetime
-from notion_client import Client
-from notion_client.errors import RequestTimeoutError, APIResponseError
+# paginate : pagination commune (reprise des parcours interrompus, voir notion_commun)
+from notion_commun import completer_relations, client_notion_partage, paginate
 
 # ────── CONFIG LOG ──────────────────────────────────
 logging.basicConfig(level=logging.INFO,
@@ -17,10 +17,9 @@ ID_MENUS                 = st.secrets["notion_database_id_menus"]
 ID_INGREDIENTS           = st.secrets["notion_database_id_ingredients"]
 ID_INGREDIENTS_RECETTES  = st.secrets["notion_database_id_ingredients_recettes"]
 
-notion = Client(auth=NOTION_API_KEY)
+notion = client_notion_partage(NOTION_API_KEY)
 
-# ────── CONSTANTES CSV & PAGINATION ─────────────────
-BATCH_SIZE, MAX_RETRY, WAIT_S = 50, 3, 5
+# ────── CONSTANTES CSV ──────────────────────────────
 SAISON_FILTRE = "Printemps"
 
 CSV_RECETTES             = "Recettes.csv"
@@ -28,32 +27,6 @@ CSV_MENUS                = "Menus.csv"
 CSV_INGREDIENTS          = "Ingredients.csv"
 CSV_INGREDIENTS_RECETTES = "Ingredients_recettes.csv"
 
-# ────── OUTIL GÉNÉRIQUE DE PAGINATION ───────────────
-def paginate(db_id, **kwargs):
-    out, cur, retry = [], None, 0
-    while True:
-        try:
-            resp = notion.databases.query(database_id=db_id,
-                                          start_cursor=cur,
-                                          page_size=BATCH_SIZE,
-                                          **kwargs)
-            out.extend(resp["results"])
-            if not resp["has_more"]:
-                break
-            cur = resp["next_cursor"]
-            time.sleep(0.3)
-            retry = 0
-        except (RequestTimeoutError, httpx.TimeoutException, httpx.ReadTimeout):
-            retry += 1
-            if retry > MAX_RETRY:
-                st.error("Timeout répété – arrêt.")
-                break
-            time.sleep(WAIT_S * retry)
-        except APIResponseError as e:
-            st.error(f"Erreur API : {e}")
-            break
-    return out
-
 # ────── EXTRACTION : RECETTES ───────────────────────
 HDR_RECETTES = ["Page_ID","Nom","ID_Recette","Saison",
                 "Calories","Proteines","Temps_total",
@@ -99,8 +72,9 @@ def extract_recettes():
 HDR_MENUS = ["Nom Menu","Recette","Date"]
 def extract_menus():
     rows=[]
-    for p in paginate(ID_MENUS,
-            filter={"property":"Recette","relation":{"is_not_empty":True}}):
+    pages = paginate(ID_MENUS,
+            filter={"property":"Recette","relation":{"is_not_empty":True}})
+    for p in completer_relations(pages, "Recette", client=notion):
         pr = p["properties"]
         nom = "".join(t["plain_text"] for t in pr["Nom Menu"]["title"])
         rec_ids=[]
@@ -118,7 +92,7 @@ def extract_menus():
     return pd.DataFrame(rows,columns=HDR_MENUS)
 
 # ────── EXTRACTION : INGRÉDIENTS ─────────────────────
-HDR_INGR = ["Page_ID","Nom","Type de stock","unité","Qte reste"]
+HDR_INGR = ["Page_ID","Nom","Type de stock","unité","Qte reste","Intervalle"]
 def extract_ingredients():
     rows=[]
     for p in paginate(ID_INGREDIENTS,
@@ -143,7 +117,8 @@ def extract_ingredients():
             "".join(t["plain_text"] for t in pr["Nom"]["title"]),
             (pr["Type de stock"]["select"] or {}).get("name",""),
             unite,
-            str(qte or "")
+            str(qte or ""),
+            str((pr.get("Intervalle") or {}).get("number") or "")
         ])
     return pd.DataFrame(rows,columns=HDR_INGR)
 
@@ -151,8 +126,9 @@ def extract_ingredients():
 HDR_IR = ["Page_ID","Qté/pers_s","Ingrédient ok","Type de stock f"]
 def extract_ingr_rec():
     rows=[]
-    for p in paginate(ID_INGREDIENTS_RECETTES,
-            filter={"property":"Type de stock f","formula":{"string":{"equals":"Autre type"}}}):
+    pages = paginate(ID_INGREDIENTS_RECETTES,
+            filter={"property":"Type de stock f","formula":{"string":{"equals":"Autre type"}}})
+    for p in completer_relations(pages, "Ingrédient ok", client=notion):
         pr=p["properties"]
         parent = pr.get("Elément parent",{})
         pid = ""
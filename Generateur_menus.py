@@ -1,14 +1,27 @@
 import streamlit as st
 import pandas as pd
-import random
+import os
+import copy
+import json
+import hashlib
+import importlib.util
+import threading
+import weakref
 import logging
+import numpy as np
+from functools import lru_cache, cached_property
+from itertools import accumulate
+from bisect import bisect_right
+from collections import defaultdict, deque, OrderedDict
+from contextlib import contextmanager, suppress
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-import time, httpx
-from notion_client import Client
-from notion_client.errors import RequestTimeoutError, APIResponseError
+import time
 
 # ────── CONFIGURATION INITIALE ──────────────────────────────────
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
+# La configuration du logging est faite au lancement de l'application (voir
+# fin de fichier) : importer le module ne touche pas au logging global.
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
 logger = logging.getLogger(__name__)
 
 # Constantes par défaut (seront remplacées par les paramètres de l'utilisateur)
@@ -26,29 +39,62 @@ COLONNE_ID_INGREDIENT = "Page_ID"
 COLONNE_AIME_PAS_PRINCIP = "Aime_pas_princip"
 
 # ────── AJOUT DES DÉPENDANCES NOTION ───────────────────────────
-NOTION_API_KEY = st.secrets["notion_api_key"]
-ID_RECETTES = st.secrets["notion_database_id_recettes"]
-ID_MENUS = st.secrets["notion_database_id_menus"]
-ID_INGREDIENTS = st.secrets["notion_database_id_ingredients"]
-ID_INGREDIENTS_RECETTES = st.secrets["notion_database_id_ingredients_recettes"]
-BATCH_SIZE, MAX_RETRY, WAIT_S = 50, 3, 5
-notion = Client(auth=NOTION_API_KEY)
-
-def choisir_recette_aleatoire_ponderee(candidats, scores):
+# Client, pagination, reprise et relations : voir notion_commun.py (partagé
+# avec l'export Generateur.py).
+from notion_commun import (
+    CLE_ID_RECETTES, CLE_ID_MENUS, CLE_ID_INGREDIENTS, CLE_ID_INGREDIENTS_RECETTES,
+    secret_notion, get_notion_client, paginate, partitions_date_creation, completer_relations,
+)
+PARTITIONS_INGR_REC = 4
+
+_RNG_DEFAUT = np.random.default_rng()
+
+class EchantillonneurPondere:
+    """
+    Tirages répétés dans un même ensemble de candidats, avec une probabilité
+    proportionnelle au score (poids cumulés + recherche dichotomique ; les
+    tirages multiples passent par NumPy searchsorted).
+    - candidats : liste d'IDs recette
+    - scores : dict {id_recette: score} (scores négatifs ramenés à 0)
+    - rng : np.random.Generator ou graine entière (None : générateur du module)
+    """
+    def __init__(self, candidats, scores, rng=None):
+        self.candidats = list(candidats)
+        self.rng = _RNG_DEFAUT if rng is None else np.random.default_rng(rng)
+        self.cumul = list(accumulate(max(scores.get(r, 0), 0) for r in self.candidats))
+        if not self.cumul or self.cumul[-1] <= 0:
+            # Si tous les scores sont 0, on choisit totalement au hasard
+            self.cumul = None
+        self._cumul_np = None
+
+    def tirer(self):
+        if not self.candidats:
+            return None
+        if self.cumul is None:
+            return self.candidats[self.rng.integers(len(self.candidats))]
+        total = self.cumul[-1]
+        return self.candidats[min(bisect_right(self.cumul, self.rng.random() * total), len(self.candidats) - 1)]
+
+    def tirer_plusieurs(self, n):
+        """n tirages indépendants (avec remise) en un seul appel vectorisé."""
+        if not self.candidats:
+            return []
+        if self.cumul is None:
+            indices = self.rng.integers(len(self.candidats), size=n)
+        else:
+            if self._cumul_np is None:
+                self._cumul_np = np.asarray(self.cumul)
+            indices = np.searchsorted(self._cumul_np, self.rng.random(n) * self._cumul_np[-1], side="right")
+            indices = np.minimum(indices, len(self.candidats) - 1)
+        return [self.candidats[i] for i in indices]
+
+def choisir_recette_aleatoire_ponderee(candidats, scores, rng=None):
     """
     Choisit une recette dans la liste 'candidats' avec une probabilité proportionnelle à son score.
     - candidats : liste d'IDs recette
     - scores : dict {id_recette: score}
     """
-    if not candidats:
-        return None
-    poids = [max(scores.get(r, 0), 0) for r in candidats]  # On force score >= 0
-    somme_poids = sum(poids)
-    if somme_poids == 0:
-        # Si tous les scores sont 0, on choisit totalement au hasard
-        return random.choice(candidats)
-    # Sélection pondérée selon les scores
-    return random.choices(candidats, weights=poids, k=1)[0]
+    return EchantillonneurPondere(candidats, scores, rng).tirer()
 
 
 # ────── FONCTION POUR DÉTERMINER LA SAISON ACTUELLE ────────────────
@@ -67,31 +113,54 @@ def get_current_season():
     else:
         return "Hiver"
 
-# ────── AJOUT DES FONCTIONS D'EXTRACTION NOTION ─────────────────
-def paginate(db_id, **kwargs):
-    out, cur, retry = [], None, 0
-    while True:
+# ────── DIAGNOSTICS (CHRONOMÈTRES ET COMPTEURS) ──────────────────
+PHASE_CHARGEMENT = "Chargement Notion"
+PHASE_INDEX = "Construction des index"
+PHASE_FILTRAGE = "Filtrage des candidats"
+PHASE_SCORING = "Scoring"
+PHASE_STOCK = "Décrémentation du stock"
+PHASE_COURSES = "Liste de courses"
+PHASE_ENVOI = "Envoi Notion"
+COMPTEUR_EXAMINES = "Candidats examinés"
+
+class Diagnostics:
+    """Durées cumulées par phase et compteurs d'une génération, affichés dans le panneau « Diagnostics »."""
+    def __init__(self):
+        self.durees = defaultdict(float)
+        self.appels = defaultdict(int)
+        self.compteurs = defaultdict(int)
+
+    @contextmanager
+    def phase(self, nom):
+        debut = time.perf_counter()
         try:
-            resp = notion.databases.query(database_id=db_id,
-                                          start_cursor=cur,
-                                          page_size=BATCH_SIZE,
-                                          **kwargs)
-            out.extend(resp["results"])
-            if not resp["has_more"]:
-                break
-            cur = resp["next_cursor"]
-            time.sleep(0.3)
-            retry = 0
-        except (RequestTimeoutError, httpx.TimeoutException, httpx.ReadTimeout):
-            retry += 1
-            if retry > MAX_RETRY:
-                st.error("Timeout répété – arrêt.")
-                break
-            time.sleep(WAIT_S * retry)
-        except APIResponseError as e:
-            st.error(f"Erreur API : {e}")
-            break
-    return out
+            yield
+        finally:
+            self.durees[nom] += time.perf_counter() - debut
+            self.appels[nom] += 1
+
+    def compter(self, nom, n=1):
+        self.compteurs[nom] += n
+
+    def compter_filtre(self, raison):
+        self.compteurs[f"Filtrés : {raison}"] += 1
+
+    def tableau_phases(self):
+        return pd.DataFrame(
+            [(nom, round(duree * 1000, 1), self.appels[nom]) for nom, duree in self.durees.items()],
+            columns=["Phase", "Durée (ms)", "Appels"]
+        )
+
+    def tableau_compteurs(self):
+        return pd.DataFrame(sorted(self.compteurs.items()), columns=["Compteur", "Valeur"])
+
+class _Differe:
+    """Valeur de log calculée seulement si le message est réellement émis."""
+    __slots__ = ("fonction", "argument")
+    def __init__(self, fonction, argument):
+        self.fonction, self.argument = fonction, argument
+    def __str__(self):
+        return str(self.fonction(self.argument))
 
 HDR_RECETTES = ["Page_ID","Nom","ID_Recette","Saison",
                 "Calories","Proteines","Temps_total",
@@ -103,6 +172,7 @@ MAP_REC = {
     "Temps_total":("Temps_total","form"), "Aime_pas_princip":("Aime_pas_princip","rollstr"),
     "Type_plat":("Type_plat","ms"), "Transportable":("Transportable","selcb")
 }
+PROPS_RECETTES = [key for key, _ in MAP_REC.values()]
 
 def prop_val(p,k):
     if not p: return ""
@@ -110,11 +180,11 @@ def prop_val(p,k):
     if k=="title":   return "".join(x["plain_text"] for x in p["title"])
     if k=="uid":     u=p["unique_id"]; pr,nu=u.get("prefix"),u.get("number"); return f"{pr}-{nu}" if pr else str(nu or "")
     if k=="ms":      return ", ".join(o["name"] for o in p["multi_select"])
-    if k=="roll":    return str(p["rollup"].get("number") or "")
-    if k=="form":    fo=p["formula"]; return str(fo.get("number") or fo.get("string") or "")
+    if k=="roll":    return p["rollup"].get("number")
+    if k=="form":    fo=p["formula"]; return fo.get("number") if fo.get("number") is not None else fo.get("string")
     if k=="rollstr": return ", ".join(it["formula"].get("string") or "." for it in p["rollup"]["array"])
     if k=="selcb":   return "Oui" if (t=="select" and (p["select"] or {}).get("name","").lower()=="oui") or (t=="checkbox" and p["checkbox"]) else ""
-    if k=="number":  return str(p.get("number") or "")
+    if k=="number":  return p.get("number")
     return ""
 
 def extract_recettes(saison_filtre):
@@ -129,18 +199,26 @@ def extract_recettes(saison_filtre):
             {"property":"Type_plat","multi_select":{"contains":"Soupe"}},
             {"property":"Type_plat","multi_select":{"contains":"Plat"}}]}]}
     rows=[]
-    for p in paginate(ID_RECETTES, filter=filt):
+    for p in paginate(secret_notion(CLE_ID_RECETTES), proprietes=PROPS_RECETTES, filter=filt):
         pr=p["properties"]; row=[p["id"]]
         for col in HDR_RECETTES[1:]:
             key,kind=MAP_REC[col]; row.append(prop_val(pr.get(key),kind))
         rows.append(row)
-    return pd.DataFrame(rows,columns=HDR_RECETTES)
+    return typer_recettes(pd.DataFrame(rows,columns=HDR_RECETTES))
 
 HDR_MENUS = ["Nom Menu","Recette","Date"]
-def extract_menus():
+PROPS_MENUS = ["Nom Menu","Recette","Date"]
+def extract_menus(depuis=None, avant=None):
+    """`depuis` / `avant` : bornes de date (incluse / exclue) appliquées côté Notion."""
+    filt = [{"property":"Recette","relation":{"is_not_empty":True}}]
+    if depuis is not None:
+        filt.append({"property":"Date","date":{"on_or_after":depuis.strftime("%Y-%m-%d")}})
+    if avant is not None:
+        filt.append({"property":"Date","date":{"before":avant.strftime("%Y-%m-%d")}})
     rows=[]
-    for p in paginate(ID_MENUS,
-            filter={"property":"Recette","relation":{"is_not_empty":True}}):
+    pages = paginate(secret_notion(CLE_ID_MENUS), proprietes=PROPS_MENUS,
+            filter=filt[0] if len(filt) == 1 else {"and": filt})
+    for p in completer_relations(pages, "Recette"):
         pr = p["properties"]
         nom = "".join(t["plain_text"] for t in pr["Nom Menu"]["title"])
         rec_ids=[]
@@ -154,14 +232,105 @@ def extract_menus():
         d=""
         if pr["Date"]["date"] and pr["Date"]["date"]["start"]:
             d=datetime.fromisoformat(pr["Date"]["date"]["start"].replace("Z","+00:00")).strftime("%Y-%m-%d")
-        rows.append([nom.strip(), ", ".join(rec_ids), d])
-    return pd.DataFrame(rows,columns=HDR_MENUS)
+        # Format long : une ligne par recette du menu
+        for rec_id in rec_ids:
+            rows.append([nom.strip(), rec_id, d])
+    return typer_menus(pd.DataFrame(rows,columns=HDR_MENUS))
+
+# ────── HISTORIQUE FENÊTRÉ ───────────────────────────────────────
+# La génération n'a besoin en détail que des derniers
+# max(NB_JOURS_ANTI_REPETITION, Intervalle max) jours d'historique. Pour les
+# années précédentes, il suffit d'un résumé (recette, année, semaine ISO,
+# nombre) : préférence « même semaine » et fréquence historique. Ce résumé
+# est gardé sur disque avec sa borne, un fichier par longueur de fenêtre ;
+# chaque chargement ne lit dans Notion que les menus postérieurs à cette
+# borne et y replie ceux sortis de la fenêtre. Le résumé n'est écrit
+# qu'après des parcours complets (ParcoursIncomplet interrompt le
+# chargement) : une borne n'avance jamais au-delà de menus non lus.
+# Supprimer le fichier force une reconstruction complète (menus anciens
+# modifiés dans Notion).
+DOSSIER_RESUME_HISTORIQUE = os.path.join(".cache", "historique")
+MARGE_HISTORIQUE_JOURS = 14  # planning commençant avant aujourd'hui
+HDR_RESUME_MENUS = ["Recette", "Annee", "Semaine", "Nombre"]
+
+def resumer_menus(df_menus):
+    """Historique détaillé → nombre de services par (recette, année, semaine ISO)."""
+    df = typer_menus(df_menus).dropna(subset=["Date"])
+    if df.empty:
+        return pd.DataFrame(columns=HDR_RESUME_MENUS).astype({"Annee": "int64", "Semaine": "int64", "Nombre": "int64"})
+    df = pd.DataFrame({
+        "Recette": df["Recette"].astype(str),
+        "Annee": df["Date"].dt.year.astype("int64"),
+        "Semaine": df["Date"].dt.isocalendar().week.astype("int64"),
+    })
+    return df.groupby(HDR_RESUME_MENUS[:3]).size().rename("Nombre").reset_index()
+
+def fusionner_resumes(*resumes):
+    df = pd.concat(resumes, ignore_index=True)
+    return df.groupby(HDR_RESUME_MENUS[:3], as_index=False)["Nombre"].sum()
+
+def _chemin_resume(db_id, jours_fenetre, dossier):
+    return os.path.join(dossier, f"resume_{hashlib.sha256(db_id.encode('utf-8')).hexdigest()[:16]}_{jours_fenetre}j.json")
+
+def _lire_resume(chemin):
+    try:
+        with open(chemin, encoding="utf-8") as f:
+            contenu = json.load(f)
+        return pd.Timestamp(contenu["borne"]), pd.DataFrame(contenu["lignes"], columns=HDR_RESUME_MENUS)
+    except FileNotFoundError:
+        return None, None
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Résumé d'historique illisible ({chemin}), reconstruction : {e}")
+        return None, None
+
+def _ecrire_resume(chemin, borne, df_resume):
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    temporaire = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporaire, "w", encoding="utf-8") as f:
+        json.dump({"borne": borne.strftime("%Y-%m-%d"),
+                   "lignes": df_resume[HDR_RESUME_MENUS].values.tolist()}, f)
+    os.replace(temporaire, chemin)
+
+def charger_historique_menus(jours_fenetre, dossier=DOSSIER_RESUME_HISTORIQUE, debut_planning=None):
+    """
+    Menus des `jours_fenetre` jours (+ marge) précédant le planning au format
+    de extract_menus, et résumé des menus plus anciens (voir resumer_menus).
+    La fenêtre part de la première date du planning (`debut_planning`) si
+    elle est antérieure à aujourd'hui. Une fenêtre plus ancienne que la borne
+    du résumé (planning passé) est relue entièrement sans reculer la borne.
+    """
+    reference = pd.Timestamp(datetime.now()).normalize()
+    if debut_planning is not None and not pd.isna(debut_planning):
+        reference = min(reference, pd.Timestamp(debut_planning).normalize())
+    debut = reference - timedelta(days=jours_fenetre + MARGE_HISTORIQUE_JOURS)
+    chemin = _chemin_resume(secret_notion(CLE_ID_MENUS), jours_fenetre, dossier)
+    borne, df_resume = _lire_resume(chemin)
+    avancer_borne = borne is None or borne <= debut
+    if borne is None or borne > debut:
+        df_resume = resumer_menus(extract_menus(avant=debut))
+        df_menus = extract_menus(depuis=debut)
+    else:
+        df_menus = extract_menus(depuis=borne)
+        sortis = df_menus["Date"] < debut
+        if sortis.any():
+            df_resume = fusionner_resumes(df_resume, resumer_menus(df_menus[sortis]))
+            df_menus = df_menus[~sortis].reset_index(drop=True)
+    if avancer_borne:
+        _ecrire_resume(chemin, debut, df_resume)
+    logger.info(f"Historique : {len(df_menus)} ligne(s) depuis le {debut:%d/%m/%Y}, résumé de {len(df_resume)} ligne(s).")
+    return df_menus, df_resume
+
+def jours_historique_necessaires(nb_jours_anti_repetition, df_ingredients):
+    """Profondeur d'historique détaillé utile : anti-répétition ou plus grand intervalle d'ingrédient."""
+    intervalle_max = df_ingredients["Intervalle"].max() if "Intervalle" in df_ingredients.columns else None
+    return int(max(nb_jours_anti_repetition, 0 if pd.isna(intervalle_max) else intervalle_max))
 
 # Ajout de la colonne "Intervalle" pour les ingrédients.
 HDR_INGR = ["Page_ID","Nom","Type de stock","unité","Qte reste", "Intervalle"]
+PROPS_INGR = ["Nom","Type de stock","unité","Qte reste","Intervalle"]
 def extract_ingredients():
     rows=[]
-    for p in paginate(ID_INGREDIENTS):
+    for p in paginate(secret_notion(CLE_ID_INGREDIENTS), proprietes=PROPS_INGR):
         pr=p["properties"]
         u_prop = pr.get("unité",{})
         if u_prop.get("type")=="rich_text":
@@ -171,7 +340,7 @@ def extract_ingredients():
         else:
             unite=""
         qte_prop = pr.get("Qte reste", {})
-        qte = ""
+        qte = None
         if qte_prop.get("type") == "formula":
             formula_result = qte_prop.get("formula", {})
             if formula_result.get("type") == "number":
@@ -185,16 +354,20 @@ def extract_ingredients():
             "".join(t["plain_text"] for t in pr["Nom"]["title"]),
             (pr["Type de stock"]["select"] or {}).get("name",""),
             unite,
-            str(qte or ""),
+            qte,
             intervalle
         ])
-    return pd.DataFrame(rows,columns=HDR_INGR)
+    return typer_ingredients(pd.DataFrame(rows,columns=HDR_INGR))
 
 HDR_IR = ["Page_ID","Qté/pers_s","Ingrédient ok","Type de stock f"]
+PROPS_IR = ["Elément parent","Qté/pers_s","Ingrédient ok","Type de stock f"]
 def extract_ingr_rec():
     rows=[]
-    for p in paginate(ID_INGREDIENTS_RECETTES,
-            filter={"property":"Type de stock f","formula":{"string":{"equals":"Autre type"}}}):
+    db_id = secret_notion(CLE_ID_INGREDIENTS_RECETTES)
+    filt = {"property":"Type de stock f","formula":{"string":{"equals":"Autre type"}}}
+    pages = paginate(db_id, proprietes=PROPS_IR, filter=filt,
+                     partitions=partitions_date_creation(db_id, PARTITIONS_INGR_REC, filt))
+    for p in completer_relations(pages, "Ingrédient ok"):
         pr=p["properties"]
         parent = pr.get("Elément parent",{})
         pid = ""
@@ -204,16 +377,78 @@ def extract_ingr_rec():
             pid = p["id"]
         qte = pr["Qté/pers_s"]["number"]
         if qte and qte>0:
-            rows.append([
-                pid,
-                str(qte),
-                ", ".join(r["id"] for r in pr["Ingrédient ok"]["relation"]),
-                pr["Type de stock f"]["formula"]["string"] or ""
-            ])
-    return pd.DataFrame(rows,columns=HDR_IR)
+            type_stock = pr["Type de stock f"]["formula"]["string"] or ""
+            # Une ligne par ingrédient lié : la table de liens est stockée « éclatée »
+            for r in pr["Ingrédient ok"]["relation"]:
+                rows.append([pid, float(qte), r["id"], type_stock])
+    return typer_ingredients_recettes(pd.DataFrame(rows,columns=HDR_IR))
 
 # ────── FIN DES FONCTIONS D'EXTRACTION ───────────────────────────
 
+# ────── TYPAGE DES DONNÉES ──────────────────────────────────────
+# Les extractions et les CSV exportés sont normalisés vers un modèle typé :
+# identifiants en 'category', quantités en float64 et table de liens éclatée
+# (un ingrédient par ligne). Les fonctions acceptent indifféremment des
+# DataFrames déjà typés ou des chaînes brutes (CSV de Generateur.py).
+def _en_categorie(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    return serie.fillna("").astype(str).str.strip().astype("category")
+
+def _en_nombre(serie):
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype("float64")
+    texte = serie.astype("string").str.strip().str.replace(",", ".", regex=False)
+    return pd.to_numeric(texte, errors="coerce").astype("float64")
+
+def typer_recettes(df):
+    df = df.copy()
+    if COLONNE_ID_RECETTE in df.columns:
+        df[COLONNE_ID_RECETTE] = _en_categorie(df[COLONNE_ID_RECETTE])
+    for col in ("Calories", "Proteines", COLONNE_TEMPS_TOTAL):
+        if col in df.columns:
+            df[col] = _en_nombre(df[col])
+    for col in (COLONNE_NOM, COLONNE_AIME_PAS_PRINCIP, "Transportable", "Saison", "Type_plat"):
+        if col in df.columns:
+            df[col] = df[col].fillna("").astype(str)
+    return df
+
+def typer_ingredients(df):
+    df = df.copy()
+    if COLONNE_ID_INGREDIENT in df.columns:
+        df[COLONNE_ID_INGREDIENT] = _en_categorie(df[COLONNE_ID_INGREDIENT])
+    if "Qte reste" in df.columns:
+        df["Qte reste"] = _en_nombre(df["Qte reste"]).fillna(0.0)
+    if "Intervalle" in df.columns:
+        df["Intervalle"] = _en_nombre(df["Intervalle"]).fillna(0.0)
+    for col in ("Type de stock", "unité"):
+        if col in df.columns:
+            df[col] = _en_categorie(df[col])
+    return df
+
+def typer_ingredients_recettes(df):
+    df = df.copy()
+    if "Ingrédient ok" in df.columns and not isinstance(df["Ingrédient ok"].dtype, pd.CategoricalDtype):
+        # Anciennes exportations : plusieurs ingrédients joints par ", " dans une même cellule
+        df["Ingrédient ok"] = df["Ingrédient ok"].fillna("").astype(str).str.split(",")
+        df = df.explode("Ingrédient ok")
+        df["Ingrédient ok"] = df["Ingrédient ok"].str.strip()
+        df = df[~df["Ingrédient ok"].str.lower().isin(["", "nan", "none"])]
+    if "Qté/pers_s" in df.columns:
+        df["Qté/pers_s"] = _en_nombre(df["Qté/pers_s"])
+        df = df[df["Qté/pers_s"].notna()]
+    for col in (COLONNE_ID_RECETTE, "Ingrédient ok", "Type de stock f"):
+        if col in df.columns:
+            df[col] = _en_categorie(df[col])
+    return df.reset_index(drop=True)
+
+@lru_cache(maxsize=256)
+def _codes_participants(participants_str_codes):
+    return frozenset(code.strip() for code in str(participants_str_codes).split(",") if code.strip())
+
+def premier_mot(nom):
+    return nom.lower().split()[0] if isinstance(nom, str) and nom.strip() else ""
+
 def verifier_colonnes(df, colonnes_attendues, nom_fichier=""):
     """Vérifie si toutes les colonnes attendues sont présentes dans le DataFrame."""
     colonnes_manquantes = [col for col in colonnes_attendues if col not in df.columns]
@@ -224,82 +459,121 @@ def verifier_colonnes(df, colonnes_attendues, nom_fichier=""):
 class RecetteManager:
     """Gère l'accès et les opérations sur les données de recettes et ingrédients."""
     def __init__(self, df_recettes, df_ingredients, df_ingredients_recettes):
-        self.df_recettes = df_recettes.copy()
+        self.df_recettes = typer_recettes(df_recettes)
         if COLONNE_ID_RECETTE in self.df_recettes.columns and not self.df_recettes.index.name == COLONNE_ID_RECETTE:
             self.df_recettes = self.df_recettes.set_index(COLONNE_ID_RECETTE, drop=False)
 
-        self.df_ingredients_initial = df_ingredients.copy()
-        self.df_ingredients_recettes = df_ingredients_recettes.copy()
+        self.df_ingredients_initial = typer_ingredients(df_ingredients)
+        self.df_ingredients_recettes = typer_ingredients_recettes(df_ingredients_recettes)
 
-        self.stock_simule = self.df_ingredients_initial.copy()
-        if "Qte reste" in self.stock_simule.columns:
-            self.stock_simule["Qte reste"] = pd.to_numeric(self.stock_simule["Qte reste"], errors='coerce').fillna(0).astype(float)
-        else:
+        if "Qte reste" not in self.df_ingredients_initial.columns:
             logger.error("'Qte reste' manquante dans df_ingredients pour stock_simule.")
-            self.stock_simule["Qte reste"] = 0.0
+            self.df_ingredients_initial["Qte reste"] = 0.0
+
+        self._construire_index()
+        self.reinitialiser_stock()
+
+    def _construire_index(self):
+        """Précalcule une fois les informations lues pour chaque candidat (dictionnaires par ID)."""
+        rec = self.df_recettes
+        self.ids_recettes = [str(r) for r in rec.index]
+        self.noms_recettes = dict(zip(self.ids_recettes, rec[COLONNE_NOM])) if COLONNE_NOM in rec.columns else {}
+        self.temps_recettes = {}
+        if COLONNE_TEMPS_TOTAL in rec.columns:
+            self.temps_recettes = {r: int(t) for r, t in zip(self.ids_recettes, rec[COLONNE_TEMPS_TOTAL]) if pd.notna(t)}
+        self.calories_recettes = {}
+        if "Calories" in rec.columns:
+            self.calories_recettes = {r: float(c) for r, c in zip(self.ids_recettes, rec["Calories"]) if pd.notna(c) and c >= 0}
+        self.recettes_transportables = set()
+        if "Transportable" in rec.columns:
+            self.recettes_transportables = {r for r, v in zip(self.ids_recettes, rec["Transportable"]) if v.strip().lower() == "oui"}
+        # Premier mot du nom (anti-répétition), interné en entier ; -1 = pas de mot-clé
+        self.mots_cles = {}
+        self.mot_cle_recettes = {}
+        for r, nom in self.noms_recettes.items():
+            mot = premier_mot(nom)
+            self.mot_cle_recettes[r] = self.mots_cles.setdefault(mot, len(self.mots_cles)) if mot and "Recette_ID_" not in nom else -1
+        self.aime_pas_recettes = {}
+        if COLONNE_AIME_PAS_PRINCIP in rec.columns:
+            self.aime_pas_recettes = {
+                r: frozenset(code.strip() for code in v.split(",") if code.strip())
+                for r, v in zip(self.ids_recettes, rec[COLONNE_AIME_PAS_PRINCIP])
+            }
 
+        ing = self.df_ingredients_initial
+        ids_ing = ing[COLONNE_ID_INGREDIENT].astype(str).tolist() if COLONNE_ID_INGREDIENT in ing.columns else []
+        # En cas de doublon d'ID, la première ligne fait foi (comme l'ancien .iloc[0])
+        self.noms_ingredients, self.unites_ingredients, self.stock_initial, self.intervalles_ingredients = {}, {}, {}, {}
+        noms = ing["Nom"] if "Nom" in ing.columns else [None] * len(ids_ing)
+        unites = ing["unité"].astype(str) if "unité" in ing.columns else [None] * len(ids_ing)
+        qtes = ing["Qte reste"]
+        intervalles = ing["Intervalle"] if "Intervalle" in ing.columns else [0.0] * len(ids_ing)
+        for ing_id, nom, unite, qte, intervalle in zip(ids_ing, noms, unites, qtes, intervalles):
+            if ing_id in self.stock_initial:
+                continue
+            self.noms_ingredients[ing_id] = nom
+            self.unites_ingredients[ing_id] = unite
+            self.stock_initial[ing_id] = float(qte)
+            self.intervalles_ingredients[ing_id] = int(intervalle) if intervalle > 0 else 0
+
+        ir = self.df_ingredients_recettes
+        self.ingredients_par_recette = {}
+        self.recettes_par_ingredient = {}
+        if not ir.empty:
+            for rec_id, ing_id, qte in zip(ir[COLONNE_ID_RECETTE].astype(str), ir["Ingrédient ok"].astype(str), ir["Qté/pers_s"]):
+                self.ingredients_par_recette.setdefault(rec_id, {})[ing_id] = float(qte)
+                self.recettes_par_ingredient.setdefault(ing_id, set()).add(rec_id)
+
+    def reassortir(self, quantites):
+        """Ajoute des quantités ({id ingrédient: qte}) au stock simulé (réassort en cours de planification)."""
+        for ing_id, qte in quantites.items():
+            ing_id = str(ing_id)
+            self.stock_simule[ing_id] = self.stock_simule.get(ing_id, 0.0) + float(qte)
+            if self._est_stock_eleve(ing_id):
+                self.anti_gaspi_ingredients[ing_id] = self.noms_ingredients.get(ing_id)
+
+    def id_mot_cle(self, nom_plat):
+        """Entier du premier mot d'un nom de plat (-1 s'il ne correspond au premier mot d'aucune recette)."""
+        return self.mots_cles.get(premier_mot(nom_plat), -1)
+
+    def copie(self, stock_overrides=None):
+        """Copie légère : index partagés (lecture seule), stock simulé propre, stock initial éventuellement corrigé."""
+        clone = copy.copy(self)
+        if stock_overrides:
+            clone.stock_initial = {**self.stock_initial, **{str(k): float(v) for k, v in stock_overrides.items()}}
+        clone.reinitialiser_stock()
+        return clone
+
+    def reinitialiser_stock(self):
+        """Remet le stock simulé à sa valeur initiale (Qte reste de Notion)."""
+        self.stock_simule = dict(self.stock_initial)
         self.anti_gaspi_ingredients = self._trouver_ingredients_stock_eleve()
 
     def get_ingredients_for_recipe(self, recette_id_str):
-        try:
-            recette_id_str = str(recette_id_str)
-            ingredients = self.df_ingredients_recettes[
-                self.df_ingredients_recettes[COLONNE_ID_RECETTE].astype(str) == recette_id_str
-            ][["Ingrédient ok", "Qté/pers_s"]].to_dict('records')
-            return ingredients
-        except Exception as e:
-            logger.error(f"Erreur récupération ingrédients pour {recette_id_str} : {e}")
-            return []
+        return [
+            {"Ingrédient ok": ing_id, "Qté/pers_s": qte}
+            for ing_id, qte in self.ingredients_par_recette.get(str(recette_id_str), {}).items()
+        ]
 
-    def _trouver_ingredients_stock_eleve(self):
+    def _est_stock_eleve(self, ing_id):
         seuil_gr = 100
         seuil_pc = 1
-        ingredients_stock = {}
-        if not all(col in self.stock_simule.columns for col in ["Qte reste", "unité", COLONNE_ID_INGREDIENT, "Nom"]):
-            logger.warning("Colonnes manquantes dans stock_simule pour _trouver_ingredients_stock_eleve.")
-            return {}
+        qte = self.stock_simule.get(ing_id, 0.0)
+        unite = str(self.unites_ingredients.get(ing_id)).lower()
+        return (unite in ["gr", "g", "ml", "cl"] and qte >= seuil_gr) or \
+               (unite in ["pc", "tranches"] and qte >= seuil_pc)
 
-        for _, row in self.stock_simule.iterrows():
-            try:
-                qte = float(str(row["Qte reste"]).replace(",", "."))
-                unite = str(row["unité"]).lower()
-                page_id = str(row[COLONNE_ID_INGREDIENT])
-                if (unite in ["gr", "g", "ml", "cl"] and qte >= seuil_gr) or \
-                   (unite in ["pc", "tranches"] and qte >= seuil_pc):
-                    ingredients_stock[page_id] = row["Nom"]
-            except (ValueError, KeyError) as e:
-                logger.debug(f"Erreur dans _trouver_ingredients_stock_eleve pour ligne {row.get('Nom', 'ID inconnu')}: {e}")
-                continue
-        return ingredients_stock
+    def _trouver_ingredients_stock_eleve(self):
+        return {ing_id: self.noms_ingredients.get(ing_id) for ing_id in self.stock_simule if self._est_stock_eleve(ing_id)}
 
     def recette_utilise_ingredient_anti_gaspi(self, recette_id_str):
-        try:
-            ingredients = self.get_ingredients_for_recipe(recette_id_str)
-            return any(str(ing.get("Ingrédient ok")) in self.anti_gaspi_ingredients for ing in ingredients if ing.get("Ingrédient ok"))
-        except Exception as e:
-            logger.error(f"Erreur dans recette_utilise_ingredient_anti_gaspi pour {recette_id_str} : {e}")
-            return False
+        return any(ing_id in self.anti_gaspi_ingredients for ing_id in self.ingredients_par_recette.get(str(recette_id_str), ()))
 
     def calculer_quantite_necessaire(self, recette_id_str, nb_personnes):
-        ingredients_necessaires = {}
-        try:
-            ingredients_recette = self.get_ingredients_for_recipe(recette_id_str)
-            if not ingredients_recette: return {}
-
-            for ing in ingredients_recette:
-                try:
-                    ing_id = str(ing.get("Ingrédient ok"))
-                    if not ing_id or ing_id.lower() in ['nan', 'none', '']: continue
-                    qte_str = str(ing.get("Qté/pers_s", "0")).replace(',', '.')
-                    qte_par_personne = float(qte_str)
-                    ingredients_necessaires[ing_id] = qte_par_personne * nb_personnes
-                except (ValueError, TypeError, KeyError) as e:
-                    logger.debug(f"Erreur calcul quantité ingrédient {ing.get('Ingrédient ok')} pour recette {recette_id_str}: {e}. Qté str: '{ing.get('Qté/pers_s')}'")
-                    continue
-            return ingredients_necessaires
-        except Exception as e:
-            logger.error(f"Erreur globale calculer_quantite_necessaire pour {recette_id_str}: {e}")
-            return {}
+        return {
+            ing_id: qte_par_personne * nb_personnes
+            for ing_id, qte_par_personne in self.ingredients_par_recette.get(str(recette_id_str), {}).items()
+        }
 
     def evaluer_disponibilite_et_manquants(self, recette_id_str, nb_personnes):
         ingredients_necessaires = self.calculer_quantite_necessaire(recette_id_str, nb_personnes)
@@ -310,18 +584,8 @@ class RecetteManager:
         score_total_dispo = 0
         ingredients_manquants = {}
 
-        for ing_id, qte_necessaire in ingredients_necessaires.items():
-            ing_id_str = str(ing_id)
-            ing_stock_df = self.stock_simule[self.stock_simule[COLONNE_ID_INGREDIENT].astype(str) == ing_id_str]
-
-            qte_en_stock = 0.0
-            if not ing_stock_df.empty:
-                try:
-                    qte_en_stock = float(ing_stock_df["Qte reste"].iloc[0])
-                except (ValueError, IndexError, KeyError) as e:
-                    logger.error(f"Erreur lecture stock pour {ing_id_str} rec {recette_id_str}: {e}")
-            else:
-                logger.debug(f"Ingrédient {ing_id_str} (recette {recette_id_str}) non trouvé dans stock_simule.")
+        for ing_id_str, qte_necessaire in ingredients_necessaires.items():
+            qte_en_stock = self.stock_simule.get(ing_id_str, 0.0)
 
             ratio_dispo = 0.0
             if qte_necessaire > 0:
@@ -335,214 +599,250 @@ class RecetteManager:
                 if quantite_manquante > 0:
                     ingredients_manquants[ing_id_str] = quantite_manquante
 
-        pourcentage_dispo = (ingredients_disponibles_compteur / total_ingredients_definis) * 100 if total_ingredients_definis > 0 else 0
-        score_moyen_dispo = score_total_dispo / total_ingredients_definis if total_ingredients_definis > 0 else 0
+        pourcentage_dispo = (ingredients_disponibles_compteur / total_ingredients_definis) * 100
+        score_moyen_dispo = score_total_dispo / total_ingredients_definis
 
-        logger.debug(f"Éval recette {recette_id_str}: Score={score_moyen_dispo:.2f}, %Dispo={pourcentage_dispo:.0f}% d'ingrédients. Manquants: {len(ingredients_manquants)}")
+        logger.debug("Éval recette %s: Score=%.2f, %%Dispo=%.0f%% d'ingrédients. Manquants: %d", recette_id_str, score_moyen_dispo, pourcentage_dispo, len(ingredients_manquants))
         return score_moyen_dispo, pourcentage_dispo, ingredients_manquants
 
     def decrementer_stock(self, recette_id_str, nb_personnes, date_repas):
         ingredients_necessaires = self.calculer_quantite_necessaire(recette_id_str, nb_personnes)
-        ingredients_consommes_ids = set()
+        ingredients_consommes = {}
 
-        for ing_id, qte_necessaire in ingredients_necessaires.items():
-            ing_id_str = str(ing_id)
-            idx_list = self.stock_simule.index[self.stock_simule[COLONNE_ID_INGREDIENT].astype(str) == ing_id_str].tolist()
-            if not idx_list:
-                logger.debug(f"Ingrédient {ing_id_str} (recette {recette_id_str}) non trouvé dans stock_simule pour décrémentation.")
+        for ing_id_str, qte_necessaire in ingredients_necessaires.items():
+            if ing_id_str not in self.stock_simule:
+                logger.debug("Ingrédient %s (recette %s) non trouvé dans stock_simule pour décrémentation.", ing_id_str, recette_id_str)
                 continue
-            idx = idx_list[0]
 
-            try:
-                qte_actuelle = float(self.stock_simule.loc[idx, "Qte reste"])
-                if qte_actuelle > 0 and qte_necessaire > 0:
-                    qte_a_consommer = min(qte_actuelle, qte_necessaire)
-                    nouvelle_qte = qte_actuelle - qte_a_consommer
-                    self.stock_simule.loc[idx, "Qte reste"] = nouvelle_qte
-
-                    if qte_a_consommer > 0:
-                        ingredients_consommes_ids.add(ing_id_str)
-                        logger.debug(f"Stock décrémenté pour {ing_id_str} (recette {recette_id_str}): {qte_actuelle:.2f} -> {nouvelle_qte:.2f} (consommé: {qte_a_consommer:.2f})")
-            except (ValueError, KeyError) as e:
-                logger.error(f"Erreur décrémentation stock pour {ing_id_str} (recette {recette_id_str}): {e}")
+            qte_actuelle = self.stock_simule[ing_id_str]
+            if qte_actuelle > 0 and qte_necessaire > 0:
+                qte_a_consommer = min(qte_actuelle, qte_necessaire)
+                nouvelle_qte = qte_actuelle - qte_a_consommer
+                self.stock_simule[ing_id_str] = nouvelle_qte
+                ingredients_consommes[ing_id_str] = qte_a_consommer
+                logger.debug("Stock décrémenté pour %s (recette %s): %.2f -> %.2f (consommé: %.2f)", ing_id_str, recette_id_str, qte_actuelle, nouvelle_qte, qte_a_consommer)
 
-        self.anti_gaspi_ingredients = self._trouver_ingredients_stock_eleve()
-        return list(ingredients_consommes_ids)
+        # Seuls les ingrédients consommés peuvent repasser sous le seuil anti-gaspi
+        for ing_id_str in ingredients_consommes:
+            if not self._est_stock_eleve(ing_id_str):
+                self.anti_gaspi_ingredients.pop(ing_id_str, None)
+        return ingredients_consommes
 
     def obtenir_nom(self, recette_page_id_str):
-        try:
-            recette_page_id_str = str(recette_page_id_str)
-            if self.df_recettes.index.name == COLONNE_ID_RECETTE:
-                return self.df_recettes.loc[recette_page_id_str, COLONNE_NOM]
-            else:
-                return self.df_recettes[self.df_recettes[COLONNE_ID_RECETTE].astype(str) == recette_page_id_str][COLONNE_NOM].iloc[0]
-        except (KeyError, IndexError):
+        recette_page_id_str = str(recette_page_id_str)
+        nom = self.noms_recettes.get(recette_page_id_str)
+        if nom is None:
             logger.warning(f"Recette ID {recette_page_id_str} non trouvé dans df_recettes (obtenir_nom).")
             return f"Recette_ID_{recette_page_id_str}"
-        except Exception as e:
-            logger.error(f"Erreur obtenir_nom pour recette ID {recette_page_id_str}: {e}")
-            return None
+        return nom
 
     def obtenir_nom_ingredient_par_id(self, ing_page_id_str):
-        try:
-            ing_page_id_str = str(ing_page_id_str)
-            nom = self.df_ingredients_initial.loc[self.df_ingredients_initial[COLONNE_ID_INGREDIENT].astype(str) == ing_page_id_str, 'Nom'].iloc[0]
-            return nom
-        except (IndexError, KeyError):
+        ing_page_id_str = str(ing_page_id_str)
+        if ing_page_id_str not in self.noms_ingredients:
             logger.warning(f"Nom introuvable pour ingrédient ID: {ing_page_id_str} dans df_ingredients_initial.")
             return f"ID_Ing_{ing_page_id_str}"
-        except Exception as e:
-            logger.error(f"Erreur obtenir_nom_ingredient_par_id pour {ing_page_id_str}: {e}")
-            return None
-    
+        return self.noms_ingredients[ing_page_id_str]
+
     def obtenir_unite_ingredient_par_id(self, ing_page_id_str):
-        try:
-            ing_page_id_str = str(ing_page_id_str)
-            unite = self.df_ingredients_initial.loc[self.df_ingredients_initial[COLONNE_ID_INGREDIENT].astype(str) == ing_page_id_str, 'unité'].iloc[0]
-            return unite
-        except (IndexError, KeyError):
+        ing_page_id_str = str(ing_page_id_str)
+        if ing_page_id_str not in self.unites_ingredients:
             logger.warning(f"Unité introuvable pour ingrédient ID: {ing_page_id_str} dans df_ingredients_initial.")
             return None
-        except Exception as e:
-            logger.error(f"Erreur obtenir_unite_ingredient_par_id pour {ing_page_id_str}: {e}")
-            return None
+        return self.unites_ingredients[ing_page_id_str]
 
     def obtenir_qte_stock_par_id(self, ing_page_id_str):
-        try:
-            ing_page_id_str = str(ing_page_id_str)
-            qte_stock = self.stock_simule.loc[self.stock_simule[COLONNE_ID_INGREDIENT].astype(str) == ing_page_id_str, 'Qte reste'].iloc[0]
-            return float(qte_stock)
-        except (IndexError, KeyError, ValueError):
-            return 0.0
-        except Exception as e:
-            logger.error(f"Erreur obtenir_qte_stock_par_id pour {ing_page_id_str}: {e}")
-            return 0.0
+        return self.stock_simule.get(str(ing_page_id_str), 0.0)
 
     def obtenir_qte_stock_initial_par_id(self, ing_page_id_str):
-        try:
-            ing_page_id_str = str(ing_page_id_str)
-            qte_stock = self.df_ingredients_initial.loc[self.df_ingredients_initial[COLONNE_ID_INGREDIENT].astype(str) == ing_page_id_str, 'Qte reste'].iloc[0]
-            return float(qte_stock)
-        except (IndexError, KeyError, ValueError):
-            return 0.0
-        except Exception as e:
-            logger.error(f"Erreur obtenir_qte_stock_initial_par_id pour {ing_page_id_str}: {e}")
-            return 0.0
+        return self.stock_initial.get(str(ing_page_id_str), 0.0)
 
     def obtenir_intervalle_ingredient_par_id(self, ing_page_id_str):
-        try:
-            ing_page_id_str = str(ing_page_id_str)
-            intervalle = self.df_ingredients_initial.loc[self.df_ingredients_initial[COLONNE_ID_INGREDIENT].astype(str) == ing_page_id_str, 'Intervalle'].iloc[0]
-            return int(intervalle) if pd.notna(intervalle) and str(intervalle).isdigit() else 0
-        except (IndexError, KeyError, ValueError):
-            logger.debug(f"Intervalle non trouvé ou non valide pour l'ingrédient {ing_page_id_str}. Retourne 0.")
-            return 0
-        except Exception as e:
-            logger.error(f"Erreur lors de l'obtention de l'intervalle pour {ing_page_id_str}: {e}")
-            return 0
+        return self.intervalles_ingredients.get(str(ing_page_id_str), 0)
 
     def est_adaptee_aux_participants(self, recette_page_id_str, participants_str_codes):
-        try:
-            recette_page_id_str = str(recette_page_id_str)
-            if self.df_recettes.index.name == COLONNE_ID_RECETTE:
-                recette_info = self.df_recettes.loc[recette_page_id_str]
-            else:
-                recette_info = self.df_recettes[self.df_recettes[COLONNE_ID_RECETTE].astype(str) == recette_page_id_str].iloc[0]
-
-            if COLONNE_AIME_PAS_PRINCIP not in recette_info or pd.isna(recette_info[COLONNE_AIME_PAS_PRINCIP]):
-                return True
-            n_aime_pas = [code.strip() for code in str(recette_info[COLONNE_AIME_PAS_PRINCIP]).split(",") if code.strip()]
-            participants_actifs = [code.strip() for code in participants_str_codes.split(",") if code.strip()]
-            
-            is_adapted = not any(code_participant in n_aime_pas for code_participant in participants_actifs)
-            if not is_adapted:
-                logger.debug(f"Recette {self.obtenir_nom(recette_page_id_str)} ({recette_page_id_str}) filtrée par participants. Participants actifs: {participants_actifs}, N'aime pas: {n_aime_pas}")
-            return is_adapted
-        except (KeyError, IndexError):
-            logger.warning(f"Recette ID {recette_page_id_str} non trouvée pour vérifier adaptation participants.")
+        recette_page_id_str = str(recette_page_id_str)
+        n_aime_pas = self.aime_pas_recettes.get(recette_page_id_str)
+        if not n_aime_pas:
             return True
-        except Exception as e:
-            logger.error(f"Erreur vérification adaptation participants pour {recette_page_id_str}: {e}")
-            return False
+        participants_actifs = _codes_participants(participants_str_codes)
+
+        is_adapted = n_aime_pas.isdisjoint(participants_actifs)
+        if not is_adapted:
+            logger.debug("Recette %s (%s) filtrée par participants. Participants actifs: %s, N'aime pas: %s", _Differe(self.obtenir_nom, recette_page_id_str), recette_page_id_str, participants_actifs, n_aime_pas)
+        return is_adapted
 
     def est_transportable(self, recette_page_id_str):
-        try:
-            recette_page_id_str = str(recette_page_id_str)
-            if self.df_recettes.index.name == COLONNE_ID_RECETTE:
-                valeur = str(self.df_recettes.loc[recette_page_id_str, "Transportable"]).strip().lower()
-            else:
-                valeur = str(self.df_recettes[self.df_recettes[COLONNE_ID_RECETTE].astype(str) == recette_page_id_str]["Transportable"].iloc[0]).strip().lower()
-            
-            is_transportable = (valeur == "oui")
-            if not is_transportable:
-                logger.debug(f"Recette {self.obtenir_nom(recette_page_id_str)} ({recette_page_id_str}) filtrée: Non transportable (valeur: '{valeur}')")
-            return is_transportable
-        except (KeyError, IndexError):
-            logger.debug(f"Recette ID {recette_page_id_str} non trouvée pour transportable.")
-            return False
-        except Exception as e:
-            logger.error(f"Erreur vérification transportable pour {recette_page_id_str}: {e}")
-            return False
+        recette_page_id_str = str(recette_page_id_str)
+        is_transportable = recette_page_id_str in self.recettes_transportables
+        if not is_transportable:
+            logger.debug("Recette %s (%s) filtrée: Non transportable", _Differe(self.obtenir_nom, recette_page_id_str), recette_page_id_str)
+        return is_transportable
 
     def obtenir_temps_preparation(self, recette_page_id_str):
-        try:
-            recette_page_id_str = str(recette_page_id_str)
-            if self.df_recettes.index.name == COLONNE_ID_RECETTE:
-                recette_info = self.df_recettes.loc[recette_page_id_str]
-            else:
-                recette_info = self.df_recettes[self.df_recettes[COLONNE_ID_RECETTE].astype(str) == recette_page_id_str].iloc[0]
-
-            if COLONNE_TEMPS_TOTAL in recette_info and pd.notna(recette_info[COLONNE_TEMPS_TOTAL]):
-                return int(recette_info[COLONNE_TEMPS_TOTAL])
-            return VALEUR_DEFAUT_TEMPS_PREPARATION
-        except (KeyError, IndexError):
-            logger.debug(f"Recette ID {recette_page_id_str} non trouvée pour temps_preparation.")
-            return VALEUR_DEFAUT_TEMPS_PREPARATION
-        except (ValueError, TypeError):
-            logger.warning(f"Temps de prép non valide pour recette {recette_page_id_str}. Valeur par défaut.")
-            return VALEUR_DEFAUT_TEMPS_PREPARATION
-        except Exception as e:
-            logger.error(f"Erreur obtention temps prép pour {recette_page_id_str}: {e}")
-            return VALEUR_DEFAUT_TEMPS_PREPARATION
-    
+        return self.temps_recettes.get(str(recette_page_id_str), VALEUR_DEFAUT_TEMPS_PREPARATION)
+
     def obtenir_calories(self, recette_page_id_str):
-        try:
-            recette_page_id_str = str(recette_page_id_str)
-            if self.df_recettes.index.name == COLONNE_ID_RECETTE:
-                calories_str = self.df_recettes.loc[recette_page_id_str, "Calories"]
-            else:
-                calories_str = self.df_recettes[self.df_recettes[COLONNE_ID_RECETTE].astype(str) == recette_page_id_str]["Calories"].iloc[0]
-            
-            return float(calories_str) if pd.notna(calories_str) and str(calories_str).replace('.', '', 1).isdigit() else 0.0
-        except (KeyError, IndexError):
-            logger.debug(f"Recette ID {recette_page_id_str} non trouvée pour Calories.")
-            return 0.0
-        except (ValueError, TypeError):
-            logger.warning(f"Calories non valides pour recette {recette_page_id_str}. Valeur par défaut.")
-            return 0.0
-        except Exception as e:
-            logger.error(f"Erreur obtention calories pour {recette_page_id_str}: {e}")
-            return 0.0
+        return self.calories_recettes.get(str(recette_page_id_str), 0.0)
+
+def typer_menus(df):
+    """Historique au format long : une ligne par (menu, recette, date)."""
+    df = df.copy()
+    if "Recette" in df.columns and not isinstance(df["Recette"].dtype, pd.CategoricalDtype):
+        # Anciennes exportations : les recettes d'un menu sont jointes par ", "
+        df["Recette"] = df["Recette"].fillna("").astype(str).str.split(",")
+        df = df.explode("Recette")
+        df["Recette"] = df["Recette"].str.strip()
+        df = df[~df["Recette"].str.lower().isin(["", "nan", "none"])]
+    if "Recette" in df.columns:
+        df["Recette"] = _en_categorie(df["Recette"])
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    return df.reset_index(drop=True)
 
 class MenusHistoryManager:
     """Gère l'accès et les opérations sur l'historique des menus."""
-    def __init__(self, df_menus_hist):
-        self.df_menus_historique = df_menus_hist.copy()
-        self.df_menus_historique["Date"] = pd.to_datetime(self.df_menus_historique["Date"], errors="coerce")
-        self.df_menus_historique.dropna(subset=["Date"], inplace=True)
+    def __init__(self, df_menus_hist, df_resume=None):
+        """`df_resume` : résumé des menus plus anciens que `df_menus_hist` (voir charger_historique_menus)."""
+        self.df_menus_historique = typer_menus(df_menus_hist)
+        self.df_resume = df_resume
+        self.dates_par_recette = {}
+        self.recettes_par_semaine = {}
         if 'Date' in self.df_menus_historique.columns:
+            self.df_menus_historique.dropna(subset=["Date"], inplace=True)
             self.df_menus_historique['Semaine'] = self.df_menus_historique['Date'].dt.isocalendar().week
-            self.recettes_historique_counts = self.df_menus_historique['Recette'].value_counts().to_dict()
+            self.recettes_historique_counts = self.df_menus_historique['Recette'].astype(str).value_counts().to_dict()
+            self._construire_index()
         else:
             logger.warning("La colonne 'Date' est manquante dans l'historique des menus, impossible de calculer la semaine.")
             self.recettes_historique_counts = {}
+        if df_resume is not None and not df_resume.empty:
+            self._integrer_resume(df_resume)
+
+    def _integrer_resume(self, df_resume):
+        """Ajoute les années résumées aux compteurs et à l'index par semaine (pas aux dates par recette)."""
+        for recette_id, nombre in df_resume.groupby("Recette")["Nombre"].sum().items():
+            recette_id = str(recette_id)
+            self.recettes_historique_counts[recette_id] = self.recettes_historique_counts.get(recette_id, 0) + int(nombre)
+        for (semaine, annee), recettes in df_resume.groupby(["Semaine", "Annee"])["Recette"]:
+            self.recettes_par_semaine.setdefault(int(semaine), {}).setdefault(int(annee), set()).update(recettes.astype(str))
+
+    def _construire_index(self):
+        """Index par recette (dates triées) et par semaine ISO (recettes par année)."""
+        df_hist = self.df_menus_historique
+        if df_hist.empty or 'Recette' not in df_hist.columns:
+            return
+        for recette_id, dates in df_hist.groupby('Recette', observed=True)['Date']:
+            self.dates_par_recette[str(recette_id)] = np.sort(dates.to_numpy(dtype="datetime64[ns]"))
+        for (semaine, annee), recettes in df_hist.groupby([df_hist['Semaine'].astype(int), df_hist['Date'].dt.year])['Recette']:
+            self.recettes_par_semaine.setdefault(semaine, {})[annee] = set(recettes.astype(str))
+
+    def recettes_meme_semaine(self, semaine, annee_max_exclue):
+        recettes = set()
+        for annee, recettes_annee in self.recettes_par_semaine.get(semaine, {}).items():
+            if annee < annee_max_exclue:
+                recettes |= recettes_annee
+        return recettes
+
+    def est_servie_entre(self, recette_page_id_str, debut, fin):
+        """Vrai si la recette apparaît dans l'historique dans l'intervalle ]debut, fin]."""
+        dates = self.dates_par_recette.get(str(recette_page_id_str))
+        if dates is None:
+            return False
+        i = np.searchsorted(dates, np.datetime64(pd.Timestamp(debut), "ns"), side="right")
+        return i < len(dates) and dates[i] <= np.datetime64(pd.Timestamp(fin), "ns")
 
+    def derniere_date(self, recettes_ids):
+        """Date la plus récente (ou None) parmi les recettes données."""
+        derniere = None
+        for recette_id in recettes_ids:
+            dates = self.dates_par_recette.get(recette_id)
+            if dates is not None and (derniere is None or dates[-1] > derniere):
+                derniere = dates[-1]
+        return None if derniere is None else pd.Timestamp(derniere)
 
+FENETRE_MOTS_CLES = 3  # nombre de plats récents dont le premier mot est exclu
+
+class EtatGeneration:
+    """
+    État mutable d'une génération, avancé repas par repas par
+    MenuGenerator._generer_repas. Une copie est gardée avant chaque repas
+    (point de reprise) pour pouvoir remplacer un repas sans tout régénérer.
+
+    `journal` reçoit un événement par repas (décision et variations de stock,
+    voir _evenement_repas) : sérialisable en JSON, il permet de rejouer,
+    auditer ou reprendre une génération (generer_menu(journal=...)).
+    """
+    def __init__(self):
+        self.resultats = []
+        self.journal = []
+        self.repas_b_utilises_ids = []
+        self.plats_transportables_semaine = {}
+        self.used_recipes_current_generation_set = set()
+        self.mots_cles_recents = deque(maxlen=FENETRE_MOTS_CLES)  # ids de mots-clés des derniers plats
+        self.ingredients_menu_cumules = {}
+        self.ingredients_dates_utilises = {}
+        # None : une recette sert une seule fois par génération ; en mode
+        # horizon, elle redevient disponible après ce nombre de jours
+        self.fenetre_jours = None
+        # (date, recette) dans l'ordre, pour libérer les recettes en mode horizon
+        self.utilisations = deque()
+        self.derniere_utilisation = {}
+        # Renseignés seulement sur les points de reprise
+        self.stock_simule = None
+        self.anti_gaspi_ingredients = None
+
+    def copie(self):
+        etat = copy.copy(self)
+        etat.resultats = list(self.resultats)
+        etat.journal = list(self.journal)
+        etat.repas_b_utilises_ids = list(self.repas_b_utilises_ids)
+        etat.plats_transportables_semaine = dict(self.plats_transportables_semaine)
+        etat.used_recipes_current_generation_set = set(self.used_recipes_current_generation_set)
+        etat.mots_cles_recents = deque(self.mots_cles_recents, maxlen=FENETRE_MOTS_CLES)
+        etat.ingredients_menu_cumules = dict(self.ingredients_menu_cumules)
+        etat.ingredients_dates_utilises = dict(self.ingredients_dates_utilises)
+        etat.utilisations = deque(self.utilisations)
+        etat.derniere_utilisation = dict(self.derniere_utilisation)
+        return etat
+
+class DonneesIndexees:
+    """
+    Index en lecture seule (recettes, liens, historique) construits une fois et
+    partagés entre plusieurs générations : chaque MenuGenerator n'en copie que
+    le stock simulé.
+    """
+    def __init__(self, df_menus_hist, df_recettes, df_ingredients, df_ingredients_recettes, df_resume_menus=None):
+        self.recette_manager = RecetteManager(df_recettes, df_ingredients, df_ingredients_recettes)
+        self.menus_history_manager = MenusHistoryManager(df_menus_hist, df_resume_menus)
+
+    @classmethod
+    def depuis_dataframes(cls, dataframes):
+        return cls(dataframes["Menus"], dataframes["Recettes"], dataframes["Ingredients"], dataframes["Ingredients_recettes"],
+                   dataframes.get("Menus_resume"))
+
+    def avec_historique(self, df_menus_hist, df_resume_menus=None):
+        """Copie partageant les index de recettes, avec un nouvel historique (menus tout juste envoyés)."""
+        donnees = copy.copy(self)
+        donnees.__dict__.pop("empreinte", None)
+        donnees.menus_history_manager = MenusHistoryManager(df_menus_hist, df_resume_menus)
+        return donnees
+
+    @cached_property
+    def empreinte(self):
+        """Empreinte du contenu des quatre tables (clé du cache de résultats)."""
+        rm = self.recette_manager
+        mhm = self.menus_history_manager
+        tables = [rm.df_recettes, rm.df_ingredients_initial, rm.df_ingredients_recettes, mhm.df_menus_historique]
+        if mhm.df_resume is not None:
+            tables.append(mhm.df_resume)
+        return empreinte_dataframes(*tables)
 
-    
 class MenuGenerator:
     """Génère les menus en fonction du planning et des règles."""
-    def __init__(self, df_menus_hist, df_recettes, df_planning, df_ingredients, df_ingredients_recettes, ne_pas_decrementer_stock, params):
+    def __init__(self, df_menus_hist, df_recettes, df_planning, df_ingredients, df_ingredients_recettes, ne_pas_decrementer_stock, params, diagnostics=None, donnees_indexees=None, stock_overrides=None, graine=None):
+        self.diagnostics = diagnostics or Diagnostics()
+        # Même graine + mêmes données + même planning → même menu
+        self.rng = np.random.default_rng(graine)
         self.df_planning = df_planning.copy()
         if "Date" in self.df_planning.columns:
             self.df_planning['Date'] = pd.to_datetime(self.df_planning['Date'], errors='coerce')
@@ -551,46 +851,29 @@ class MenuGenerator:
             logger.error("'Date' manquante dans le planning.")
             raise ValueError("Colonne 'Date' manquante dans le fichier de planning.")
 
-        self.recette_manager = RecetteManager(df_recettes, df_ingredients, df_ingredients_recettes)
-        self.menus_history_manager = MenusHistoryManager(df_menus_hist)
+        with self.diagnostics.phase(PHASE_INDEX):
+            if donnees_indexees is None:
+                donnees_indexees = DonneesIndexees(df_menus_hist, df_recettes, df_ingredients, df_ingredients_recettes)
+            self.recette_manager = donnees_indexees.recette_manager.copie(stock_overrides)
+            self.menus_history_manager = donnees_indexees.menus_history_manager
         self.ne_pas_decrementer_stock = ne_pas_decrementer_stock
         self.params = params
+        self._derniere_date_hist_ingredient = {}
 
     def recettes_meme_semaine_annees_precedentes(self, date_actuelle):
         try:
-            df_hist = self.menus_history_manager.df_menus_historique
-            if df_hist.empty or not all(col in df_hist.columns for col in ['Date', 'Semaine', 'Recette']):
-                return set()
-
             semaine_actuelle = date_actuelle.isocalendar()[1]
-            annee_actuelle = date_actuelle.year
-
-            df_menus_semaine = df_hist[
-                (df_hist["Semaine"].astype(int) == semaine_actuelle) &
-                (df_hist["Date"].dt.year < annee_actuelle) &
-                pd.notna(df_hist["Recette"])
-            ]
-            return set(df_menus_semaine["Recette"].astype(str).unique())
+            return self.menus_history_manager.recettes_meme_semaine(semaine_actuelle, date_actuelle.year)
         except Exception as e:
             logger.error(f"Erreur recettes_meme_semaine_annees_precedentes pour {date_actuelle}: {e}")
             return set()
 
     def est_recente(self, recette_page_id_str, date_actuelle):
         try:
-            df_hist = self.menus_history_manager.df_menus_historique
-            if df_hist.empty or not all(col in df_hist.columns for col in ['Date', 'Recette']):
-                return False
-
             debut = date_actuelle - timedelta(days=self.params["NB_JOURS_ANTI_REPETITION"])
-            fin = date_actuelle
-            mask = (
-                (df_hist['Recette'].astype(str) == str(recette_page_id_str)) &
-                (df_hist['Date'] > debut) &
-                (df_hist['Date'] <= fin)
-            )
-            is_recent = not df_hist.loc[mask].empty
+            is_recent = self.menus_history_manager.est_servie_entre(recette_page_id_str, debut, date_actuelle)
             if is_recent:
-                logger.debug(f"Recette {self.recette_manager.obtenir_nom(recette_page_id_str)} ({recette_page_id_str}) filtrée: Est récente (dans les {self.params['NB_JOURS_ANTI_REPETITION']} jours)")
+                logger.debug("Recette %s (%s) filtrée: Est récente (dans les %s jours)", _Differe(self.recette_manager.obtenir_nom, recette_page_id_str), recette_page_id_str, self.params['NB_JOURS_ANTI_REPETITION'])
             return is_recent
 
         except Exception as e:
@@ -602,13 +885,9 @@ class MenuGenerator:
             ingredients_utilises_generation = {}
     
         try:
-            ingredients_recette = self.recette_manager.get_ingredients_for_recipe(recette_page_id_str)
-    
-            for ing in ingredients_recette:
-                ing_id_str = str(ing.get("Ingrédient ok"))
-                if not ing_id_str or ing_id_str.lower() in ['nan', 'none', '']:
-                    continue
+            ingredients_recette = self.recette_manager.ingredients_par_recette.get(str(recette_page_id_str), {})
     
+            for ing_id_str in ingredients_recette:
                 intervalle_jours = self.recette_manager.obtenir_intervalle_ingredient_par_id(ing_id_str)
                 if intervalle_jours <= 0:
                     continue
@@ -617,35 +896,21 @@ class MenuGenerator:
                 if ing_id_str in ingredients_utilises_generation:
                     date_derniere_util = ingredients_utilises_generation[ing_id_str]
                     if (date_actuelle - date_derniere_util).days < intervalle_jours:
-                        nom_ing = self.recette_manager.obtenir_nom_ingredient_par_id(ing_id_str)
                         logger.debug(
-                            f"Ingrédient '{nom_ing}' déjà utilisé le {date_derniere_util.strftime('%Y-%m-%d')} "
-                            f"→ intervalle {intervalle_jours} jours non respecté."
+                            "Ingrédient '%s' déjà utilisé le %s → intervalle %d jours non respecté.",
+                            _Differe(self.recette_manager.obtenir_nom_ingredient_par_id, ing_id_str), date_derniere_util, intervalle_jours
                         )
                         return False
     
                 # 🔹 2. Vérifier l’historique Notion
-                df_hist = self.menus_history_manager.df_menus_historique
-                if df_hist.empty:
-                    continue
-    
-                df_ir = self.recette_manager.df_ingredients_recettes
-                recettes_utilisant_ing = df_ir[df_ir["Ingrédient ok"].astype(str) == ing_id_str]
-    
-                if not recettes_utilisant_ing.empty:
-                    recette_ids_utilisant_ing = set(recettes_utilisant_ing[COLONNE_ID_RECETTE].astype(str).unique())
+                derniere_date_hist = self._derniere_date_historique_ingredient(ing_id_str)
+                if derniere_date_hist is not None:
                     debut_intervalle = date_actuelle - timedelta(days=intervalle_jours)
     
-                    mask_hist = (
-                        (df_hist['Date'] >= debut_intervalle) &
-                        (df_hist['Recette'].astype(str).isin(recette_ids_utilisant_ing))
-                    )
-    
-                    if not df_hist.loc[mask_hist].empty:
-                        nom_ing = self.recette_manager.obtenir_nom_ingredient_par_id(ing_id_str)
+                    if derniere_date_hist >= debut_intervalle:
                         logger.debug(
-                            f"Ingrédient '{nom_ing}' déjà utilisé récemment dans l’historique "
-                            f"(intervalle {intervalle_jours} jours non respecté)."
+                            "Ingrédient '%s' déjà utilisé récemment dans l’historique (intervalle %d jours non respecté).",
+                            _Differe(self.recette_manager.obtenir_nom_ingredient_par_id, ing_id_str), intervalle_jours
                         )
                         return False
     
@@ -656,6 +921,12 @@ class MenuGenerator:
             return True
 
 
+    def _derniere_date_historique_ingredient(self, ing_id_str):
+        if ing_id_str not in self._derniere_date_hist_ingredient:
+            recettes_ids = self.recette_manager.recettes_par_ingredient.get(ing_id_str, ())
+            self._derniere_date_hist_ingredient[ing_id_str] = self.menus_history_manager.derniere_date(recettes_ids)
+        return self._derniere_date_hist_ingredient[ing_id_str]
+
     def compter_participants(self, participants_str_codes):
         if not isinstance(participants_str_codes, str): return 1
         if participants_str_codes == "B": return 1
@@ -679,62 +950,60 @@ class MenuGenerator:
         recettes_ingredients_manquants = {}
 
         nb_personnes = self.compter_participants(participants_str_codes)
-
-        logger.debug(f"--- Recherche de candidats pour {date_repas.strftime('%Y-%m-%d %H:%M')} (Participants: {participants_str_codes}) ---")
-
-        for recette_id_str_cand in self.recette_manager.df_recettes.index.astype(str):
-            nom_recette_cand = self.recette_manager.obtenir_nom(recette_id_str_cand)
-
-            if recette_id_str_cand in exclure_recettes_ids:
-                logger.debug(f"Candidat {nom_recette_cand} ({recette_id_str_cand}) filtré: Exclu par le menu Optimal.")
-                continue
-
-            # CORRECTION DU COMPORTEMENT : Appliquer le filtre seulement si la contrainte est spécifiée
-            if str(transportable_req).strip().lower() == "oui" and not self.recette_manager.est_transportable(recette_id_str_cand):
-                logger.debug(f"Candidat {nom_recette_cand} ({recette_id_str_cand}) filtré: Non transportable pour une demande transportable.")
-                continue
-
-            temps_total = self.recette_manager.obtenir_temps_preparation(recette_id_str_cand)
-            if temps_req == "express" and temps_total > self.params['TEMPS_MAX_EXPRESS']* 1.10:
-                logger.debug(f"Candidat {nom_recette_cand} ({recette_id_str_cand}) filtré: Temps ({temps_total} min) > Express ({self.params['TEMPS_MAX_EXPRESS']} min).")
-                continue
-            if temps_req == "rapide" and temps_total > self.params['TEMPS_MAX_RAPIDE']* 1.10:
-                logger.debug(f"Candidat {nom_recette_cand} ({recette_id_str_cand}) filtré: Temps ({temps_total} min) > Rapide ({self.params['TEMPS_MAX_RAPIDE']} min).")
-                continue
-
-            if nutrition_req == "équilibré":
-                try:
-                    calories = self.recette_manager.obtenir_calories(recette_id_str_cand)
-                    if calories > self.params['REPAS_EQUILIBRE']:
-                        logger.debug(f"Candidat {nom_recette_cand} ({recette_id_str_cand}) filtré: Calories ({calories}) > Équilibré ({self.params['REPAS_EQUILIBRE']}).")
-                        continue
-                except Exception:
-                    logger.debug(f"Calories non valides/trouvées pour {nom_recette_cand} ({recette_id_str_cand}) (filtre nutrition).")
+        rm = self.recette_manager
+        diag = self.diagnostics
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        logger.debug("--- Recherche de candidats pour %s (Participants: %s) ---", date_repas, participants_str_codes)
+
+        # CORRECTION DU COMPORTEMENT : Appliquer les filtres seulement si la contrainte est spécifiée
+        filtre_transportable = str(transportable_req).strip().lower() == "oui"
+        temps_max = None
+        if temps_req == "express":
+            temps_max = self.params['TEMPS_MAX_EXPRESS'] * 1.10
+        elif temps_req == "rapide":
+            temps_max = self.params['TEMPS_MAX_RAPIDE'] * 1.10
+        filtre_equilibre = nutrition_req == "équilibré"
+
+        retenus = []
+        with diag.phase(PHASE_FILTRAGE):
+            for recette_id_str_cand in rm.ids_recettes:
+                diag.compter(COMPTEUR_EXAMINES)
+                if recette_id_str_cand in exclure_recettes_ids:
+                    raison = "Exclu par le menu Optimal"
+                elif filtre_transportable and recette_id_str_cand not in rm.recettes_transportables:
+                    raison = "Non transportable pour une demande transportable"
+                elif temps_max is not None and rm.obtenir_temps_preparation(recette_id_str_cand) > temps_max:
+                    raison = f"Temps > {temps_req.capitalize()}"
+                elif filtre_equilibre and rm.obtenir_calories(recette_id_str_cand) > self.params['REPAS_EQUILIBRE']:
+                    raison = "Calories > Équilibré"
+                elif recette_id_str_cand in used_recipes_in_current_gen:
+                    raison = "Déjà utilisé dans la génération actuelle"
+                elif not self._filtrer_recette_base(recette_id_str_cand, participants_str_codes):
+                    raison = "Participants"
+                elif self.est_recente(recette_id_str_cand, date_repas):
+                    raison = "Récente"
+                elif not self.est_intervalle_respecte(recette_id_str_cand, date_repas, ingredients_utilises_cette_semaine):
+                    raison = "Intervalle ingrédient"
+                else:
+                    retenus.append(recette_id_str_cand)
                     continue
-            
-            if recette_id_str_cand in used_recipes_in_current_gen:
-                logger.debug(f"Candidat {nom_recette_cand} ({recette_id_str_cand}) filtré: Déjà utilisé dans la génération actuelle.")
-                continue
-            
-            if not self._filtrer_recette_base(recette_id_str_cand, participants_str_codes):
-                continue
-            
-            if self.est_recente(recette_id_str_cand, date_repas):
-                continue
-            
-            if not self.est_intervalle_respecte(recette_id_str_cand, date_repas,ingredients_utilises_cette_semaine):
-                continue
-
-            score_dispo, pourcentage_dispo, manquants_pour_cette_recette = self.recette_manager.evaluer_disponibilite_et_manquants(recette_id_str_cand, nb_personnes)
-            recettes_scores_dispo[recette_id_str_cand] = score_dispo
-            recettes_ingredients_manquants[recette_id_str_cand] = manquants_pour_cette_recette
-            candidates.append(recette_id_str_cand)
-            logger.debug(f"Candidat {nom_recette_cand} ({recette_id_str_cand}) ajouté: Score dispo {score_dispo:.2f}, {pourcentage_dispo:.0f}% d'ingrédients. Manquants: {len(manquants_pour_cette_recette)}")
-
-            if self.recette_manager.recette_utilise_ingredient_anti_gaspi(recette_id_str_cand):
-                anti_gaspi_candidates.append(recette_id_str_cand)
-                logger.debug(f"Candidat {nom_recette_cand} ({recette_id_str_cand}) est aussi anti-gaspi.")
-
+                diag.compter_filtre(raison)
+                if debug:
+                    logger.debug("Candidat %s (%s) filtré: %s.", rm.obtenir_nom(recette_id_str_cand), recette_id_str_cand, raison)
+
+        with diag.phase(PHASE_SCORING):
+            for recette_id_str_cand in retenus:
+                score_dispo, pourcentage_dispo, manquants_pour_cette_recette = rm.evaluer_disponibilite_et_manquants(recette_id_str_cand, nb_personnes)
+                recettes_scores_dispo[recette_id_str_cand] = score_dispo
+                recettes_ingredients_manquants[recette_id_str_cand] = manquants_pour_cette_recette
+                candidates.append(recette_id_str_cand)
+                if debug:
+                    logger.debug("Candidat %s (%s) ajouté: Score dispo %.2f, %.0f%% d'ingrédients. Manquants: %d", rm.obtenir_nom(recette_id_str_cand), recette_id_str_cand, score_dispo, pourcentage_dispo, len(manquants_pour_cette_recette))
+
+                if rm.recette_utilise_ingredient_anti_gaspi(recette_id_str_cand):
+                    anti_gaspi_candidates.append(recette_id_str_cand)
+                    logger.debug("Candidat %s est aussi anti-gaspi.", recette_id_str_cand)
 
         if not candidates:
             logger.debug("Aucun candidat trouvé après le filtrage initial.")
@@ -748,21 +1017,21 @@ class MenuGenerator:
         anti_gaspi_triees = sorted(anti_gaspi_candidates, key=lambda r_id: recettes_scores_dispo.get(r_id, -1), reverse=True)
 
         if anti_gaspi_triees and recettes_scores_dispo.get(anti_gaspi_triees[0], -1) >= 0.5:
-            logger.debug(f"Priorisation des candidats anti-gaspi (meilleur score {recettes_scores_dispo.get(anti_gaspi_triees[0], -1):.2f}).")
+            logger.debug("Priorisation des candidats anti-gaspi (meilleur score %.2f).", recettes_scores_dispo.get(anti_gaspi_triees[0], -1))
             return anti_gaspi_triees[:5], recettes_ingredients_manquants
         
-        logger.debug(f"Retourne les {min(len(candidates_triees), 10)} meilleurs candidats.")
+        logger.debug("Retourne les %d meilleurs candidats.", min(len(candidates_triees), 10))
         return candidates_triees[:10], recettes_ingredients_manquants
 
-    def _traiter_menu_standard(self, date_repas, participants_str_codes, participants_count_int, used_recipes_in_current_gen_set, menu_recent_noms_list, transportable_req_str, temps_req_str, nutrition_req_str, ingredients_utilises_cette_semaine, exclure_recettes_ids=None):
-        logger.debug(f"--- Traitement Repas Standard pour {date_repas.strftime('%Y-%m-%d %H:%M')} ---")
+    def _traiter_menu_standard(self, date_repas, participants_str_codes, participants_count_int, used_recipes_in_current_gen_set, mots_cles_recents, transportable_req_str, temps_req_str, nutrition_req_str, ingredients_utilises_cette_semaine, exclure_recettes_ids=None):
+        logger.debug("--- Traitement Repas Standard pour %s ---", date_repas)
         recettes_candidates_initiales, recettes_manquants_dict = self.generer_recettes_candidates(
             date_repas, participants_str_codes, used_recipes_in_current_gen_set,
             transportable_req_str, temps_req_str, nutrition_req_str,
             exclure_recettes_ids=exclure_recettes_ids,ingredients_utilises_cette_semaine=ingredients_utilises_cette_semaine
         )
         if not recettes_candidates_initiales:
-            logger.debug(f"Aucune recette candidate initiale pour {date_repas.strftime('%Y-%m-%d %H:%M')}.")
+            logger.debug("Aucune recette candidate initiale pour %s.", date_repas)
             return None, {}
 
         recettes_historiques_semaine_set = self.recettes_meme_semaine_annees_precedentes(date_repas)
@@ -772,77 +1041,70 @@ class MenuGenerator:
         }
         preferred_candidates_list = [r_id for r_id in recettes_candidates_initiales if r_id in recettes_historiques_semaine_set]
         if preferred_candidates_list:
-            logger.debug(f"{len(preferred_candidates_list)} candidats préférés (historique semaine précédente) trouvés.")
-
-        mots_cles_exclus_set = set()
-        if menu_recent_noms_list:
-            for nom_plat_recent in menu_recent_noms_list:
-                if isinstance(nom_plat_recent, str) and nom_plat_recent.strip():
-                    try: mots_cles_exclus_set.add(nom_plat_recent.lower().split()[0])
-                    except IndexError: pass
+            logger.debug("%d candidats préférés (historique semaine précédente) trouvés.", len(preferred_candidates_list))
+
+        mots_cles_exclus_set = set(mots_cles_recents)
+        mots_cles_exclus_set.discard(-1)
         if mots_cles_exclus_set:
-            logger.debug(f"Mots clés exclus pour anti-répétition (génération actuelle): {mots_cles_exclus_set}")
+            logger.debug("Mots clés exclus pour anti-répétition (génération actuelle): %s", mots_cles_exclus_set)
 
-        def get_first_word_local(recette_id_str_func):
-            nom = self.recette_manager.obtenir_nom(recette_id_str_func)
-            return nom.lower().split()[0] if nom and nom.strip() and "Recette_ID_" not in nom else ""
+        mot_cle_recettes = self.recette_manager.mot_cle_recettes
 
         recette_choisie_final = None
         if preferred_candidates_list:
             preferred_valides_motcle = []
             for r_id in preferred_candidates_list:
-                first_word = get_first_word_local(r_id)
-                if first_word not in mots_cles_exclus_set:
+                if mot_cle_recettes.get(r_id, -1) not in mots_cles_exclus_set:
                     preferred_valides_motcle.append(r_id)
                 else:
-                    logger.debug(f"Candidat préféré {self.recette_manager.obtenir_nom(r_id)} ({r_id}) filtré: Premier mot '{first_word}' déjà récent.")
+                    logger.debug("Candidat préféré %s filtré: Premier mot de '%s' déjà récent.", r_id, _Differe(self.recette_manager.obtenir_nom, r_id))
 
             if preferred_valides_motcle:
-                recette_choisie_final = choisir_recette_aleatoire_ponderee(preferred_valides_motcle, scores_candidats_dispo)
-                logger.debug(f"Recette choisie parmi les préférées valides: {self.recette_manager.obtenir_nom(recette_choisie_final)} ({recette_choisie_final}).")
+                recette_choisie_final = choisir_recette_aleatoire_ponderee(preferred_valides_motcle, scores_candidats_dispo, self.rng)
+                logger.debug("Recette choisie parmi les préférées valides: %s (%s).", _Differe(self.recette_manager.obtenir_nom, recette_choisie_final), recette_choisie_final)
             else:
-                recette_choisie_final = choisir_recette_aleatoire_ponderee(preferred_candidates_list, scores_candidats_dispo)
-                logger.debug(f"Recette choisie parmi les préférées (sans filtrage mot-clé, car tous sont filtrés): {self.recette_manager.obtenir_nom(recette_choisie_final)} ({recette_choisie_final}).")
+                recette_choisie_final = choisir_recette_aleatoire_ponderee(preferred_candidates_list, scores_candidats_dispo, self.rng)
+                logger.debug("Recette choisie parmi les préférées (sans filtrage mot-clé, car tous sont filtrés): %s (%s).", _Differe(self.recette_manager.obtenir_nom, recette_choisie_final), recette_choisie_final)
 
         if not recette_choisie_final:
             candidates_valides_motcle = []
             for r_id in recettes_candidates_initiales:
-                first_word = get_first_word_local(r_id)
-                if first_word not in mots_cles_exclus_set:
+                if mot_cle_recettes.get(r_id, -1) not in mots_cles_exclus_set:
                     candidates_valides_motcle.append(r_id)
                 else:
-                    logger.debug(f"Candidat général {self.recette_manager.obtenir_nom(r_id)} ({r_id}) filtré: Premier mot '{first_word}' déjà récent.")
+                    logger.debug("Candidat général %s filtré: Premier mot de '%s' déjà récent.", r_id, _Differe(self.recette_manager.obtenir_nom, r_id))
 
             if candidates_valides_motcle:
                 if exclure_recettes_ids:
                     recette_choisie_final = sorted(candidates_valides_motcle, key=lambda r_id: self._get_historical_frequency(r_id))[0]
                 else:
-                    recette_choisie_final = choisir_recette_aleatoire_ponderee(candidates_valides_motcle, scores_candidats_dispo)
-                logger.debug(f"Recette choisie parmi les candidats généraux valides: {self.recette_manager.obtenir_nom(recette_choisie_final)} ({recette_choisie_final}).")
+                    recette_choisie_final = choisir_recette_aleatoire_ponderee(candidates_valides_motcle, scores_candidats_dispo, self.rng)
+                logger.debug("Recette choisie parmi les candidats généraux valides: %s (%s).", _Differe(self.recette_manager.obtenir_nom, recette_choisie_final), recette_choisie_final)
             elif recettes_candidates_initiales:
                 if exclure_recettes_ids:
                     recette_choisie_final = sorted(recettes_candidates_initiales, key=lambda r_id: self._get_historical_frequency(r_id))[0]
                 else:
                     recette_choisie_final = sorted(recettes_candidates_initiales, key=lambda r_id: scores_candidats_dispo.get(r_id, -1), reverse=True)[0]
-                logger.debug(f"Recette choisie parmi les candidats généraux (sans filtrage mot-clé, car tous sont filtrés): {self.recette_manager.obtenir_nom(recette_choisie_final)} ({recette_choisie_final}).")
+                logger.debug("Recette choisie parmi les candidats généraux (sans filtrage mot-clé, car tous sont filtrés): %s (%s).", _Differe(self.recette_manager.obtenir_nom, recette_choisie_final), recette_choisie_final)
 
         if recette_choisie_final:
         # Vérification supplémentaire de l'intervalle des ingrédients avant validation finale
             if not self.est_intervalle_respecte(recette_choisie_final, date_repas, ingredients_utilises_cette_semaine):
-                logger.debug(f"Recette {self.recette_manager.obtenir_nom(recette_choisie_final)} rejetée en dernière étape : intervalle ingrédient non respecté.")
+                logger.debug("Recette %s rejetée en dernière étape : intervalle ingrédient non respecté.", _Differe(self.recette_manager.obtenir_nom, recette_choisie_final))
                 return None, {}
-            logger.debug(f"Recette finale sélectionnée pour repas standard: {self.recette_manager.obtenir_nom(recette_choisie_final)} ({recette_choisie_final}).")
+            logger.debug("Recette finale sélectionnée pour repas standard: %s (%s).", _Differe(self.recette_manager.obtenir_nom, recette_choisie_final), recette_choisie_final)
             return recette_choisie_final, recettes_manquants_dict.get(recette_choisie_final, {})
     
-            logger.debug(f"Aucune recette finale sélectionnée pour repas standard à {date_repas.strftime('%Y-%m-%d %H:%M')}.")
+            logger.debug("Aucune recette finale sélectionnée pour repas standard à %s.", date_repas)
             return None, {}
 
     def _log_decision_recette(self, recette_id_str, date_repas, participants_str_codes):
         if recette_id_str is not None:
-            nom_recette = self.recette_manager.obtenir_nom(recette_id_str)
-            adaptee = self.recette_manager.est_adaptee_aux_participants(recette_id_str, participants_str_codes)
-            temps_prep = self.recette_manager.obtenir_temps_preparation(recette_id_str)
-            logger.debug(f"Décision rec {recette_id_str} ({nom_recette}): Adaptée={adaptee}, Temps={temps_prep} min")
+            if logger.isEnabledFor(logging.DEBUG):
+                nom_recette = self.recette_manager.obtenir_nom(recette_id_str)
+                adaptee = self.recette_manager.est_adaptee_aux_participants(recette_id_str, participants_str_codes)
+                temps_prep = self.recette_manager.obtenir_temps_preparation(recette_id_str)
+                logger.debug("Décision rec %s (%s): Adaptée=%s, Temps=%s min", recette_id_str, nom_recette, adaptee, temps_prep)
         else:
             logger.warning(f"Aucune recette sélectionnée pour {date_repas.strftime('%d/%m/%Y')} - Participants: {participants_str_codes}")
 
@@ -862,11 +1124,14 @@ class MenuGenerator:
             "Recette_ID": recette_id_str_pour_eval
         })
 
-    def generer_menu_repas_b(self, date_repas, plats_transportables_semaine_dict, repas_b_utilises_ids_list, menu_recent_noms_list):
+    def generer_menu_repas_b(self, date_repas, plats_transportables_semaine_dict, repas_b_utilises_ids_list, mots_cles_recents):
         candidats_restes_ids = []
+        # Seuls les plats des deux derniers jours peuvent servir de restes
+        for date_plat in [d for d in plats_transportables_semaine_dict if (date_repas.date() - d.date()).days > 2]:
+            del plats_transportables_semaine_dict[date_plat]
         sorted_plats_transportables = sorted(plats_transportables_semaine_dict.items(), key=lambda item: item[0])
 
-        logger.debug(f"--- Recherche de restes pour Repas B le {date_repas.strftime('%Y-%m-%d %H:%M')} ---")
+        logger.debug("--- Recherche de restes pour Repas B le %s ---", date_repas)
         if not sorted_plats_transportables:
             logger.debug("Aucun plat transportable disponible dans plats_transportables_semaine_dict.")
             
@@ -874,24 +1139,24 @@ class MenuGenerator:
             nom_plat_reste = self.recette_manager.obtenir_nom(plat_id_orig_str)
             jours_ecoules = (date_repas.date() - date_plat_orig.date()).days
             
-            logger.debug(f"Éval reste {nom_plat_reste} (ID: {plat_id_orig_str}) du {date_plat_orig.strftime('%Y-%m-%d')}. Jours écoulés: {jours_ecoules}.")
+            logger.debug("Éval reste %s (ID: %s) du %s. Jours écoulés: %d.", nom_plat_reste, plat_id_orig_str, date_plat_orig, jours_ecoules)
 
             if not (0 < jours_ecoules <= 2):
-                logger.debug(f"Reste {nom_plat_reste} filtré: Jours écoulés ({jours_ecoules}) hors de la plage (1-2 jours).")
+                logger.debug("Reste %s filtré: Jours écoulés (%d) hors de la plage (1-2 jours).", nom_plat_reste, jours_ecoules)
                 continue
             if plat_id_orig_str in repas_b_utilises_ids_list:
-                logger.debug(f"Reste {nom_plat_reste} filtré: Déjà utilisé pour un repas B.")
+                logger.debug("Reste %s filtré: Déjà utilisé pour un repas B.", nom_plat_reste)
                 continue
             if not (nom_plat_reste and nom_plat_reste.strip() and "Recette_ID_" not in nom_plat_reste):
-                logger.debug(f"Reste {nom_plat_reste} filtré: Nom de plat invalide ou générique.")
+                logger.debug("Reste %s filtré: Nom de plat invalide ou générique.", nom_plat_reste)
                 continue
             
             if not self.recette_manager.est_transportable(plat_id_orig_str):
-                logger.debug(f"Reste {nom_plat_reste} (ID: {plat_id_orig_str}) filtré: La recette d'origine n'est pas marquée comme transportable dans Recettes.csv.")
+                logger.debug("Reste %s (ID: %s) filtré: La recette d'origine n'est pas marquée comme transportable dans Recettes.csv.", nom_plat_reste, plat_id_orig_str)
                 continue
 
             candidats_restes_ids.append(plat_id_orig_str)
-            logger.debug(f"Reste {nom_plat_reste} (ID: {plat_id_orig_str}) ajouté aux candidats restes.")
+            logger.debug("Reste %s (ID: %s) ajouté aux candidats restes.", nom_plat_reste, plat_id_orig_str)
 
 
         if candidats_restes_ids:
@@ -905,166 +1170,377 @@ class MenuGenerator:
         return "Pas de reste disponible", None, "Aucun reste transportable trouvé"
 
 
-    def generer_menu(self, mode, exclure_recettes_ids=None):
+    def _est_repas_b(self, participants_str):
+        return "B" in [p.strip() for p in participants_str.split(",")]
+
+    def _point_de_reprise(self, etat):
+        """Copie de l'état (et du stock simulé) juste avant un repas."""
+        point = etat.copie()
+        point.stock_simule = dict(self.recette_manager.stock_simule)
+        point.anti_gaspi_ingredients = dict(self.recette_manager.anti_gaspi_ingredients)
+        return point
+
+    def _restaurer(self, point):
+        self.recette_manager.stock_simule = dict(point.stock_simule)
+        self.recette_manager.anti_gaspi_ingredients = dict(point.anti_gaspi_ingredients)
+        etat = point.copie()
+        etat.stock_simule = etat.anti_gaspi_ingredients = None
+        return etat
+
+    def generer_menu(self, mode, exclure_recettes_ids=None, journal=None):
+        """
+        Génère le menu du planning. Si `journal` (événements d'une génération
+        précédente) est fourni, ses repas sont rejoués sans nouvelle sélection
+        (les écarts de stock avec le journal sont signalés), puis les repas
+        restants du planning sont générés normalement.
+        """
         if exclure_recettes_ids is None:
             exclure_recettes_ids = set()
+        self.exclure_recettes_ids = exclure_recettes_ids
+        journal = journal or []
 
-        resultats_df_list = []
-        repas_b_utilises_ids = []
-        plats_transportables_semaine = {}
-        used_recipes_current_generation_set = set()
-        menu_recent_noms = []
-        
-        ingredients_menu_cumules = {}
-        ingredients_dates_utilises = {}  # {ingredient_id: date}
-
-        
         if mode == 'alternatif':
-            self.recette_manager.stock_simule = self.recette_manager.df_ingredients_initial.copy()
-
-        initial_stock_values = {
-            row[COLONNE_ID_INGREDIENT]: float(row["Qte reste"])
-            for _, row in self.recette_manager.df_ingredients_initial.iterrows()
-            if isinstance(row["Qte reste"], str) and row["Qte reste"].replace('.', '', 1).isdigit()
-        }
-
-        planning_sorted = self.df_planning.sort_values("Date")
-        
-        for index, repas_planning_row in planning_sorted.iterrows():
-            date_repas_dt = repas_planning_row["Date"]
-            participants_str = str(repas_planning_row["Participants"])
-            participants_count = self.compter_participants(participants_str)
-            transportable_req = str(repas_planning_row.get("Transportable", "")).strip().lower()
-            temps_req = str(repas_planning_row.get("Temps", "")).strip().lower()
-            nutrition_req = str(repas_planning_row.get("Nutrition", "")).strip().lower()
-
-            logger.info(f"\n--- Traitement Planning: {date_repas_dt.strftime('%d/%m/%Y %H:%M')} - Participants: {participants_str} ---")
-
-            recette_choisie_id = None
-            nom_plat_final = "Erreur - Plat non défini"
-            remarques_repas = ""
-            temps_prep_final = 0
-            
-            if "B" in [p.strip() for p in participants_str.split(",")]:
-                nom_plat_final, recette_choisie_id, remarques_repas = self.generer_menu_repas_b(
-                    date_repas_dt, plats_transportables_semaine, repas_b_utilises_ids, menu_recent_noms
-                )
-                if recette_choisie_id:
-                    temps_prep_final = self.recette_manager.obtenir_temps_preparation(recette_choisie_id)
+            self.recette_manager.reinitialiser_stock()
+
+        self.repas_planning = [row for _, row in self.df_planning.sort_values("Date").iterrows()]
+        if len(journal) > len(self.repas_planning):
+            raise ValueError(f"Journal de {len(journal)} repas pour un planning de {len(self.repas_planning)} repas.")
+        self.points_reprise = []
+        etat = EtatGeneration()
+
+        for index_repas, repas_planning_row in enumerate(self.repas_planning):
+            self.points_reprise.append(self._point_de_reprise(etat))
+            if index_repas < len(journal):
+                self._rejouer_evenement(etat, repas_planning_row, journal[index_repas])
             else:
-                # Première tentative de génération avec toutes les contraintes
-                recette_choisie_id, _ = self._traiter_menu_standard(
-                    date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
-                    menu_recent_noms, transportable_req, temps_req, nutrition_req,
-                    ingredients_dates_utilises,
-                    exclure_recettes_ids=exclure_recettes_ids
-                )
-
-                if recette_choisie_id is None:
-                    # Logique de "dernier recours" si la première tentative échoue
-                    logger.warning(f"Pas de recette trouvée pour {date_repas_dt.strftime('%d/%m/%Y')}. Tentative de relâcher les contraintes.")
-                    
-                    # Relâchement des contraintes une par une (dans un ordre de priorité inverse)
-                    
-                    # 1. On ignore le filtre "équilibré" si la contrainte était spécifiée
-                    if nutrition_req == "équilibré":
-                        logger.debug("Tentative de relâcher la contrainte nutritionnelle.")
-                        recette_choisie_id, _ = self._traiter_menu_standard(
-                            date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
-                            menu_recent_noms, transportable_req, temps_req, "normal",
-                            ingredients_dates_utilises,
-                            exclure_recettes_ids=exclure_recettes_ids
-                        )
-                        if recette_choisie_id:
-                            remarques_repas += "Contrainte nutritionnelle relâchée. "
-                    
-                    # 2. On ignore le filtre de temps si la contrainte était spécifiée
-                    if not recette_choisie_id and temps_req in ["express", "rapide"]:
-                        logger.debug("Tentative de relâcher la contrainte de temps.")
-                        recette_choisie_id, _ = self._traiter_menu_standard(
-                            date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
-                            menu_recent_noms, transportable_req, "normal", nutrition_req,
-                            ingredients_dates_utilises,
-                            exclure_recettes_ids=exclure_recettes_ids
-                        )
-                        if recette_choisie_id:
-                            remarques_repas += "Contrainte de temps relâchée. "
-
-                    # 3. On ignore le filtre transportable si la contrainte était spécifiée
-                    if not recette_choisie_id and transportable_req == "oui":
-                        logger.debug("Tentative de relâcher la contrainte de transport.")
-                        recette_choisie_id, _ = self._traiter_menu_standard(
-                            date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
-                            menu_recent_noms, "non", temps_req, nutrition_req,
-                            ingredients_dates_utilises,
-                            exclure_recettes_ids=exclure_recettes_ids
-                        )
-                        if recette_choisie_id:
-                            remarques_repas += "Contrainte de transport relâchée. "
-
-                    # 4. On relance le tout sans aucune contrainte spécifiquement demandée par l'utilisateur
-                    if not recette_choisie_id:
-                        logger.debug(f"Dernier recours: relâcher toutes les contraintes de spécificité.")
-                        recette_choisie_id, _ = self._traiter_menu_standard(
-                            date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
-                            menu_recent_noms, "non", "normal", "normal",
-                            ingredients_dates_utilises,
-                            exclure_recettes_ids=exclure_recettes_ids
-                        )
-                        if recette_choisie_id:
-                             remarques_repas += "Contraintes de répétition et de spécificité relâchées. "
-
-
-                if recette_choisie_id:
-                    nom_plat_final = self.recette_manager.obtenir_nom(recette_choisie_id)
-                    temps_prep_final = self.recette_manager.obtenir_temps_preparation(recette_choisie_id)
-                    remarques_repas = remarques_repas if remarques_repas else "Généré automatiquement"
-                else:
-                    nom_plat_final = "Recette non trouvée"
-                    remarques_repas = "Aucune recette appropriée trouvée selon les critères, même relâchés."
+                self._generer_repas(etat, repas_planning_row, exclure_recettes_ids)
+
+        self.etat_final = etat
+        return self._finaliser(etat)
+
+    @property
+    def journal(self):
+        """Journal de la dernière génération (liste d'événements JSON)."""
+        return self.etat_final.journal
+
+    def _rejouer_evenement(self, etat, repas_planning_row, evenement):
+        date_str = repas_planning_row["Date"].strftime("%Y-%m-%d %H:%M")
+        if evenement["date"] != date_str:
+            raise ValueError(f"Le journal ne correspond pas au planning : {evenement['date']} au lieu de {date_str}.")
+        self._generer_repas(etat, repas_planning_row, self.exclure_recettes_ids,
+                            recette_imposee=(evenement["recette_id"], evenement["nom"], evenement["remarques"]))
+        if etat.journal[-1]["stock"] != evenement["stock"]:
+            logger.warning("Rejeu du %s : variations de stock différentes du journal (stock modifié depuis ?).", date_str)
+
+    def remplacer_repas(self, index_repas, recette_id=None):
+        """
+        Remplace le repas n° `index_repas` (planning trié par date) sans
+        régénérer la semaine : l'état est restauré depuis le point de reprise
+        de ce repas, le créneau est re-choisi (ou `recette_id` imposée), puis
+        les repas suivants gardent leur recette tant qu'elle reste valide
+        (pas déjà utilisée, intervalle ingrédient, mot-clé récent) ; les autres
+        sont re-choisis. Renvoie (df_menu, liste_courses) comme generer_menu.
+        """
+        if not getattr(self, "points_reprise", None):
+            raise ValueError("generer_menu doit être appelé avant remplacer_repas.")
+        if not 0 <= index_repas < len(self.repas_planning):
+            raise IndexError(f"Repas {index_repas} hors du planning ({len(self.repas_planning)} repas).")
+
+        anciens_evenements = self.etat_final.journal
+        etat = self._restaurer(self.points_reprise[index_repas])
+        repas = self.repas_planning[index_repas]
+
+        if recette_id is not None:
+            self._generer_repas(etat, repas, self.exclure_recettes_ids,
+                                recette_imposee=(str(recette_id), None, "Remplacé manuellement"))
+        elif self._est_repas_b(str(repas["Participants"])):
+            self._generer_repas(etat, repas, self.exclure_recettes_ids)
+        else:
+            # L'ancien choix est marqué « déjà utilisé » le temps du nouveau tirage
+            ancien_id = anciens_evenements[index_repas]["recette_id"]
+            deja_utilisee = ancien_id in etat.used_recipes_current_generation_set
+            if ancien_id:
+                etat.used_recipes_current_generation_set.add(ancien_id)
+            self._generer_repas(etat, repas, self.exclure_recettes_ids)
+            if ancien_id and not deja_utilisee and etat.journal[-1]["recette_id"] != ancien_id:
+                etat.used_recipes_current_generation_set.discard(ancien_id)
+
+        for index_suivant in range(index_repas + 1, len(self.repas_planning)):
+            self.points_reprise[index_suivant] = self._point_de_reprise(etat)
+            repas = self.repas_planning[index_suivant]
+            ancien = anciens_evenements[index_suivant]
+            ancien_id = ancien["recette_id"]
+            if self._choix_toujours_valide(etat, repas, ancien_id):
+                self._generer_repas(etat, repas, self.exclure_recettes_ids,
+                                    recette_imposee=(ancien_id, ancien["nom"], ancien["remarques"]))
+            else:
+                logger.info("Repas du %s re-choisi après remplacement (recette %s plus valide).", repas["Date"], ancien_id)
+                self._generer_repas(etat, repas, self.exclure_recettes_ids)
+
+        self.etat_final = etat
+        return self._finaliser(etat)
+
+    def _liberer_recettes_anciennes(self, etat, date_repas):
+        """Mode horizon : les recettes servies il y a plus de `etat.fenetre_jours` jours redeviennent disponibles."""
+        limite = date_repas - timedelta(days=etat.fenetre_jours)
+        while etat.utilisations and etat.utilisations[0][0] <= limite:
+            date_utilisation, recette_id = etat.utilisations.popleft()
+            if etat.derniere_utilisation.get(recette_id) == date_utilisation:
+                del etat.derniere_utilisation[recette_id]
+                etat.used_recipes_current_generation_set.discard(recette_id)
+
+    def generer_horizon(self, reassorts=None):
+        """
+        Génère un planning de plusieurs semaines en une passe, le stock simulé
+        étant reporté d'une semaine sur l'autre. Une recette redevient
+        disponible NB_JOURS_ANTI_REPETITION jours après avoir été servie.
+        - reassorts : liste de {"date", "ingredients": {id ingrédient: qte}}
+          ajoutés au stock simulé avant le premier repas à partir de cette date
+        Renvoie (df_menu, listes de courses par semaine, liste de courses totale).
+        Pas de points de reprise dans ce mode (remplacer_repas indisponible).
+        La fenêtre de disponibilité est portée par l'état de cette génération :
+        generer_menu et remplacer_repas ne la voient pas.
+        """
+        self.repas_planning = [row for _, row in self.df_planning.sort_values("Date").iterrows()]
+        self.points_reprise = []
+        a_appliquer = deque(sorted(((pd.Timestamp(r["date"]), r["ingredients"]) for r in reassorts or []), key=lambda r: r[0]))
+        etat = EtatGeneration()
+        etat.fenetre_jours = self.params["NB_JOURS_ANTI_REPETITION"]
+        semaines = []
+
+        for repas_planning_row in self.repas_planning:
+            date_repas = repas_planning_row["Date"]
+            while a_appliquer and a_appliquer[0][0] <= date_repas:
+                date_reassort, quantites = a_appliquer.popleft()
+                logger.info("Réassort du %s : %d ingrédients.", date_reassort, len(quantites))
+                self.recette_manager.reassortir(quantites)
+
+            debut_semaine = (date_repas - timedelta(days=date_repas.weekday())).normalize()
+            if not semaines or semaines[-1]["debut"] != debut_semaine:
+                if semaines:
+                    semaines[-1]["stock_fin"] = dict(self.recette_manager.stock_simule)
+                semaines.append({"debut": debut_semaine, "stock_debut": dict(self.recette_manager.stock_simule), "ingredients": {}})
+
+            self._generer_repas(etat, repas_planning_row, set())
+            ingredients_semaine = semaines[-1]["ingredients"]
+            for ing_id, qte in etat.journal[-1]["ingredients"].items():
+                ingredients_semaine[ing_id] = ingredients_semaine.get(ing_id, 0.0) + qte
+
+        if semaines:
+            semaines[-1]["stock_fin"] = dict(self.recette_manager.stock_simule)
+        self.etat_final = etat
+        df_menu, liste_courses_totale = self._finaliser(etat)
+        with self.diagnostics.phase(PHASE_COURSES):
+            listes_par_semaine = [
+                {"semaine": s["debut"].strftime("%Y-%m-%d"),
+                 "liste_courses": self.generer_liste_courses(s["ingredients"], s["stock_debut"], s["stock_fin"])}
+                for s in semaines
+            ]
+        return df_menu, listes_par_semaine, liste_courses_totale
 
+    def _choix_toujours_valide(self, etat, repas_planning_row, recette_id):
+        """Un repas suivant peut-il garder sa recette après un remplacement ? (les repas B sont toujours re-choisis)"""
+        if not recette_id or self._est_repas_b(str(repas_planning_row["Participants"])):
+            return False
+        if recette_id in etat.used_recipes_current_generation_set:
+            return False
+        if not self.est_intervalle_respecte(recette_id, repas_planning_row["Date"], etat.ingredients_dates_utilises):
+            return False
+        mot_cle = self.recette_manager.mot_cle_recettes.get(recette_id, -1)
+        return mot_cle == -1 or mot_cle not in etat.mots_cles_recents
+
+    def _generer_repas(self, etat, repas_planning_row, exclure_recettes_ids, recette_imposee=None):
+        """Choisit la recette d'un repas du planning et fait avancer `etat` (et le stock simulé)."""
+        date_repas_dt = repas_planning_row["Date"]
+        participants_str = str(repas_planning_row["Participants"])
+        participants_count = self.compter_participants(participants_str)
+        transportable_req = str(repas_planning_row.get("Transportable", "")).strip().lower()
+        temps_req = str(repas_planning_row.get("Temps", "")).strip().lower()
+        nutrition_req = str(repas_planning_row.get("Nutrition", "")).strip().lower()
+
+        used_recipes_current_generation_set = etat.used_recipes_current_generation_set
+        mots_cles_recents = etat.mots_cles_recents
+        ingredients_menu_cumules = etat.ingredients_menu_cumules
+        ingredients_dates_utilises = etat.ingredients_dates_utilises
+
+        logger.info("--- Traitement Planning: %s - Participants: %s ---", date_repas_dt, participants_str)
+        if etat.fenetre_jours is not None:
+            self._liberer_recettes_anciennes(etat, date_repas_dt)
+
+        recette_choisie_id = None
+        nom_plat_final = "Erreur - Plat non défini"
+        remarques_repas = ""
+        temps_prep_final = 0
+
+        if recette_imposee is not None:
+            # Recette déjà décidée (remplacement, repas conservé, rejeu du journal)
+            recette_choisie_id, nom_plat_final, remarques_repas = recette_imposee
             if recette_choisie_id:
-                ingredients_necessaires_ce_repas = self.recette_manager.calculer_quantite_necessaire(recette_choisie_id, participants_count)
-                for ing_id, qte_menu in ingredients_necessaires_ce_repas.items():
-                    current_qte = ingredients_menu_cumules.get(ing_id, 0.0)
-                    ingredients_menu_cumules[ing_id] = current_qte + qte_menu
-                    # 🔹 On enregistre aussi la date du dernier usage de cet ingrédient
-                    ingredients_dates_utilises[ing_id] = date_repas_dt
+                nom_plat_final = nom_plat_final or self.recette_manager.obtenir_nom(recette_choisie_id)
+                temps_prep_final = self.recette_manager.obtenir_temps_preparation(recette_choisie_id)
+                if self._est_repas_b(participants_str):
+                    etat.repas_b_utilises_ids.append(recette_choisie_id)
+            else:
+                nom_plat_final = nom_plat_final or "Recette non trouvée"
+        elif self._est_repas_b(participants_str):
+            nom_plat_final, recette_choisie_id, remarques_repas = self.generer_menu_repas_b(
+                date_repas_dt, etat.plats_transportables_semaine, etat.repas_b_utilises_ids, mots_cles_recents
+            )
+            if recette_choisie_id:
+                temps_prep_final = self.recette_manager.obtenir_temps_preparation(recette_choisie_id)
+        else:
+            # Première tentative de génération avec toutes les contraintes
+            recette_choisie_id, _ = self._traiter_menu_standard(
+                date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
+                mots_cles_recents, transportable_req, temps_req, nutrition_req,
+                ingredients_dates_utilises,
+                exclure_recettes_ids=exclure_recettes_ids
+            )
 
+            if recette_choisie_id is None:
+                # Logique de "dernier recours" si la première tentative échoue
+                logger.warning(f"Pas de recette trouvée pour {date_repas_dt.strftime('%d/%m/%Y')}. Tentative de relâcher les contraintes.")
                 
-                if not self.ne_pas_decrementer_stock:
-                    self.recette_manager.decrementer_stock(recette_choisie_id, participants_count, date_repas_dt)
+                # Relâchement des contraintes une par une (dans un ordre de priorité inverse)
                 
-                used_recipes_current_generation_set.add(recette_choisie_id)
+                # 1. On ignore le filtre "équilibré" si la contrainte était spécifiée
+                if nutrition_req == "équilibré":
+                    logger.debug("Tentative de relâcher la contrainte nutritionnelle.")
+                    recette_choisie_id, _ = self._traiter_menu_standard(
+                        date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
+                        mots_cles_recents, transportable_req, temps_req, "normal",
+                        ingredients_dates_utilises,
+                        exclure_recettes_ids=exclure_recettes_ids
+                    )
+                    if recette_choisie_id:
+                        remarques_repas += "Contrainte nutritionnelle relâchée. "
                 
-                if participants_str != "B" and self.recette_manager.est_transportable(recette_choisie_id):
-                    plats_transportables_semaine[date_repas_dt] = recette_choisie_id
-                    logger.debug(f"'{nom_plat_final}' ({recette_choisie_id}) ajouté à plats_transportables_semaine pour le {date_repas_dt.strftime('%Y-%m-%d')}.")
-                elif participants_str != "B":
-                    logger.debug(f"'{nom_plat_final}' ({recette_choisie_id}) non ajouté à plats_transportables_semaine (transportable_req est '{transportable_req}' ou recette non transportable).")
+                # 2. On ignore le filtre de temps si la contrainte était spécifiée
+                if not recette_choisie_id and temps_req in ["express", "rapide"]:
+                    logger.debug("Tentative de relâcher la contrainte de temps.")
+                    recette_choisie_id, _ = self._traiter_menu_standard(
+                        date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
+                        mots_cles_recents, transportable_req, "normal", nutrition_req,
+                        ingredients_dates_utilises,
+                        exclure_recettes_ids=exclure_recettes_ids
+                    )
+                    if recette_choisie_id:
+                        remarques_repas += "Contrainte de temps relâchée. "
+
+                # 3. On ignore le filtre transportable si la contrainte était spécifiée
+                if not recette_choisie_id and transportable_req == "oui":
+                    logger.debug("Tentative de relâcher la contrainte de transport.")
+                    recette_choisie_id, _ = self._traiter_menu_standard(
+                        date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
+                        mots_cles_recents, "non", temps_req, nutrition_req,
+                        ingredients_dates_utilises,
+                        exclure_recettes_ids=exclure_recettes_ids
+                    )
+                    if recette_choisie_id:
+                        remarques_repas += "Contrainte de transport relâchée. "
+
+                # 4. On relance le tout sans aucune contrainte spécifiquement demandée par l'utilisateur
+                if not recette_choisie_id:
+                    logger.debug("Dernier recours: relâcher toutes les contraintes de spécificité.")
+                    recette_choisie_id, _ = self._traiter_menu_standard(
+                        date_repas_dt, participants_str, participants_count, used_recipes_current_generation_set,
+                        mots_cles_recents, "non", "normal", "normal",
+                        ingredients_dates_utilises,
+                        exclure_recettes_ids=exclure_recettes_ids
+                    )
+                    if recette_choisie_id:
+                         remarques_repas += "Contraintes de répétition et de spécificité relâchées. "
 
 
-            self._log_decision_recette(recette_choisie_id, date_repas_dt, participants_str)
+            if recette_choisie_id:
+                nom_plat_final = self.recette_manager.obtenir_nom(recette_choisie_id)
+                temps_prep_final = self.recette_manager.obtenir_temps_preparation(recette_choisie_id)
+                remarques_repas = remarques_repas if remarques_repas else "Généré automatiquement"
+            else:
+                nom_plat_final = "Recette non trouvée"
+                remarques_repas = "Aucune recette appropriée trouvée selon les critères, même relâchés."
+
+        ingredients_necessaires_ce_repas, ingredients_consommes = {}, {}
+        if recette_choisie_id:
+            ingredients_necessaires_ce_repas = self.recette_manager.calculer_quantite_necessaire(recette_choisie_id, participants_count)
+            for ing_id, qte_menu in ingredients_necessaires_ce_repas.items():
+                current_qte = ingredients_menu_cumules.get(ing_id, 0.0)
+                ingredients_menu_cumules[ing_id] = current_qte + qte_menu
+                # 🔹 On enregistre aussi la date du dernier usage de cet ingrédient
+                ingredients_dates_utilises[ing_id] = date_repas_dt
 
-            self._ajouter_resultat(
-                resultats_df_list, date_repas_dt, nom_plat_final, participants_str,
-                remarques_repas, temps_prep_final, recette_choisie_id
-            )
             
-            if nom_plat_final and "Pas de recette" not in nom_plat_final and "Pas de reste" not in nom_plat_final and "Erreur" not in nom_plat_final and "Invalide" not in nom_plat_final:
-                menu_recent_noms.append(nom_plat_final)
-                if len(menu_recent_noms) > 3:
-                    menu_recent_noms.pop(0)
+            if not self.ne_pas_decrementer_stock:
+                with self.diagnostics.phase(PHASE_STOCK):
+                    ingredients_consommes = self.recette_manager.decrementer_stock(recette_choisie_id, participants_count, date_repas_dt)
+            
+            used_recipes_current_generation_set.add(recette_choisie_id)
+            etat.utilisations.append((date_repas_dt, recette_choisie_id))
+            etat.derniere_utilisation[recette_choisie_id] = date_repas_dt
+            
+            if participants_str != "B" and self.recette_manager.est_transportable(recette_choisie_id):
+                etat.plats_transportables_semaine[date_repas_dt] = recette_choisie_id
+                logger.debug("'%s' (%s) ajouté à plats_transportables_semaine pour le %s.", nom_plat_final, recette_choisie_id, date_repas_dt)
+            elif participants_str != "B":
+                logger.debug("'%s' (%s) non ajouté à plats_transportables_semaine (transportable_req est '%s' ou recette non transportable).", nom_plat_final, recette_choisie_id, transportable_req)
+
+
+        self._log_decision_recette(recette_choisie_id, date_repas_dt, participants_str)
+
+        etat.journal.append(self._evenement_repas(
+            len(etat.journal), date_repas_dt, participants_str, recette_choisie_id, nom_plat_final,
+            remarques_repas, recette_imposee is not None, ingredients_necessaires_ce_repas, ingredients_consommes
+        ))
+        self._ajouter_resultat(
+            etat.resultats, date_repas_dt, nom_plat_final, participants_str,
+            remarques_repas, temps_prep_final, recette_choisie_id
+        )
+        
+        if nom_plat_final and "Pas de recette" not in nom_plat_final and "Pas de reste" not in nom_plat_final and "Erreur" not in nom_plat_final and "Invalide" not in nom_plat_final:
+            mots_cles_recents.append(self.recette_manager.id_mot_cle(nom_plat_final))
+
+    @staticmethod
+    def _evenement_repas(index_repas, date_repas, participants_str, recette_id, nom_plat, remarques, imposee, ingredients_menu, ingredients_consommes):
+        """Événement du journal pour un repas : décision et variations de stock (négatives)."""
+        return {
+            "repas": index_repas,
+            "date": date_repas.strftime("%Y-%m-%d %H:%M"),
+            "participants": participants_str,
+            "recette_id": recette_id,
+            "nom": nom_plat,
+            "remarques": remarques,
+            "imposee": imposee,
+            "ingredients": {ing: round(qte, 6) for ing, qte in ingredients_menu.items()},
+            "stock": {ing: -round(qte, 6) for ing, qte in ingredients_consommes.items()},
+        }
+
+    def _finaliser(self, etat):
+        df_menu_genere = pd.DataFrame(etat.resultats)
+
+        if not df_menu_genere.empty:
+            logger.info(f"Nombre de lignes totales générées : {len(df_menu_genere)}")
+            if 'Date' in df_menu_genere.columns:
+                df_menu_genere['Date'] = pd.to_datetime(df_menu_genere['Date'], format="%d/%m/%Y %H:%M", errors='coerce').dt.strftime('%Y-%m-%d %H:%M')
 
+        with self.diagnostics.phase(PHASE_COURSES):
+            liste_courses_data = self.generer_liste_courses(etat.ingredients_menu_cumules)
 
-        df_menu_genere = pd.DataFrame(resultats_df_list)
+        return df_menu_genere, liste_courses_data
 
+    def generer_liste_courses(self, ingredients_menu_cumules, stock_debut=None, stock_fin=None):
+        """Liste de courses ; `stock_debut`/`stock_fin` remplacent le stock initial/simulé (listes hebdomadaires)."""
         liste_courses_data = []
         for ing_id, qte_menu in ingredients_menu_cumules.items():
             nom_ing = self.recette_manager.obtenir_nom_ingredient_par_id(ing_id)
-            qte_stock_initial = self.recette_manager.obtenir_qte_stock_initial_par_id(ing_id)
+            if stock_debut is None:
+                qte_stock_initial = self.recette_manager.obtenir_qte_stock_initial_par_id(ing_id)
+            else:
+                qte_stock_initial = stock_debut.get(ing_id, 0.0)
             unite = self.recette_manager.obtenir_unite_ingredient_par_id(ing_id) or "unité(s)"
-            qte_stock_simule = self.recette_manager.obtenir_qte_stock_par_id(ing_id)
+            if stock_fin is None:
+                qte_stock_simule = self.recette_manager.obtenir_qte_stock_par_id(ing_id)
+            else:
+                qte_stock_simule = stock_fin.get(ing_id, 0.0)
             qte_acheter = max(0, qte_menu - qte_stock_initial)
 
             liste_courses_data.append({
@@ -1075,17 +1551,16 @@ class MenuGenerator:
                 "Quantité à acheter": f"{qte_acheter:.2f}"
             })
 
-        if not df_menu_genere.empty:
-            logger.info(f"Nombre de lignes totales générées : {len(df_menu_genere)}")
-            if 'Date' in df_menu_genere.columns:
-                df_menu_genere['Date'] = pd.to_datetime(df_menu_genere['Date'], format="%d/%m/%Y %H:%M", errors='coerce').dt.strftime('%Y-%m-%d %H:%M')
-        
         liste_courses_data.sort(key=lambda x: x["Ingredient"])
-
-        return df_menu_genere, liste_courses_data
+        return liste_courses_data
 
 # Nouvelle fonction pour envoyer les données à Notion
-def add_menu_to_notion(df_menu, notion_db_id):
+def add_menu_to_notion(df_menu, notion_db_id, menus_crees=None):
+    """
+    Crée une page Menus par repas. `menus_crees` (liste) reçoit, pour chaque
+    page créée avec une recette, la ligne d'historique correspondante
+    [Nom Menu, Recette, Date] (format de extract_menus).
+    """
     success_count = 0
     failure_count = 0
     
@@ -1153,51 +1628,768 @@ def add_menu_to_notion(df_menu, notion_db_id):
                 }
 
         try:
-            notion.pages.create(
+            get_notion_client().pages.create(
                 parent={"database_id": notion_db_id},
                 properties=new_page_properties
             )
             success_count += 1
+            if menus_crees is not None and "Recette" in new_page_properties:
+                menus_crees.append([str(nom_plat).strip(), recette_id, dt.strftime("%Y-%m-%d")])
         except Exception as e:
             logger.error(f"Erreur lors de l'envoi de la ligne '{nom_plat}' à Notion : {e}")
             failure_count += 1
             
     return success_count, failure_count
 
-# --- Streamlit UI ---
+# ────── API BIBLIOTHÈQUE (SANS STREAMLIT) ────────────────────────
+# Utilisée par l'interface Streamlit et par la ligne de commande (menus.py).
+FICHIERS_SNAPSHOT = {
+    "Recettes": "Recettes.csv",
+    "Menus": "Menus.csv",
+    "Ingredients": "Ingredients.csv",
+    "Ingredients_recettes": "Ingredients_recettes.csv",
+}
+TYPAGE_SNAPSHOT = {
+    "Recettes": typer_recettes,
+    "Menus": typer_menus,
+    "Ingredients": typer_ingredients,
+    "Ingredients_recettes": typer_ingredients_recettes,
+}
 
-@st.cache_data(show_spinner=False)
-def load_notion_data(saison_filtre_selection):
+def params_par_defaut():
+    return {
+        "NB_JOURS_ANTI_REPETITION": NB_JOURS_ANTI_REPETITION_DEFAULT,
+        "REPAS_EQUILIBRE": REPAS_EQUILIBRE_DEFAULT,
+        "TEMPS_MAX_EXPRESS": TEMPS_MAX_EXPRESS_DEFAULT,
+        "TEMPS_MAX_RAPIDE": TEMPS_MAX_RAPIDE_DEFAULT,
+    }
+
+class VolUnique:
     """
-    Charge les données de Notion. Utilise le cache Streamlit pour ne pas recharger.
+    Coalescence des chargements concurrents : pour une même clé, un seul
+    appel exécute la fonction ; les appels arrivés pendant son exécution
+    l'attendent et reçoivent le même résultat (ou la même exception). Rien
+    n'est gardé une fois l'appel terminé (les caches sont ailleurs).
     """
-    st.sidebar.info("Chargement des données depuis Notion en cours...")
-    
-    with st.spinner("Chargement des Menus..."):
-        df_menus = extract_menus()
-    st.sidebar.success("✅ Menus chargés.")
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._en_cours = {}
+
+    def executer(self, cle, fonction, *args, **kwargs):
+        with self._verrou:
+            vol = self._en_cours.get(cle)
+            meneur = vol is None
+            if meneur:
+                vol = self._en_cours[cle] = {"fini": threading.Event()}
+        if not meneur:
+            logger.debug("Chargement %s déjà en cours : attente de son résultat.", cle)
+            vol["fini"].wait()
+            if "erreur" in vol:
+                raise vol["erreur"]
+            return vol["resultat"]
+        try:
+            vol["resultat"] = fonction(*args, **kwargs)
+            return vol["resultat"]
+        except BaseException as e:
+            vol["erreur"] = e
+            raise
+        finally:
+            with self._verrou:
+                del self._en_cours[cle]
+            vol["fini"].set()
+
+# Chargements de tables partagés par les sessions, rafraîchissements et threads
+# du processus : deux saisons ou deux fenêtres d'historique différentes ne
+# parcourent qu'une fois les bases qu'elles ont en commun.
+VOLS_CHARGEMENT = VolUnique()
+
+def extraire_donnees_notion(saison_filtre, jours_anti_repetition=None, debut_planning=None):
+    """
+    Les quatre bases Notion, typées, sans interface. Avec
+    `jours_anti_repetition`, l'historique est fenêtré (voir
+    charger_historique_menus) : "Menus" ne contient que les menus précédant
+    `debut_planning` (aujourd'hui par défaut) et "Menus_resume" résume les
+    plus anciens. Lève ParcoursIncomplet si une base n'a pas pu être lue
+    entièrement.
+    """
+    vol = VOLS_CHARGEMENT.executer
+    donnees = {
+        "Recettes": vol(("notion", "Recettes", saison_filtre), extract_recettes, saison_filtre),
+        "Ingredients": vol(("notion", "Ingredients"), extract_ingredients),
+        "Ingredients_recettes": vol(("notion", "Ingredients_recettes"), extract_ingr_rec),
+    }
+    if jours_anti_repetition is None:
+        donnees["Menus"] = vol(("notion", "Menus"), extract_menus)
+    else:
+        jours = jours_historique_necessaires(jours_anti_repetition, donnees["Ingredients"])
+        if debut_planning is not None:
+            debut_planning = pd.Timestamp(debut_planning).normalize()
+        donnees["Menus"], donnees["Menus_resume"] = vol(("notion", "Menus", jours, debut_planning), charger_historique_menus,
+                                                        jours, debut_planning=debut_planning)
+    return donnees
+
+# Format binaire : un fichier Arrow IPC (Feather v2) non compressé par table,
+# colonnes déjà typées (identifiants en dictionnaire/catégorie). Les fichiers
+# sont projetés en mémoire à la lecture : pas d'analyse de texte, et les
+# processus qui lisent le même snapshot partagent les pages du cache système.
+FORMATS_SNAPSHOT = ("csv", "arrow")
+
+def _feather():
+    if importlib.util.find_spec("pyarrow") is None:
+        raise ImportError("Le format de snapshot 'arrow' nécessite pyarrow (pip install pyarrow).")
+    import pyarrow.feather as feather
+    return feather
+
+def _chemin_arrow(dossier, fichier):
+    return os.path.join(dossier, os.path.splitext(fichier)[0] + ".arrow")
+
+def ecrire_snapshot(donnees, dossier, format_fichiers="csv"):
+    if format_fichiers not in FORMATS_SNAPSHOT:
+        raise ValueError(f"Format de snapshot inconnu : {format_fichiers} ({', '.join(FORMATS_SNAPSHOT)})")
+    os.makedirs(dossier, exist_ok=True)
+    for nom, fichier in FICHIERS_SNAPSHOT.items():
+        if format_fichiers == "csv":
+            donnees[nom].to_csv(os.path.join(dossier, fichier), index=False, encoding="utf-8-sig")
+            continue
+        chemin = _chemin_arrow(dossier, fichier)
+        temporaire = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # Écriture puis renommage : un lecteur ne voit jamais un fichier partiel
+        _feather().write_feather(TYPAGE_SNAPSHOT[nom](donnees[nom]), temporaire, compression="uncompressed")
+        os.replace(temporaire, chemin)
+
+# Un dossier de données contient les quatre tables, chacune au premier format
+# trouvé dans cet ordre : .arrow (ecrire_snapshot, déjà typé et projeté en
+# mémoire), .feather, .parquet, .csv (exports de Generateur.py ou snapshot).
+EXTENSIONS_DONNEES = (".arrow", ".feather", ".parquet", ".csv")
+
+def _lire_table(dossier, fichier):
+    """(DataFrame, déjà typé ?) pour la table `fichier` de `dossier`."""
+    base = os.path.join(dossier, os.path.splitext(fichier)[0])
+    for extension in EXTENSIONS_DONNEES:
+        chemin = base + extension
+        if not os.path.exists(chemin):
+            continue
+        if extension == ".arrow":
+            return _feather().read_table(chemin, memory_map=True).to_pandas(), True
+        if extension == ".feather":
+            return _feather().read_feather(chemin), False
+        if extension == ".parquet":
+            return pd.read_parquet(chemin), False
+        return pd.read_csv(chemin, dtype=str, keep_default_na=False, encoding="utf-8-sig"), False
+    raise FileNotFoundError(f"{fichier} introuvable dans {dossier} (formats : {', '.join(EXTENSIONS_DONNEES)})")
+
+def charger_snapshot(dossier):
+    """
+    Relit un dossier de données (snapshot ou exports de Generateur.py) et
+    type les tables qui ne le sont pas déjà.
+    """
+    donnees = {}
+    for nom, fichier in FICHIERS_SNAPSHOT.items():
+        df, deja_type = _lire_table(dossier, fichier)
+        if nom == "Ingredients" and "Intervalle" not in df.columns:
+            logger.warning("Ingredients sans colonne 'Intervalle' (ancien export de Generateur.py) : aucun intervalle appliqué.")
+            df["Intervalle"] = 0.0
+        donnees[nom] = df if deja_type else TYPAGE_SNAPSHOT[nom](df)
+    return donnees
+
+def signature_dossier(dossier):
+    """(nom, taille, date de modification) des fichiers du dossier : change dès qu'un export est remplacé."""
+    return tuple(sorted((entree.name, entree.stat().st_size, entree.stat().st_mtime_ns)
+                        for entree in os.scandir(dossier) if entree.is_file()))
+
+def lire_planning(fichier):
+    return pd.read_csv(fichier, encoding='utf-8', sep=';', parse_dates=['Date'], dayfirst=True)
+
+COLONNES_ATTENDUES = {
+    "Recettes": [COLONNE_ID_RECETTE, COLONNE_NOM, COLONNE_TEMPS_TOTAL, COLONNE_AIME_PAS_PRINCIP, "Transportable", "Calories", "Proteines"],
+    "Planning": ["Date", "Participants", "Transportable", "Temps", "Nutrition"],
+    "Menus": ["Date", "Recette"],
+    "Ingredients": [COLONNE_ID_INGREDIENT, "Nom", "Qte reste", "unité", "Intervalle"],
+    "Ingredients_recettes": [COLONNE_ID_RECETTE, "Ingrédient ok", "Qté/pers_s"],
+}
 
-    with st.spinner(f"Chargement des Recettes pour la saison '{saison_filtre_selection}'..."):
-        df_recettes = extract_recettes(saison_filtre_selection)
-    st.sidebar.success("✅ Recettes chargées.")
+def verifier_donnees(dataframes):
+    """Vérifie les colonnes des tables présentes dans `dataframes`."""
+    for nom, colonnes in COLONNES_ATTENDUES.items():
+        if nom in dataframes:
+            verifier_colonnes(dataframes[nom], colonnes, "Planning.csv" if nom == "Planning" else nom)
+
+def empreinte_dataframes(*dataframes):
+    """Empreinte SHA-256 du contenu (colonnes et valeurs) d'une suite de DataFrames."""
+    h = hashlib.sha256()
+    for df in dataframes:
+        h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+def _copie_resultat(resultat):
+    """Copie d'un résultat sans ses générateurs : DataFrames copiés, listes et dicts copiés en profondeur."""
+    return {k: v.copy() if isinstance(v, pd.DataFrame) else copy.deepcopy(v)
+            for k, v in resultat.items() if not k.startswith("generateur_")}
+
+class CacheResultats:
+    """
+    Cache LRU en mémoire des résultats de generer_menus, partageable entre
+    threads. Les générateurs ne sont pas conservés ; le cache garde sa propre
+    copie du résultat et renvoie une copie à chaque lecture, de sorte que
+    l'appelant peut modifier ce qu'il reçoit ou ce qu'il a enregistré.
+    """
+    def __init__(self, taille_max=64):
+        self.taille_max = taille_max
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle):
+        with self._verrou:
+            resultat = self._entrees.get(cle)
+            if resultat is None:
+                return None
+            self._entrees.move_to_end(cle)
+        return _copie_resultat(resultat)
+
+    def enregistrer(self, cle, resultat):
+        resultat = _copie_resultat(resultat)
+        with self._verrou:
+            self._entrees[cle] = resultat
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+DOSSIER_CACHE_RESULTATS = os.path.join(".cache", "menus")
+TAILLE_MAX_CACHE_RESULTATS = 50 * 1024 * 1024  # octets
+
+def _resultat_vers_json(resultat):
+    """DataFrames → {"colonnes", "types", "lignes"} ; le reste (listes, dicts, scalaires) est déjà du JSON."""
+    return {k: {"dataframe": {"colonnes": list(v.columns),
+                              "types": {c: str(t) for c, t in v.dtypes.items()},
+                              "lignes": v.astype(object).where(v.notna(), None).values.tolist()}}
+               if isinstance(v, pd.DataFrame) else {"valeur": v}
+            for k, v in resultat.items()}
+
+def _resultat_depuis_json(donnees):
+    resultat = {}
+    for k, v in donnees.items():
+        if "dataframe" in v:
+            df = v["dataframe"]
+            resultat[k] = pd.DataFrame(df["lignes"], columns=df["colonnes"]).astype(df["types"])
+        else:
+            resultat[k] = v["valeur"]
+    return resultat
 
-    with st.spinner("Chargement des Ingrédients..."):
-        df_ingredients = extract_ingredients()
-    st.sidebar.success("✅ Ingrédients chargés.")
+class CacheResultatsDisque:
+    """
+    Cache persistant des résultats de generer_menus, adressé par contenu :
+    un fichier JSON par clé (SHA-256 de la clé) dans `dossier`. Seul du JSON
+    est relu (jamais de pickle) : un fichier déposé dans le dossier ne peut
+    pas exécuter de code. Les fichiers les moins récemment lus sont supprimés
+    au-delà de `taille_max_octets`. Même interface que CacheResultats.
+    """
+    def __init__(self, dossier=DOSSIER_CACHE_RESULTATS, taille_max_octets=TAILLE_MAX_CACHE_RESULTATS):
+        self.dossier = dossier
+        self.taille_max_octets = taille_max_octets
+        self._verrou = threading.Lock()
+        os.makedirs(dossier, exist_ok=True)
+
+    def _chemin(self, cle):
+        return os.path.join(self.dossier, hashlib.sha256(repr(cle).encode("utf-8")).hexdigest() + ".json")
+
+    def obtenir(self, cle):
+        chemin = self._chemin(cle)
+        # Lecture hors verrou : os.replace rend l'écriture atomique
+        try:
+            with open(chemin, encoding="utf-8") as f:
+                resultat = _resultat_depuis_json(json.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Entrée de cache illisible supprimée ({chemin}) : {e}")
+            with suppress(OSError):
+                os.remove(chemin)
+            return None
+        with suppress(OSError):
+            os.utime(chemin)  # date de dernier accès pour l'éviction LRU
+        return resultat
+
+    def enregistrer(self, cle, resultat):
+        donnees = _resultat_vers_json({k: v for k, v in resultat.items() if not k.startswith("generateur_")})
+        chemin = self._chemin(cle)
+        temporaire = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(donnees, f, ensure_ascii=False)
+        os.replace(temporaire, chemin)
+        with self._verrou:
+            self._evincer()
+
+    def _evincer(self):
+        entrees = []
+        for nom in os.listdir(self.dossier):
+            if nom.endswith(".json"):
+                with suppress(OSError):
+                    stat = os.stat(os.path.join(self.dossier, nom))
+                    entrees.append((stat.st_mtime, stat.st_size, nom))
+        taille_totale = sum(taille for _, taille, _ in entrees)
+        for _, taille, nom in sorted(entrees):
+            if taille_totale <= self.taille_max_octets:
+                break
+            with suppress(OSError):
+                os.remove(os.path.join(self.dossier, nom))
+            taille_totale -= taille
+
+def cle_resultat(donnees_indexees, df_planning, params, stock_overrides, graine, alternatif):
+    """Clé du cache : (données, planning, paramètres, corrections de stock, graine, avec alternatif)."""
+    return (
+        donnees_indexees.empreinte,
+        empreinte_dataframes(df_planning),
+        json.dumps(params, sort_keys=True, default=str),
+        json.dumps(stock_overrides or {}, sort_keys=True, default=str),
+        graine,
+        alternatif,
+    )
 
-    with st.spinner("Chargement des Ingrédients-Recettes..."):
-        df_ingredients_recettes = extract_ingr_rec()
-    st.sidebar.success("✅ Ingrédients-Recettes chargés.")
+def _recettes_du_menu(df_menu):
+    """Recettes d'un menu généré, exclues du menu Alternatif."""
+    if df_menu.empty:
+        return set()
+    return set(df_menu[df_menu['Recette_ID'].notna()]['Recette_ID'].astype(str).tolist())
 
-    st.sidebar.success("Toutes les données de Notion sont prêtes.")
-    
+def _regenerateurs_depuis_journaux(resultat, df_planning, params, donnees_indexees, stock_overrides, diagnostics):
+    """
+    Reconstruit les générateurs d'un résultat mis en cache en rejouant ses
+    journaux (sans nouvelle sélection). L'Alternatif garde l'exclusion des
+    recettes de l'Optimal, utilisée par remplacer_repas.
+    """
+    generateurs = {}
+    for mode, ne_pas_decrementer in (("realiste", False), ("alternatif", True)):
+        if f"journal_{mode}" not in resultat:
+            continue
+        generateur = MenuGenerator(None, None, df_planning, None, None, ne_pas_decrementer_stock=ne_pas_decrementer,
+                                   params=params, diagnostics=diagnostics, donnees_indexees=donnees_indexees,
+                                   stock_overrides=stock_overrides)
+        exclues = _recettes_du_menu(resultat["df_menu_realiste"]) if mode == "alternatif" else None
+        generateur.generer_menu(mode=mode, exclure_recettes_ids=exclues, journal=resultat[f"journal_{mode}"])
+        generateurs[f"generateur_{mode}"] = generateur
+    return generateurs
+
+def generer_menus(dataframes, params, diagnostics=None, donnees_indexees=None, stock_overrides=None, alternatif=True, journal_realiste=None, graine=None, cache=None, avec_generateurs=True):
+    """
+    Génère le menu Optimal (avec stock) puis le menu Alternatif (sans stock,
+    sans les recettes de l'Optimal). Les clés du résultat sont celles de
+    st.session_state dans l'interface.
+
+    `donnees_indexees` évite de reconstruire les index (seul "Planning" est
+    alors lu dans `dataframes`) ; `stock_overrides` corrige le stock initial
+    ({id ingrédient: quantité}). Avec `alternatif=False`, seul le menu
+    Optimal est généré. `journal_realiste` (journal d'une génération
+    précédente) est rejoué avant de générer les repas restants de l'Optimal.
+
+    Avec une `graine`, la génération est reproductible ; si un `cache`
+    (CacheResultats, CacheResultatsDisque) est fourni, un résultat déjà
+    calculé pour les mêmes données, planning, paramètres et graine est
+    renvoyé ; ses générateurs sont reconstruits en rejouant les journaux,
+    sauf avec `avec_generateurs=False`.
+    """
+    if donnees_indexees is None:
+        with (diagnostics or Diagnostics()).phase(PHASE_INDEX):
+            donnees_indexees = DonneesIndexees.depuis_dataframes(dataframes)
+
+    cle = None
+    if cache is not None and graine is not None and journal_realiste is None:
+        cle = cle_resultat(donnees_indexees, dataframes["Planning"], params, stock_overrides, graine, alternatif)
+        resultat = cache.obtenir(cle)
+        if resultat is not None:
+            logger.info("Résultat servi depuis le cache (graine %s).", graine)
+            if avec_generateurs:
+                resultat.update(_regenerateurs_depuis_journaux(
+                    resultat, dataframes["Planning"], params, donnees_indexees, stock_overrides, diagnostics))
+            return resultat
+
+    graine_realiste, graine_alternatif = np.random.SeedSequence(graine).spawn(2) if graine is not None else (None, None)
+
+    menu_generator_realiste = MenuGenerator(
+        None, None,
+        dataframes["Planning"],
+        None, None,
+        ne_pas_decrementer_stock=False,
+        params=params,
+        diagnostics=diagnostics,
+        donnees_indexees=donnees_indexees,
+        stock_overrides=stock_overrides,
+        graine=graine_realiste
+    )
+    df_menu_realiste, liste_courses_realiste = menu_generator_realiste.generer_menu(mode='realiste', journal=journal_realiste)
+    resultat = {
+        "df_menu_realiste": df_menu_realiste,
+        "liste_courses_realiste": liste_courses_realiste,
+        "journal_realiste": menu_generator_realiste.journal,
+        # Gardé pour remplacer un repas sans tout régénérer (remplacer_repas)
+        "generateur_realiste": menu_generator_realiste,
+    }
+
+    if alternatif:
+        recettes_a_exclure = _recettes_du_menu(df_menu_realiste)
+
+        menu_generator_alternatif = MenuGenerator(
+            None, None,
+            dataframes["Planning"],
+            None, None,
+            ne_pas_decrementer_stock=True,
+            params=params,
+            diagnostics=diagnostics,
+            donnees_indexees=donnees_indexees,
+            stock_overrides=stock_overrides,
+            graine=graine_alternatif
+        )
+        df_menu_alternatif, liste_courses_alternatif = menu_generator_alternatif.generer_menu(mode='alternatif', exclure_recettes_ids=recettes_a_exclure)
+        resultat.update({
+            "df_menu_alternatif": df_menu_alternatif,
+            "liste_courses_alternatif": liste_courses_alternatif,
+            "journal_alternatif": menu_generator_alternatif.journal,
+            "generateur_alternatif": menu_generator_alternatif,
+        })
+
+    if cle is not None:
+        cache.enregistrer(cle, resultat)
+    return resultat
+
+HORIZON_MAX_SEMAINES = 12
+
+def etendre_planning(df_planning, semaines):
+    """Répète un planning type d'une semaine sur `semaines` semaines consécutives."""
+    if not 1 <= semaines <= HORIZON_MAX_SEMAINES:
+        raise ValueError(f"Horizon de {semaines} semaines : entre 1 et {HORIZON_MAX_SEMAINES} semaines attendues.")
+    dates = pd.to_datetime(df_planning["Date"])
+    return pd.concat(
+        [df_planning.assign(Date=dates + pd.Timedelta(weeks=k)) for k in range(semaines)],
+        ignore_index=True
+    )
+
+def generer_horizon(dataframes, params, semaines, reassorts=None, diagnostics=None, donnees_indexees=None, stock_overrides=None, graine=None):
+    """
+    Menu Optimal sur `semaines` semaines à partir d'un planning type d'une
+    semaine (dataframes["Planning"]), avec stock reporté et réassorts
+    éventuels (voir MenuGenerator.generer_horizon).
+    """
+    if donnees_indexees is None:
+        with (diagnostics or Diagnostics()).phase(PHASE_INDEX):
+            donnees_indexees = DonneesIndexees.depuis_dataframes(dataframes)
+    generateur = MenuGenerator(
+        None, None,
+        etendre_planning(dataframes["Planning"], semaines),
+        None, None,
+        ne_pas_decrementer_stock=False,
+        params=params,
+        diagnostics=diagnostics,
+        donnees_indexees=donnees_indexees,
+        stock_overrides=stock_overrides,
+        graine=graine
+    )
+    df_menu, listes_par_semaine, liste_courses = generateur.generer_horizon(reassorts)
     return {
-        "Menus": df_menus,
-        "Recettes": df_recettes,
-        "Ingredients": df_ingredients,
-        "Ingredients_recettes": df_ingredients_recettes
+        "df_menu": df_menu,
+        "listes_courses_par_semaine": listes_par_semaine,
+        "liste_courses": liste_courses,
+        "journal": generateur.journal,
     }
 
+# ────── GÉNÉRATION PAR LOT (PLUSIEURS FOYERS) ────────────────────
+# Les index sont construits une fois dans le processus parent puis transmis
+# à chaque processus du pool à son démarrage ; chaque job ne fournit que son
+# planning, ses corrections de stock et ses paramètres.
+_INDEX_PROCESSUS = None
+
+def _initialiser_processus(donnees_indexees):
+    global _INDEX_PROCESSUS
+    _INDEX_PROCESSUS = donnees_indexees
+
+def _executer_job(job):
+    try:
+        df_planning = job["planning"]
+        if not isinstance(df_planning, pd.DataFrame):
+            df_planning = lire_planning(df_planning)
+        verifier_colonnes(df_planning, COLONNES_ATTENDUES["Planning"], f"Planning ({job['id']})")
+        params = {**params_par_defaut(), **job.get("params", {})}
+        resultat = generer_menus({"Planning": df_planning}, params,
+                                 donnees_indexees=_INDEX_PROCESSUS, stock_overrides=job.get("stock"),
+                                 graine=job.get("graine"))
+        # Les générateurs (et leurs index) ne repassent pas par le pool
+        resultat.pop("generateur_realiste", None)
+        resultat.pop("generateur_alternatif", None)
+        return {"id": job["id"], "ok": True, **resultat}
+    except Exception as e:
+        logger.error(f"Job {job.get('id')} en échec : {e}")
+        return {"id": job.get("id"), "ok": False, "erreur": str(e)}
+
+def generer_menus_lot(dataframes, jobs, processus=None):
+    """
+    Génère les menus de plusieurs foyers en parallèle.
+
+    - dataframes : Recettes, Menus, Ingredients, Ingredients_recettes (communs)
+    - jobs : liste de dicts {"id", "planning" (DataFrame ou chemin CSV),
+      "stock" (optionnel, {id ingrédient: quantité}), "params" (optionnel),
+      "graine" (optionnel)}
+    Renvoie un résultat par job, dans l'ordre des jobs.
+    """
+    verifier_donnees(dataframes)
+    donnees_indexees = DonneesIndexees.depuis_dataframes(dataframes)
+    if processus == 1:
+        _initialiser_processus(donnees_indexees)
+        return [_executer_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processus, initializer=_initialiser_processus,
+                             initargs=(donnees_indexees,)) as executor:
+        return list(executor.map(_executer_job, jobs))
+
+# ────── RAFRAÎCHISSEMENT EN ARRIÈRE-PLAN ────────────────────────
+INTERVALLE_RAFRAICHISSEMENT_S = int(os.environ.get("MENUS_RAFRAICHISSEMENT_S", 15 * 60))
+INACTIVITE_MAX_RAFRAICHISSEMENT = 8  # intervalles sans consultation avant mise en veille
+
+class RafraichisseurDonnees:
+    """
+    Garde en mémoire le dernier jeu de données complet d'une source et ses
+    index, rechargés par un thread toutes les `intervalle_s` secondes. Le
+    nouveau jeu est construit à côté puis substitué d'un bloc : instantane()
+    ne bloque qu'au tout premier chargement.
+
+    Un instantané est un dict {"version", "dataframes", "donnees_indexees",
+    "date"} ; la version augmente à chaque substitution. Sans consultation
+    pendant INACTIVITE_MAX_RAFRAICHISSEMENT intervalles, le thread s'arrête ;
+    il repart à la consultation suivante.
+    """
+    _instances = weakref.WeakSet()
+
+    def __init__(self, charger, intervalle_s=INTERVALLE_RAFRAICHISSEMENT_S, nom="donnees"):
+        self.charger = charger
+        self.intervalle_s = intervalle_s
+        self.nom = nom
+        self._instantane = None
+        self._erreur = None  # échec du premier chargement, tant qu'aucun instantané n'est publié
+        self._version = 0
+        # (instant, DataFrame) des menus ajoutés par ajouter_menus, à réappliquer
+        # sur un rechargement commencé avant leur envoi
+        self._menus_ajoutes = []
+        self._verrou_historique = threading.Lock()  # substitutions de l'historique, une à la fois
+        RafraichisseurDonnees._instances.add(self)
+        self._verrou = threading.Lock()
+        self._pret = threading.Event()
+        self._reveil = threading.Event()
+        self._thread = None
+        self._arrete = False
+        self._derniere_consultation = time.monotonic()
+
+    def demarrer(self):
+        with self._verrou:
+            if self._arrete:
+                return self
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._boucle, daemon=True, name=f"rafraichissement-{self.nom}")
+                self._thread.start()
+        return self
+
+    def _boucle(self):
+        while True:
+            self.rafraichir()
+            self._reveil.wait(self.intervalle_s)
+            self._reveil.clear()
+            if self._arrete:
+                return
+            if time.monotonic() - self._derniere_consultation > self.intervalle_s * INACTIVITE_MAX_RAFRAICHISSEMENT:
+                logger.info(f"Rafraîchissement '{self.nom}' mis en veille (aucune consultation).")
+                return
+
+    def rafraichir(self):
+        """
+        Recharge et réindexe la source ; garde l'instantané courant en cas
+        d'échec, y compris une base lue en partie (ParcoursIncomplet). Des
+        appels simultanés sur la même version ne font qu'un rechargement.
+        """
+        return VOLS_CHARGEMENT.executer(("rafraichissement", self.nom, self._version), self._recharger)
+
+    def _recharger(self):
+        debut = time.perf_counter()
+        debut_chargement = time.monotonic()
+        try:
+            dataframes = self.charger()
+            verifier_donnees(dataframes)
+            vides = [nom for nom in FICHIERS_SNAPSHOT if dataframes[nom].empty]
+            if vides and self._instantane is not None:
+                # Lue entièrement mais vide : filtre ou droits d'accès changés, pas de menus sans recettes
+                raise ValueError(f"table(s) vide(s) : {', '.join(vides)}")
+            donnees_indexees = DonneesIndexees.depuis_dataframes(dataframes)
+        except Exception as e:
+            logger.error(f"Rafraîchissement '{self.nom}' échoué, données précédentes conservées : {e}")
+            if self._instantane is None:
+                # Premier chargement : instantane() lève l'erreur au lieu d'attendre indéfiniment
+                self._erreur = e
+                self._pret.set()
+            return False
+        with self._verrou_historique:
+            if self._instantane is not None:
+                # Au premier chargement, tous les menus reçus en attendant sont gardés
+                self._menus_ajoutes = [(instant, df) for instant, df in self._menus_ajoutes if instant >= debut_chargement]
+            self.publier(dataframes, donnees_indexees)
+            if self._menus_ajoutes:
+                # Envoyés pendant le parcours : peut-être absents de ce qu'il a lu
+                self._integrer_menus(pd.concat([df for _, df in self._menus_ajoutes], ignore_index=True))
+        logger.info(f"Données '{self.nom}' rafraîchies en {time.perf_counter() - debut:.1f}s (version {self._version}).")
+        return True
+
+    def publier(self, dataframes, donnees_indexees):
+        with self._verrou:
+            self._version += 1
+            self._instantane = {"version": self._version, "dataframes": dataframes,
+                                "donnees_indexees": donnees_indexees, "date": datetime.now()}
+            self._erreur = None
+        self._pret.set()
+
+    def ajouter_menus(self, df_menus):
+        """
+        Ajoute à l'historique de l'instantané courant des menus tout juste
+        créés dans Notion (colonnes de extract_menus), sans relecture : seul
+        l'index d'historique est reconstruit, et la version augmente. Avant le
+        premier chargement, les menus sont mis de côté et intégrés à sa
+        publication.
+        """
+        if df_menus.empty:
+            return
+        with self._verrou_historique:
+            self._menus_ajoutes.append((time.monotonic(), df_menus))
+            if self._instantane is not None:
+                self._integrer_menus(df_menus)
+
+    def _integrer_menus(self, df_menus):
+        """Appelé sous _verrou_historique ; ignore les (recette, date) déjà présents."""
+        instantane = self._instantane
+        df_hist = instantane["dataframes"]["Menus"]
+        cles = ["Recette", "Date"]
+        nouveaux = typer_menus(df_menus)
+        presents = set(zip(*(df_hist[col].astype(str) for col in cles)))
+        nouveaux = nouveaux[[cle not in presents for cle in zip(*(nouveaux[col].astype(str) for col in cles))]]
+        if nouveaux.empty:
+            return
+        df_hist = typer_menus(pd.concat([df_hist.astype({"Recette": str}), nouveaux.astype({"Recette": str})],
+                                        ignore_index=True))
+        dataframes = {**instantane["dataframes"], "Menus": df_hist}
+        donnees_indexees = instantane["donnees_indexees"].avec_historique(df_hist, dataframes.get("Menus_resume"))
+        self.publier(dataframes, donnees_indexees)
+        logger.info(f"{len(nouveaux)} menu(s) ajouté(s) à l'historique '{self.nom}' (version {self._version}).")
+
+    @classmethod
+    def ajouter_menus_partout(cls, df_menus):
+        """ajouter_menus sur tous les rafraîchisseurs du processus (toutes saisons)."""
+        for rafraichisseur in list(cls._instances):
+            rafraichisseur.ajouter_menus(df_menus)
+
+    def arreter(self):
+        """Arrête définitivement le thread ; l'instantané courant reste lisible."""
+        with self._verrou:
+            self._arrete = True
+        self._reveil.set()
+
+    def demander_rafraichissement(self):
+        """Avance le prochain rafraîchissement à maintenant."""
+        self.demarrer()
+        self._reveil.set()
+
+    def instantane(self, timeout=None):
+        self._derniere_consultation = time.monotonic()
+        self.demarrer()
+        if not self._pret.wait(timeout):
+            raise TimeoutError(f"Données '{self.nom}' pas encore chargées.")
+        instantane = self._instantane
+        if instantane is None:
+            raise RuntimeError(f"Chargement des données '{self.nom}' échoué : {self._erreur}")
+        return instantane
+
+MAX_RAFRAICHISSEURS = int(os.environ.get("MENUS_MAX_RAFRAICHISSEURS", 4))
+
+class RegistreRafraichisseurs:
+    """
+    Rafraîchisseurs par clé (saison, fenêtre d'historique), au plus
+    `taille_max` : le moins récemment demandé est arrêté et oublié, avec son
+    instantané et ses index. Le nombre de threads et de jeux en mémoire ne
+    dépend donc pas des valeurs saisies dans l'interface.
+    """
+    def __init__(self, taille_max=MAX_RAFRAICHISSEURS):
+        self.taille_max = taille_max
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle, creer):
+        evinces = []
+        with self._verrou:
+            rafraichisseur = self._entrees.get(cle)
+            if rafraichisseur is None:
+                rafraichisseur = self._entrees[cle] = creer()
+                while len(self._entrees) > self.taille_max:
+                    evinces.append(self._entrees.popitem(last=False)[1])
+            else:
+                self._entrees.move_to_end(cle)
+        for ancien in evinces:
+            logger.info(f"Rafraîchissement '{ancien.nom}' arrêté (remplacé par '{rafraichisseur.nom}').")
+            ancien.arreter()
+        return rafraichisseur.demarrer()
+
+# --- Streamlit UI ---
+
+@st.cache_resource
+def cache_resultats():
+    """Cache disque des menus générés avec une graine, partagé par toutes les sessions."""
+    return CacheResultatsDisque()
+
+@st.cache_resource
+def registre_rafraichisseurs():
+    """Registre unique par processus (survit aux réexécutions du script)."""
+    return RegistreRafraichisseurs()
+
+def rafraichisseur_notion(saison_filtre_selection, jours_anti_repetition=NB_JOURS_ANTI_REPETITION_DEFAULT, debut_planning=None):
+    """
+    Données Notion d'une saison, partagées par toutes les sessions et
+    rafraîchies en arrière-plan (MENUS_RAFRAICHISSEMENT_S secondes). Le
+    chargement démarre dès le premier affichage de la page. `debut_planning`
+    (planning commençant avant aujourd'hui) recule la fenêtre d'historique.
+    Au plus MAX_RAFRAICHISSEURS combinaisons sont gardées (RegistreRafraichisseurs).
+    """
+    nom = f"notion-{saison_filtre_selection}-{jours_anti_repetition}"
+    if debut_planning is not None:
+        nom += f"-{debut_planning:%Y%m%d}"
+    return registre_rafraichisseurs().obtenir(
+        (saison_filtre_selection, jours_anti_repetition, debut_planning),
+        lambda: RafraichisseurDonnees(
+            lambda: extraire_donnees_notion(saison_filtre_selection, jours_anti_repetition, debut_planning),
+            nom=nom
+        )
+    )
+
+SOURCE_NOTION = "Notion"
+SOURCE_DOSSIER = "Dossier local"
+DOSSIER_DONNEES_DEFAUT = os.environ.get("MENUS_DOSSIER_DONNEES", "snapshot")
+
+@st.cache_data(show_spinner=False)
+def load_local_data(dossier, signature):
+    """
+    Charge un dossier de données local (exports de Generateur.py ou snapshot
+    de menus.py) sans aucun appel à Notion. `signature` (signature_dossier)
+    invalide le cache quand les fichiers changent ; les sessions qui le
+    demandent en même temps partagent une seule lecture.
+    """
+    return VOLS_CHARGEMENT.executer(("dossier", dossier, signature), charger_snapshot, dossier)
+
+def charger_donnees(saison_filtre_selection, jours_anti_repetition, debut_planning=None):
+    """
+    (dataframes, index ou None) de la source choisie dans la barre latérale :
+    dossier local, ou dernier instantané Notion (index déjà construits). Un
+    planning qui commence avant aujourd'hui a son propre instantané, dont
+    l'historique précède sa première date.
+    """
+    if st.session_state.get("source_donnees") == SOURCE_DOSSIER:
+        dossier = st.session_state.get("dossier_donnees") or DOSSIER_DONNEES_DEFAUT
+        return load_local_data(dossier, signature_dossier(dossier)), None
+    if debut_planning is not None:
+        debut_planning = pd.Timestamp(debut_planning).normalize()
+        if pd.isna(debut_planning) or debut_planning >= pd.Timestamp(datetime.now()).normalize():
+            debut_planning = None
+    instantane = rafraichisseur_notion(saison_filtre_selection, jours_anti_repetition, debut_planning).instantane()
+    return instantane["dataframes"], instantane["donnees_indexees"]
+
 def main():
     st.set_page_config(layout="wide", page_title="Générateur de Menus et Liste de Courses")
     st.title("🍽️ Générateur de Menus et Liste de Courses")
@@ -1214,6 +2406,8 @@ def main():
             st.session_state['TEMPS_MAX_EXPRESS'] = TEMPS_MAX_EXPRESS_DEFAULT
         if 'TEMPS_MAX_RAPIDE' not in st.session_state:
             st.session_state['TEMPS_MAX_RAPIDE'] = TEMPS_MAX_RAPIDE_DEFAULT
+        if 'GRAINE' not in st.session_state:
+            st.session_state['GRAINE'] = 0
 
         # Inputs pour les paramètres
         st.session_state['NB_JOURS_ANTI_REPETITION'] = st.number_input(
@@ -1247,6 +2441,15 @@ def main():
             value=st.session_state['TEMPS_MAX_RAPIDE'],
             key="input_temps_rapide"
         )
+        st.session_state['GRAINE'] = st.number_input(
+            "Graine (0 = menus différents à chaque génération)",
+            min_value=0,
+            step=1,
+            value=st.session_state['GRAINE'],
+            key="input_graine",
+            help="Avec la même graine, les mêmes données et le même planning, le menu généré est identique "
+                 "et relu depuis le cache disque."
+        )
 
         saison_actuelle = get_current_season()
         saisons_disponibles = ["Printemps", "Été", "Automne", "Hiver"]
@@ -1263,6 +2466,18 @@ def main():
         )
 
     st.sidebar.header("Fichiers de données")
+
+    st.sidebar.radio(
+        "Source des recettes, ingrédients et historique",
+        options=[SOURCE_NOTION, SOURCE_DOSSIER],
+        key="source_donnees",
+        help="Dossier local : Recettes, Menus, Ingredients et Ingredients_recettes exportés par Generateur.py "
+             "ou par `menus.py snapshot` (CSV, Parquet ou Arrow), sans appel à Notion."
+    )
+    if st.session_state["source_donnees"] == SOURCE_DOSSIER:
+        st.sidebar.text_input("Dossier des données", value=DOSSIER_DONNEES_DEFAUT, key="dossier_donnees")
+    else:
+        afficher_etat_rafraichissement(rafraichisseur_notion(saison_selectionnee, st.session_state['NB_JOURS_ANTI_REPETITION']))
     
     st.sidebar.info("Veuillez charger le fichier CSV pour le planning.")
     
@@ -1281,14 +2496,7 @@ def main():
 
     try:
         uploaded_files["Planning.csv"].seek(0)
-        df_planning = pd.read_csv(
-            uploaded_files["Planning.csv"],
-            encoding='utf-8',
-            sep=';',
-            parse_dates=['Date'],
-            dayfirst=True
-        )
-        dataframes["Planning"] = df_planning
+        dataframes["Planning"] = lire_planning(uploaded_files["Planning.csv"])
         st.sidebar.success("Planning.csv chargé avec succès.")
     except Exception as e:
         st.sidebar.error(f"Erreur lors du chargement de Planning.csv: {e}")
@@ -1314,21 +2522,22 @@ def main():
         
         saison_selectionnee = st.session_state.get("saison_filtre", get_current_season())
 
-        with st.spinner("Chargement des données Notion..."):
+        diagnostics = Diagnostics()
+        st.session_state['diagnostics'] = diagnostics
+
+        with st.spinner("Chargement des données..."):
             try:
-                notion_data = load_notion_data(saison_selectionnee)
+                with diagnostics.phase(PHASE_CHARGEMENT):
+                    notion_data, donnees_indexees = charger_donnees(saison_selectionnee, st.session_state['NB_JOURS_ANTI_REPETITION'],
+                                                                     dataframes["Planning"]["Date"].min())
                 dataframes.update(notion_data)
             except Exception as e:
-                st.error(f"Erreur lors de la récupération des données depuis Notion : {e}")
+                st.error(f"Erreur lors de la récupération des données ({st.session_state.get('source_donnees', SOURCE_NOTION)}) : {e}")
                 return
         
         with st.spinner("Vérification des colonnes..."):
             try:
-                verifier_colonnes(dataframes["Recettes"], [COLONNE_ID_RECETTE, COLONNE_NOM, COLONNE_TEMPS_TOTAL, COLONNE_AIME_PAS_PRINCIP, "Transportable", "Calories", "Proteines"], "Recettes")
-                verifier_colonnes(dataframes["Planning"], ["Date", "Participants", "Transportable", "Temps", "Nutrition"], "Planning.csv")
-                verifier_colonnes(dataframes["Menus"], ["Date", "Recette"], "Menus")
-                verifier_colonnes(dataframes["Ingredients"], [COLONNE_ID_INGREDIENT, "Nom", "Qte reste", "unité", "Intervalle"], "Ingredients")
-                verifier_colonnes(dataframes["Ingredients_recettes"], [COLONNE_ID_RECETTE, "Ingrédient ok", "Qté/pers_s"], "Ingredients_recettes")
+                verifier_donnees(dataframes)
             except ValueError as ve:
                 st.error(f"Erreur de données : {ve}")
                 return
@@ -1341,41 +2550,19 @@ def main():
                     "TEMPS_MAX_EXPRESS": st.session_state['TEMPS_MAX_EXPRESS'],
                     "TEMPS_MAX_RAPIDE": st.session_state['TEMPS_MAX_RAPIDE']
                 }
-
-                menu_generator_realiste = MenuGenerator(
-                    dataframes["Menus"],
-                    dataframes["Recettes"],
-                    dataframes["Planning"],
-                    dataframes["Ingredients"],
-                    dataframes["Ingredients_recettes"],
-                    ne_pas_decrementer_stock=False,
-                    params=params
-                )
-                df_menu_realiste, liste_courses_realiste = menu_generator_realiste.generer_menu(mode='realiste')
-                st.session_state['df_menu_realiste'] = df_menu_realiste
-                st.session_state['liste_courses_realiste'] = liste_courses_realiste
-
-                recettes_a_exclure = set(df_menu_realiste[df_menu_realiste['Recette_ID'].notna()]['Recette_ID'].astype(str).tolist())
-
-                menu_generator_alternatif = MenuGenerator(
-                    dataframes["Menus"],
-                    dataframes["Recettes"],
-                    dataframes["Planning"],
-                    dataframes["Ingredients"],
-                    dataframes["Ingredients_recettes"],
-                    ne_pas_decrementer_stock=True,
-                    params=params
-                )
-                df_menu_alternatif, liste_courses_alternatif = menu_generator_alternatif.generer_menu(mode='alternatif', exclure_recettes_ids=recettes_a_exclure)
-                st.session_state['df_menu_alternatif'] = df_menu_alternatif
-                st.session_state['liste_courses_alternatif'] = liste_courses_alternatif
+                st.session_state.update(generer_menus(dataframes, params, diagnostics=diagnostics, donnees_indexees=donnees_indexees,
+                                                     graine=st.session_state['GRAINE'] or None, cache=cache_resultats()))
                 
             except Exception as e:
                 st.error(f"Une erreur est survenue lors de la génération du menu : {e}")
                 return
 
         with st.spinner("Envoi du menu à Notion..."):
-            success, failure = add_menu_to_notion(st.session_state['df_menu_realiste'], ID_MENUS)
+            with diagnostics.phase(PHASE_ENVOI):
+                menus_crees = []
+                success, failure = add_menu_to_notion(st.session_state['df_menu_realiste'], secret_notion(CLE_ID_MENUS), menus_crees)
+                # Historique en mémoire à jour sans relire Notion : le prochain menu tient compte de celui-ci
+                RafraichisseurDonnees.ajouter_menus_partout(pd.DataFrame(menus_crees, columns=HDR_MENUS))
             if success > 0:
                 st.success(f"✅ Opération '1 clic' réussie ! {success} repas ont été ajoutés à votre base de données Notion 'Menus' !")
             if failure > 0:
@@ -1394,21 +2581,22 @@ def main():
         
         saison_selectionnee = st.session_state.get("saison_filtre", get_current_season())
 
-        with st.spinner("Chargement des données Notion..."):
+        diagnostics = Diagnostics()
+        st.session_state['diagnostics'] = diagnostics
+
+        with st.spinner("Chargement des données..."):
             try:
-                notion_data = load_notion_data(saison_selectionnee)
+                with diagnostics.phase(PHASE_CHARGEMENT):
+                    notion_data, donnees_indexees = charger_donnees(saison_selectionnee, st.session_state['NB_JOURS_ANTI_REPETITION'],
+                                                                     dataframes["Planning"]["Date"].min())
                 dataframes.update(notion_data)
             except Exception as e:
-                st.error(f"Erreur lors de la récupération des données depuis Notion : {e}")
+                st.error(f"Erreur lors de la récupération des données ({st.session_state.get('source_donnees', SOURCE_NOTION)}) : {e}")
                 return
 
         with st.spinner("Vérification des colonnes..."):
             try:
-                verifier_colonnes(dataframes["Recettes"], [COLONNE_ID_RECETTE, COLONNE_NOM, COLONNE_TEMPS_TOTAL, COLONNE_AIME_PAS_PRINCIP, "Transportable", "Calories", "Proteines"], "Recettes")
-                verifier_colonnes(dataframes["Planning"], ["Date", "Participants", "Transportable", "Temps", "Nutrition"], "Planning.csv")
-                verifier_colonnes(dataframes["Menus"], ["Date", "Recette"], "Menus")
-                verifier_colonnes(dataframes["Ingredients"], [COLONNE_ID_INGREDIENT, "Nom", "Qte reste", "unité", "Intervalle"], "Ingredients")
-                verifier_colonnes(dataframes["Ingredients_recettes"], [COLONNE_ID_RECETTE, "Ingrédient ok", "Qté/pers_s"], "Ingredients_recettes")
+                verifier_donnees(dataframes)
             except ValueError as ve:
                 st.error(f"Erreur de données : {ve}")
                 return
@@ -1421,34 +2609,8 @@ def main():
                     "TEMPS_MAX_EXPRESS": st.session_state['TEMPS_MAX_EXPRESS'],
                     "TEMPS_MAX_RAPIDE": st.session_state['TEMPS_MAX_RAPIDE']
                 }
-
-                menu_generator_realiste = MenuGenerator(
-                    dataframes["Menus"],
-                    dataframes["Recettes"],
-                    dataframes["Planning"],
-                    dataframes["Ingredients"],
-                    dataframes["Ingredients_recettes"],
-                    ne_pas_decrementer_stock=False,
-                    params=params
-                )
-                df_menu_realiste, liste_courses_realiste = menu_generator_realiste.generer_menu(mode='realiste')
-                st.session_state['df_menu_realiste'] = df_menu_realiste
-                st.session_state['liste_courses_realiste'] = liste_courses_realiste
-
-                recettes_a_exclure = set(df_menu_realiste[df_menu_realiste['Recette_ID'].notna()]['Recette_ID'].astype(str).tolist())
-
-                menu_generator_alternatif = MenuGenerator(
-                    dataframes["Menus"],
-                    dataframes["Recettes"],
-                    dataframes["Planning"],
-                    dataframes["Ingredients"],
-                    dataframes["Ingredients_recettes"],
-                    ne_pas_decrementer_stock=True,
-                    params=params
-                )
-                df_menu_alternatif, liste_courses_alternatif = menu_generator_alternatif.generer_menu(mode='alternatif', exclure_recettes_ids=recettes_a_exclure)
-                st.session_state['df_menu_alternatif'] = df_menu_alternatif
-                st.session_state['liste_courses_alternatif'] = liste_courses_alternatif
+                st.session_state.update(generer_menus(dataframes, params, diagnostics=diagnostics, donnees_indexees=donnees_indexees,
+                                                     graine=st.session_state['GRAINE'] or None, cache=cache_resultats()))
                 
             except Exception as e:
                 st.error(f"Une erreur est survenue lors de la génération du menu : {e}")
@@ -1469,6 +2631,7 @@ def main():
             df_menu_optimal = st.session_state['df_menu_realiste']
             df_menu_optimal_display = df_menu_optimal.drop(columns=['Recette_ID'])
             st.dataframe(df_menu_optimal_display, use_container_width=True)
+            afficher_remplacement_repas()
 
             csv_data_optimal = df_menu_optimal.to_csv(index=False, sep=';', encoding='utf-8-sig')
             st.download_button(
@@ -1478,6 +2641,14 @@ def main():
                 mime="text/csv",
                 use_container_width=True
             )
+            if st.session_state.get('journal_realiste'):
+                st.download_button(
+                    label="🧾 Télécharger le journal de génération (JSON)",
+                    data=json.dumps(st.session_state['journal_realiste'], ensure_ascii=False, indent=1),
+                    file_name="journal_menu_optimal.json",
+                    mime="application/json",
+                    use_container_width=True
+                )
             
             st.subheader("Liste de Courses Détaillée pour le Menu Optimal")
             if st.session_state['liste_courses_realiste']:
@@ -1536,6 +2707,56 @@ def main():
             else:
                 st.info("Aucun ingrédient manquant identifié pour la liste de courses alternative.")
 
+    afficher_diagnostics()
+
+def afficher_remplacement_repas():
+    """Remplace un repas du menu Optimal à partir des points de reprise, sans régénérer la semaine."""
+    generateur = st.session_state.get('generateur_realiste')
+    df_menu = st.session_state.get('df_menu_realiste')
+    if generateur is None or df_menu is None or df_menu.empty:
+        return
+    with st.expander("🔁 Remplacer un repas"):
+        index_repas = st.selectbox(
+            "Repas à remplacer",
+            options=list(range(len(df_menu))),
+            format_func=lambda i: f"{df_menu.iloc[i]['Date']} – {df_menu.iloc[i][COLONNE_NOM]}",
+            key="repas_a_remplacer"
+        )
+        noms = generateur.recette_manager.noms_recettes
+        recette_id = st.selectbox(
+            "Nouvelle recette",
+            options=[None] + sorted(noms, key=noms.get),
+            format_func=lambda rid: "Au choix du générateur" if rid is None else noms[rid],
+            key="recette_de_remplacement"
+        )
+        if st.button("Remplacer", key="bouton_remplacer_repas"):
+            df_menu, liste_courses = generateur.remplacer_repas(index_repas, recette_id)
+            st.session_state['df_menu_realiste'] = df_menu
+            st.session_state['liste_courses_realiste'] = liste_courses
+            st.session_state['journal_realiste'] = generateur.journal
+            st.rerun()
+
+def afficher_etat_rafraichissement(rafraichisseur):
+    try:
+        instantane = rafraichisseur.instantane(timeout=0)
+        st.sidebar.caption(f"Données Notion du {instantane['date']:%d/%m à %H:%M} (version {instantane['version']}).")
+    except TimeoutError:
+        st.sidebar.caption("Chargement des données Notion en arrière-plan…")
+    except RuntimeError as e:
+        st.sidebar.error(f"{e} Nouvel essai au prochain rafraîchissement.")
+    if st.sidebar.button("🔄 Rafraîchir les données Notion"):
+        rafraichisseur.demander_rafraichissement()
+
+def afficher_diagnostics():
+    """Panneau latéral : durées par phase et compteurs de la dernière génération."""
+    diagnostics = st.session_state.get('diagnostics')
+    with st.sidebar.expander("🩺 Diagnostics"):
+        if diagnostics is None:
+            st.caption("Aucune génération lancée dans cette session.")
+            return
+        st.dataframe(diagnostics.tableau_phases(), use_container_width=True, hide_index=True)
+        st.dataframe(diagnostics.tableau_compteurs(), use_container_width=True, hide_index=True)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
     main()
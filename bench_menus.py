@@ -0,0 +1,333 @@
+"""
+Banc d'essai hors ligne du générateur de menus.
+
+Un faux client Notion sert des bases synthétiques paginées (mêmes structures
+de propriétés que les vraies bases Recettes, Ingrédients, Ingrédients_recettes
+et Menus). On chronomètre les extractions, la construction des index, la
+génération des deux menus et la liste de courses pour plusieurs tailles.
+
+    python bench_menus.py                       # tailles S, M, L
+    python bench_menus.py --tailles S,XL --repetitions 5 --rapport bench.csv
+    python bench_menus.py --recettes 800 --ingredients 400 --liens 6000 --annees 4
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# ────── TAILLES PRÉDÉFINIES ─────────────────────────────────────
+TAILLES = {
+    "S":  dict(recettes=100,  ingredients=80,   liens=600,   annees=1),
+    "M":  dict(recettes=500,  ingredients=300,  liens=4000,  annees=3),
+    "L":  dict(recettes=2000, ingredients=1000, liens=16000, annees=8),
+    "XL": dict(recettes=5000, ingredients=2500, liens=40000, annees=15),
+}
+REPAS_PAR_JOUR = 2
+JOURS_PLANNING = 7
+
+ID_BASES = {
+    "notion_database_id_recettes": "bench-recettes",
+    "notion_database_id_menus": "bench-menus",
+    "notion_database_id_ingredients": "bench-ingredients",
+    "notion_database_id_ingredients_recettes": "bench-ingredients-recettes",
+}
+
+# ────── FAUX CLIENT NOTION ──────────────────────────────────────
+class _FakeDatabases:
+    def __init__(self, client):
+        self.client = client
+        self._selections = {}
+
+    def retrieve(self, database_id):
+        self.client._attendre()
+        proprietes = {}
+        for page in self.client.bases[database_id]:
+            for nom, prop in page["properties"].items():
+                proprietes.setdefault(nom, {"id": prop["id"], "type": prop["type"]})
+        return {"object": "database", "id": database_id, "properties": proprietes}
+
+    def _selection(self, database_id, filtre, tris):
+        """Pages filtrées et triées, mémorisées par requête (le curseur est un indice dans cette liste)."""
+        cle = (database_id, json.dumps(filtre, sort_keys=True), json.dumps(tris))
+        with self.client._verrou:
+            pages = self._selections.get(cle)
+        if pages is None:
+            pages = self.client.bases[database_id]
+            if filtre:
+                pages = [p for p in pages if self._respecte(p, filtre)]
+            for tri in reversed(tris or []):
+                pages = sorted(pages, key=lambda p: p[tri["timestamp"]], reverse=tri["direction"] == "descending")
+            with self.client._verrou:
+                self._selections[cle] = pages
+        return pages
+
+    @classmethod
+    def _respecte(cls, page, filtre):
+        """Filtres de date (on_or_after, before) et 'and' ; les autres conditions sont ignorées."""
+        if "and" in filtre:
+            return all(cls._respecte(page, f) for f in filtre["and"])
+        if filtre.get("timestamp") == "created_time":
+            date = pd.Timestamp(page["created_time"])
+            condition = {op: pd.Timestamp(valeur) for op, valeur in filtre["created_time"].items()}
+        elif "date" in filtre:
+            date = ((page["properties"].get(filtre["property"]) or {}).get("date") or {}).get("start")
+            condition = filtre["date"]
+        else:
+            return True
+        if date is None:
+            return False
+        if "on_or_after" in condition and date < condition["on_or_after"]:
+            return False
+        return not ("before" in condition and date >= condition["before"])
+
+    def query(self, database_id, start_cursor=None, page_size=100, filter_properties=None, filter=None, sorts=None, **kwargs):
+        self.client._attendre()
+        pages = self._selection(database_id, filter, sorts)
+        debut = int(start_cursor or 0)
+        fin = min(debut + page_size, len(pages))
+        resultats = pages[debut:fin]
+        if filter_properties:
+            ids = set(filter_properties)
+            resultats = [{**p, "properties": {nom: prop for nom, prop in p["properties"].items() if prop["id"] in ids}}
+                         for p in resultats]
+        taille = len(json.dumps(resultats))
+        with self.client._verrou:
+            self.client.octets_recus += taille
+        return {"object": "list", "results": resultats,
+                "has_more": fin < len(pages), "next_cursor": str(fin) if fin < len(pages) else None}
+
+class _FakeProperties:
+    def __init__(self, client):
+        self.client = client
+
+    def retrieve(self, page_id, property_id, start_cursor=None, page_size=100):
+        self.client._attendre()
+        prop = next(p for p in self.client.pages_par_id[page_id]["properties"].values() if p["id"] == property_id)
+        elements = prop.get("relation", [])
+        debut = int(start_cursor or 0)
+        fin = min(debut + page_size, len(elements))
+        return {"object": "list",
+                "results": [{"object": "property_item", "type": "relation", "relation": r} for r in elements[debut:fin]],
+                "has_more": fin < len(elements), "next_cursor": str(fin) if fin < len(elements) else None}
+
+class _FakePages:
+    def __init__(self, client):
+        self.client = client
+        self.properties = _FakeProperties(client)
+
+    def create(self, parent, properties):
+        self.client._attendre()
+        page = {"id": f"cree-{len(self.client.pages_creees)}", "properties": properties}
+        self.client.pages_creees.append(page)
+        return page
+
+class FakeNotion:
+    """Remplace notion_client.Client : bases en mémoire et latence simulée par requête."""
+    def __init__(self, bases, latence_s=0.0):
+        self.bases = bases
+        self.latence_s = latence_s
+        self._verrou = threading.Lock()
+        self.nb_requetes = 0
+        self.octets_recus = 0  # taille JSON des résultats de requêtes
+        self.pages_creees = []
+        self.pages_par_id = {p["id"]: p for pages in bases.values() for p in pages}
+        origine = datetime(2020, 1, 1)
+        for pages in bases.values():
+            for n, page in enumerate(pages):
+                page.setdefault("created_time", (origine + timedelta(minutes=n)).strftime("%Y-%m-%dT%H:%M:%S.000Z"))
+        self.databases = _FakeDatabases(self)
+        self.pages = _FakePages(self)
+
+    def _attendre(self):
+        with self._verrou:  # parcours partitionnés : appels concurrents
+            self.nb_requetes += 1
+        if self.latence_s:
+            time.sleep(self.latence_s)
+
+# ────── DONNÉES SYNTHÉTIQUES (FORMAT NOTION) ────────────────────
+def _titre(texte):
+    return {"id": "title", "type": "title", "title": [{"plain_text": texte}]}
+
+def _relation(prop_id, ids):
+    return {"id": prop_id, "type": "relation", "relation": [{"id": i} for i in ids], "has_more": False}
+
+def _page_recette(rng, i):
+    return {"id": f"rec-{i:05d}", "properties": {
+        "Nom_plat": _titre(f"{rng.choice(['Gratin', 'Salade', 'Soupe', 'Curry', 'Tarte', 'Poêlée', 'Risotto'])} {i}"),
+        "ID_Recette": {"id": "uid", "type": "unique_id", "unique_id": {"prefix": "REC", "number": i}},
+        "Saison": {"id": "sais", "type": "multi_select", "multi_select": [{"name": "Toute l'année"}]},
+        "Calories Recette": {"id": "cal", "type": "rollup", "rollup": {"type": "number", "number": rng.randint(200, 1100)}},
+        "Proteines Recette": {"id": "prot", "type": "rollup", "rollup": {"type": "number", "number": rng.randint(5, 60)}},
+        "Temps_total": {"id": "tps", "type": "formula", "formula": {"type": "number", "number": rng.choice([10, 15, 20, 25, 30, 45, 60, 90])}},
+        "Aime_pas_princip": {"id": "aime", "type": "rollup", "rollup": {"type": "array", "array": [
+            {"type": "formula", "formula": {"type": "string", "string": code}} for code in rng.sample(["A", "B2", "C", "D"], rng.choice([0, 0, 0, 1]))]}},
+        "Type_plat": {"id": "type", "type": "multi_select", "multi_select": [{"name": rng.choice(["Plat", "Salade", "Soupe"])}]},
+        "Transportable": {"id": "trsp", "type": "select", "select": {"name": "Oui"} if rng.random() < 0.4 else None},
+        "Elément parent": {"id": "par", "type": "relation", "relation": [], "has_more": False},
+        # Propriétés présentes dans la vraie base mais jamais lues par l'extraction
+        "Ingrédients": _relation("ingr", [f"lien-{rng.randrange(10 ** 6):06d}" for _ in range(rng.randint(3, 12))]),
+        "Instructions": {"id": "instr", "type": "rich_text", "rich_text": [{"plain_text": "Étape. " * rng.randint(10, 60)}]},
+        "Coût": {"id": "cout", "type": "rollup", "rollup": {"type": "array", "array": [
+            {"type": "number", "number": round(rng.uniform(0.1, 5), 2)} for _ in range(rng.randint(3, 12))]}},
+    }}
+
+def _page_ingredient(rng, j):
+    qte = rng.choice([0, 0, rng.randint(1, 500)])
+    return {"id": f"ing-{j:05d}", "properties": {
+        "Nom": _titre(f"Ingrédient {j}"),
+        "Type de stock": {"id": "ts", "type": "select", "select": {"name": "Autre type"}},
+        "unité": {"id": "u", "type": "select", "select": {"name": rng.choice(["gr", "pc", "ml", "cl", "tranches"])}},
+        "Qte reste": {"id": "qr", "type": "formula", "formula": {"type": "number", "number": qte}},
+        "Intervalle": {"id": "int", "type": "number", "number": rng.choice([None] * 8 + [7, 14])},
+    }}
+
+def _page_lien(rng, k, nb_recettes, nb_ingredients):
+    return {"id": f"lien-{k:06d}", "properties": {
+        "Elément parent": _relation("par", [f"rec-{k % nb_recettes:05d}"]),
+        "Qté/pers_s": {"id": "qps", "type": "number", "number": round(rng.uniform(0.5, 150), 1)},
+        "Ingrédient ok": _relation("iok", [f"ing-{rng.randrange(nb_ingredients):05d}"]),
+        "Type de stock f": {"id": "tsf", "type": "formula", "formula": {"type": "string", "string": "Autre type"}},
+    }}
+
+def _page_menu(rng, n, date, nb_recettes):
+    recettes = [f"rec-{rng.randrange(nb_recettes):05d}" for _ in range(1 if rng.random() < 0.9 else 2)]
+    return {"id": f"menu-{n:06d}", "properties": {
+        "Nom Menu": _titre(f"Menu {n}"),
+        "Recette": _relation("rec", recettes),
+        "Date": {"id": "date", "type": "date", "date": {"start": date.strftime("%Y-%m-%d")}},
+    }}
+
+def generer_bases(recettes, ingredients, liens, annees, graine=0, date_fin=None):
+    rng = random.Random(graine)
+    date_fin = date_fin or datetime(2026, 1, 1)
+    debut = date_fin - timedelta(days=365 * annees)
+    menus = [_page_menu(rng, n, debut + timedelta(days=n // REPAS_PAR_JOUR), recettes)
+             for n in range(365 * annees * REPAS_PAR_JOUR)]
+    return {
+        ID_BASES["notion_database_id_recettes"]: [_page_recette(rng, i) for i in range(recettes)],
+        ID_BASES["notion_database_id_ingredients"]: [_page_ingredient(rng, j) for j in range(ingredients)],
+        ID_BASES["notion_database_id_ingredients_recettes"]: [_page_lien(rng, k, recettes, ingredients) for k in range(liens)],
+        ID_BASES["notion_database_id_menus"]: menus,
+    }
+
+def generer_planning(date_debut, jours=JOURS_PLANNING, graine=0):
+    rng = random.Random(graine)
+    lignes = []
+    for n in range(jours * REPAS_PAR_JOUR):
+        date = date_debut + timedelta(days=n // REPAS_PAR_JOUR, hours=12 if n % 2 == 0 else 19)
+        lignes.append({
+            "Date": date,
+            "Participants": "B" if n % 4 == 2 else rng.choice(["A, B2", "A, B2, C", "A"]),
+            "Transportable": "oui" if n % 4 == 0 else "",
+            "Temps": rng.choice(["", "", "express", "rapide"]),
+            "Nutrition": rng.choice(["", "équilibré"]),
+        })
+    return pd.DataFrame(lignes)
+
+# ────── IMPORT DU MOTEUR ────────────────────────────────────────
+def importer_moteur():
+    """Le faux client remplace notion_commun.notion ; les IDs de bases passent par l'environnement."""
+    for cle, valeur in ID_BASES.items():
+        os.environ[cle.upper()] = valeur
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import Generateur_menus
+    return Generateur_menus
+
+# ────── MESURES ─────────────────────────────────────────────────
+PARAMS_BENCH = {
+    "NB_JOURS_ANTI_REPETITION": 42,
+    "REPAS_EQUILIBRE": 700,
+    "TEMPS_MAX_EXPRESS": 20,
+    "TEMPS_MAX_RAPIDE": 30,
+}
+GRAINE_BENCH = 0  # générations identiques d'une passe à l'autre
+
+def _chrono(fonction, *args, **kwargs):
+    debut = time.perf_counter()
+    resultat = fonction(*args, **kwargs)
+    return resultat, time.perf_counter() - debut
+
+def mesurer(G, taille, latence_s=0.0):
+    """Une passe complète ; renvoie {étape: secondes}."""
+    import notion_commun
+    bases = generer_bases(**taille)
+    notion_commun.notion = FakeNotion(bases, latence_s=latence_s)
+    mesures = {}
+
+    df_menus, mesures["extract_menus"] = _chrono(G.extract_menus)
+    df_recettes, mesures["extract_recettes"] = _chrono(G.extract_recettes, "Automne")
+    df_ingredients, mesures["extract_ingredients"] = _chrono(G.extract_ingredients)
+    df_ir, mesures["extract_ingr_rec"] = _chrono(G.extract_ingr_rec)
+    mesures["requetes_notion"] = notion_commun.notion.nb_requetes
+    mesures["Ko reçus"] = notion_commun.notion.octets_recus / 1024
+
+    _, mesures["RecetteManager"] = _chrono(G.RecetteManager, df_recettes, df_ingredients, df_ir)
+
+    df_planning = generer_planning(datetime(2026, 1, 5))
+    diag_realiste = G.Diagnostics()
+    generateur, mesures["MenuGenerator (réaliste)"] = _chrono(
+        G.MenuGenerator, df_menus, df_recettes, df_planning, df_ingredients, df_ir,
+        ne_pas_decrementer_stock=False, params=PARAMS_BENCH, diagnostics=diag_realiste, graine=GRAINE_BENCH)
+    (df_menu, _), mesures["generer_menu (réaliste)"] = _chrono(generateur.generer_menu, mode="realiste")
+    mesures["liste de courses (réaliste)"] = diag_realiste.durees[G.PHASE_COURSES]
+
+    exclues = set(df_menu[df_menu["Recette_ID"].notna()]["Recette_ID"].astype(str))
+    diag_alternatif = G.Diagnostics()
+    generateur = G.MenuGenerator(df_menus, df_recettes, df_planning, df_ingredients, df_ir,
+                                 ne_pas_decrementer_stock=True, params=PARAMS_BENCH, diagnostics=diag_alternatif,
+                                 graine=GRAINE_BENCH)
+    _, mesures["generer_menu (alternatif)"] = _chrono(generateur.generer_menu, mode="alternatif", exclure_recettes_ids=exclues)
+    mesures["liste de courses (alternatif)"] = diag_alternatif.durees[G.PHASE_COURSES]
+    return mesures
+
+def executer(tailles, repetitions=3, latence_s=0.0, pause_pagination=False):
+    G = importer_moteur()
+    if not pause_pagination:
+        import notion_commun
+        notion_commun.PAUSE_PAGINATION_S = 0
+    lignes = []
+    for nom_taille, taille in tailles.items():
+        passes = [mesurer(G, taille, latence_s) for _ in range(repetitions)]
+        for etape in passes[0]:
+            valeurs = [p[etape] for p in passes]
+            lignes.append({"Taille": nom_taille, **taille, "Étape": etape,
+                           "Médiane": statistics.median(valeurs), "Min": min(valeurs), "Max": max(valeurs)})
+        print(f"✔ taille {nom_taille} mesurée ({repetitions} passe(s))", file=sys.stderr)
+    return pd.DataFrame(lignes)
+
+def _tailles_depuis_args(args):
+    if args.recettes:
+        return {"perso": dict(recettes=args.recettes, ingredients=args.ingredients,
+                              liens=args.liens, annees=args.annees)}
+    return {nom: TAILLES[nom] for nom in args.tailles.split(",")}
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai hors ligne du générateur de menus.")
+    parser.add_argument("--tailles", default="S,M,L", help=f"tailles prédéfinies parmi {', '.join(TAILLES)}")
+    parser.add_argument("--recettes", type=int, help="taille personnalisée : nombre de recettes")
+    parser.add_argument("--ingredients", type=int, default=300)
+    parser.add_argument("--liens", type=int, default=4000)
+    parser.add_argument("--annees", type=int, default=3)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--latence", type=float, default=0.0, help="latence simulée par requête Notion (s)")
+    parser.add_argument("--pause-pagination", action="store_true", help="conserver la pause entre pages de paginate")
+    parser.add_argument("--rapport", help="fichier CSV où écrire le rapport")
+    args = parser.parse_args()
+
+    rapport = executer(_tailles_depuis_args(args), args.repetitions, args.latence, args.pause_pagination)
+    tableau = rapport.pivot_table(index="Étape", columns="Taille", values="Médiane", sort=False)
+    with pd.option_context("display.float_format", "{:.4f}".format, "display.width", 160):
+        print(tableau)
+    if args.rapport:
+        rapport.to_csv(args.rapport, index=False, sep=";", encoding="utf-8-sig")
+        print(f"Rapport écrit dans {args.rapport}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
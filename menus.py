@@ -0,0 +1,244 @@
+"""
+Ligne de commande du générateur de menus (sans interface Streamlit).
+
+    python menus.py snapshot --out snapshot/ [--saison Automne] [--format arrow]
+    python menus.py generate --planning Planning.csv --snapshot snapshot/ --out menu.csv
+                             [--courses courses.csv] [--alternatif menu_alt.csv]
+                             [--journal journal.json] [--reprendre journal.json]
+    python menus.py horizon --planning semaine_type.csv --semaines 4 --snapshot snapshot/ --out menu.csv
+                            [--courses-dir courses/] [--reassorts reassorts.json]
+    python menus.py batch --snapshot snapshot/ --jobs jobs.json --out-dir resultats/ [--processus 4]
+    python menus.py serve --snapshot snapshot/ [--port 8000] [--concurrence 2]
+
+Sans --snapshot, les données sont lues directement dans Notion ; les
+identifiants viennent des variables d'environnement (NOTION_API_KEY,
+NOTION_DATABASE_ID_RECETTES, ...) ou de .streamlit/secrets.toml.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+import pandas as pd
+
+import Generateur_menus as moteur
+
+
+def _ajouter_params(parser):
+    defaut = moteur.params_par_defaut()
+    parser.add_argument("--anti-repetition", type=int, default=defaut["NB_JOURS_ANTI_REPETITION"],
+                        help="délai entre menus identiques (jours)")
+    parser.add_argument("--repas-equilibre", type=int, default=defaut["REPAS_EQUILIBRE"],
+                        help="calories max pour un repas 'équilibré'")
+    parser.add_argument("--temps-express", type=int, default=defaut["TEMPS_MAX_EXPRESS"])
+    parser.add_argument("--temps-rapide", type=int, default=defaut["TEMPS_MAX_RAPIDE"])
+    parser.add_argument("--graine", type=int, default=None, help="graine aléatoire (menus reproductibles)")
+
+
+def _params(args):
+    return {
+        "NB_JOURS_ANTI_REPETITION": args.anti_repetition,
+        "REPAS_EQUILIBRE": args.repas_equilibre,
+        "TEMPS_MAX_EXPRESS": args.temps_express,
+        "TEMPS_MAX_RAPIDE": args.temps_rapide,
+    }
+
+
+def _ecrire_csv(df, chemin):
+    df.to_csv(chemin, index=False, sep=";", encoding="utf-8-sig")
+
+
+def _ecrire_journal(journal, chemin):
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(journal, f, ensure_ascii=False, indent=1)
+
+
+def commande_snapshot(args):
+    donnees = moteur.extraire_donnees_notion(args.saison)
+    moteur.ecrire_snapshot(donnees, args.out, format_fichiers=args.format)
+    for nom, df in donnees.items():
+        print(f"{nom}: {len(df)} lignes", file=sys.stderr)
+
+
+def commande_generate(args):
+    df_planning = moteur.lire_planning(args.planning)
+    if args.snapshot:
+        dataframes = moteur.charger_snapshot(args.snapshot)
+    else:
+        dataframes = moteur.extraire_donnees_notion(args.saison, jours_anti_repetition=args.anti_repetition,
+                                                    debut_planning=df_planning["Date"].min())
+    dataframes["Planning"] = df_planning
+    moteur.verifier_donnees(dataframes)
+
+    journal = None
+    if args.reprendre:
+        with open(args.reprendre, encoding="utf-8") as f:
+            journal = json.load(f)
+    cache = moteur.CacheResultatsDisque(args.cache) if args.cache else None
+    resultat = moteur.generer_menus(dataframes, _params(args), journal_realiste=journal, graine=args.graine,
+                                    cache=cache, avec_generateurs=False)
+    _ecrire_csv(resultat["df_menu_realiste"], args.out)
+    if args.courses:
+        _ecrire_csv(pd.DataFrame(resultat["liste_courses_realiste"]), args.courses)
+    if args.alternatif:
+        _ecrire_csv(resultat["df_menu_alternatif"], args.alternatif)
+    if args.journal:
+        _ecrire_journal(resultat["journal_realiste"], args.journal)
+    print(f"{len(resultat['df_menu_realiste'])} repas écrits dans {args.out}", file=sys.stderr)
+
+
+def commande_horizon(args):
+    """
+    reassorts.json : liste de {"date": "2026-01-19", "ingredients": {"<id ingrédient>": qte, ...}}.
+    """
+    df_planning = moteur.lire_planning(args.planning)
+    if args.snapshot:
+        dataframes = moteur.charger_snapshot(args.snapshot)
+    else:
+        dataframes = moteur.extraire_donnees_notion(args.saison, jours_anti_repetition=args.anti_repetition,
+                                                    debut_planning=df_planning["Date"].min())
+    dataframes["Planning"] = df_planning
+    moteur.verifier_donnees(dataframes)
+    reassorts = None
+    if args.reassorts:
+        with open(args.reassorts, encoding="utf-8") as f:
+            reassorts = json.load(f)
+
+    resultat = moteur.generer_horizon(dataframes, _params(args), args.semaines, reassorts=reassorts, graine=args.graine)
+    _ecrire_csv(resultat["df_menu"], args.out)
+    if args.courses_dir:
+        os.makedirs(args.courses_dir, exist_ok=True)
+        for semaine in resultat["listes_courses_par_semaine"]:
+            _ecrire_csv(pd.DataFrame(semaine["liste_courses"]),
+                        os.path.join(args.courses_dir, f"courses_{semaine['semaine']}.csv"))
+    print(f"{len(resultat['df_menu'])} repas sur {args.semaines} semaines écrits dans {args.out}", file=sys.stderr)
+
+
+def _erreur_job(job):
+    """Message d'erreur d'un job mal formé, None s'il est lisible."""
+    if not isinstance(job, dict):
+        return "le job doit être un objet JSON"
+    if not isinstance(job.get("planning"), str) or not job["planning"]:
+        return "'planning' (chemin du CSV) manquant ou invalide"
+    return None
+
+
+def commande_batch(args):
+    """
+    jobs.json : liste de {"id": "...", "planning": "Planning.csv",
+    "stock": {"<id ingrédient>": qte, ...}, "params": {"REPAS_EQUILIBRE": 650, ...},
+    "graine": 42}.
+    Les chemins de planning sont relatifs au fichier jobs.json. Un job mal
+    formé est signalé en échec sans arrêter les autres.
+    """
+    with open(args.jobs, encoding="utf-8") as f:
+        jobs = json.load(f)
+    if not isinstance(jobs, list):
+        sys.exit(f"{args.jobs} : une liste de jobs est attendue")
+    if args.snapshot:
+        dataframes = moteur.charger_snapshot(args.snapshot)
+    else:
+        dataframes = moteur.extraire_donnees_notion(args.saison)
+    base = os.path.dirname(os.path.abspath(args.jobs))
+    resultats, valides = {}, []
+    for numero, job in enumerate(jobs, 1):
+        erreur = _erreur_job(job)
+        if erreur:
+            id_job = job.get("id", f"#{numero}") if isinstance(job, dict) else f"#{numero}"
+            resultats[numero] = {"id": id_job, "ok": False, "erreur": erreur}
+        else:
+            valides.append((numero, {**job, "planning": os.path.join(base, job["planning"])}))
+    lot = moteur.generer_menus_lot(dataframes, [job for _, job in valides], processus=args.processus)
+    resultats.update(zip((numero for numero, _ in valides), lot))
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    echecs = 0
+    for numero in sorted(resultats):
+        resultat = resultats[numero]
+        if not resultat["ok"]:
+            echecs += 1
+            print(f"{resultat['id']}: échec ({resultat['erreur']})", file=sys.stderr)
+            continue
+        prefixe = os.path.join(args.out_dir, str(resultat["id"]))
+        _ecrire_csv(resultat["df_menu_realiste"], f"{prefixe}_menu.csv")
+        _ecrire_csv(pd.DataFrame(resultat["liste_courses_realiste"]), f"{prefixe}_courses.csv")
+        _ecrire_csv(resultat["df_menu_alternatif"], f"{prefixe}_alternatif.csv")
+        _ecrire_journal(resultat["journal_realiste"], f"{prefixe}_journal.json")
+        print(f"{resultat['id']}: {len(resultat['df_menu_realiste'])} repas", file=sys.stderr)
+    if echecs:
+        sys.exit(1)
+
+
+def commande_serve(args):
+    import serveur_menus  # starlette / uvicorn : seulement pour le serveur
+
+    if args.snapshot:
+        charger = lambda: moteur.charger_snapshot(args.snapshot)
+    else:
+        charger = lambda: moteur.extraire_donnees_notion(args.saison)
+    serveur_menus.servir(charger, hote=args.hote, port=args.port, concurrence=args.concurrence)
+
+
+def construire_parser():
+    parser = argparse.ArgumentParser(prog="menus", description="Générateur de menus et liste de courses.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="logs DEBUG")
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    p_snap = sous.add_parser("snapshot", help="exporter les bases Notion dans un dossier de CSV ou Arrow")
+    p_snap.add_argument("--out", required=True, help="dossier de sortie")
+    p_snap.add_argument("--format", choices=moteur.FORMATS_SNAPSHOT, default="csv",
+                        help="arrow : fichiers binaires typés, relus par projection mémoire (pyarrow)")
+    p_snap.add_argument("--saison", default=moteur.get_current_season())
+    p_snap.set_defaults(fonction=commande_snapshot)
+
+    p_gen = sous.add_parser("generate", help="générer le menu d'un planning")
+    p_gen.add_argument("--planning", required=True, help="Planning.csv (séparateur ';')")
+    p_gen.add_argument("--snapshot", help="dossier du snapshot, CSV ou Arrow (sinon lecture Notion)")
+    p_gen.add_argument("--out", required=True, help="CSV du menu Optimal")
+    p_gen.add_argument("--courses", help="CSV de la liste de courses du menu Optimal")
+    p_gen.add_argument("--alternatif", help="CSV du menu Alternatif")
+    p_gen.add_argument("--journal", help="JSON du journal (décisions et stock) du menu Optimal")
+    p_gen.add_argument("--reprendre", help="journal à rejouer avant de générer les repas restants")
+    p_gen.add_argument("--cache", help="dossier du cache des résultats (utilisé avec --graine)")
+    p_gen.add_argument("--saison", default=moteur.get_current_season())
+    _ajouter_params(p_gen)
+    p_gen.set_defaults(fonction=commande_generate)
+
+    p_hor = sous.add_parser("horizon", help="planifier plusieurs semaines d'un planning type, stock reporté")
+    p_hor.add_argument("--planning", required=True, help="planning type d'une semaine (séparateur ';')")
+    p_hor.add_argument("--semaines", type=int, default=4, help=f"nombre de semaines (1 à {moteur.HORIZON_MAX_SEMAINES})")
+    p_hor.add_argument("--snapshot", help="dossier du snapshot, CSV ou Arrow (sinon lecture Notion)")
+    p_hor.add_argument("--out", required=True, help="CSV du menu")
+    p_hor.add_argument("--courses-dir", help="dossier des listes de courses hebdomadaires")
+    p_hor.add_argument("--reassorts", help="JSON des réassorts (date, ingrédients)")
+    p_hor.add_argument("--saison", default=moteur.get_current_season())
+    _ajouter_params(p_hor)
+    p_hor.set_defaults(fonction=commande_horizon)
+
+    p_lot = sous.add_parser("batch", help="générer les menus de plusieurs foyers (index partagés)")
+    p_lot.add_argument("--jobs", required=True, help="fichier JSON décrivant les jobs")
+    p_lot.add_argument("--snapshot", help="dossier du snapshot, CSV ou Arrow (sinon lecture Notion)")
+    p_lot.add_argument("--out-dir", required=True, help="dossier des résultats (<id>_menu.csv, ...)")
+    p_lot.add_argument("--processus", type=int, default=None, help="taille du pool (1 = séquentiel)")
+    p_lot.add_argument("--saison", default=moteur.get_current_season())
+    p_lot.set_defaults(fonction=commande_batch)
+
+    p_srv = sous.add_parser("serve", help="serveur HTTP local (POST /generate, POST /shopping-list)")
+    p_srv.add_argument("--snapshot", help="dossier du snapshot, CSV ou Arrow (sinon lecture Notion au démarrage)")
+    p_srv.add_argument("--hote", default="127.0.0.1")
+    p_srv.add_argument("--port", type=int, default=8000)
+    p_srv.add_argument("--concurrence", type=int, default=2, help="générations simultanées max")
+    p_srv.add_argument("--saison", default=moteur.get_current_season())
+    p_srv.set_defaults(fonction=commande_serve)
+    return parser
+
+
+def main(argv=None):
+    args = construire_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format=moteur.LOG_FORMAT)
+    args.fonction(args)
+
+
+if __name__ == "__main__":
+    main()
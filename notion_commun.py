@@ -0,0 +1,403 @@
+"""
+Accès Notion partagé par l'application (Generateur_menus.py) et l'export CSV
+(Generateur.py) : client HTTP unique, pagination avec reprise, parcours
+partitionnés et relations complètes. Ne dépend de Streamlit que pour les
+secrets et le cache du client.
+"""
+import os
+import json
+import hashlib
+import importlib.util
+import threading
+import logging
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+import time, httpx
+import pandas as pd
+import streamlit as st
+from notion_client import Client
+from notion_client.errors import RequestTimeoutError, APIResponseError, APIErrorCode
+
+logger = logging.getLogger(__name__)
+
+# ────── CONFIGURATION NOTION ────────────────────────────────────
+# Les secrets et le client sont lus à la première utilisation : le module
+# s'importe sans runtime Streamlit (CLI, tâches planifiées, benchmarks).
+CLE_API_KEY = "notion_api_key"
+CLE_ID_RECETTES = "notion_database_id_recettes"
+CLE_ID_MENUS = "notion_database_id_menus"
+CLE_ID_INGREDIENTS = "notion_database_id_ingredients"
+CLE_ID_INGREDIENTS_RECETTES = "notion_database_id_ingredients_recettes"
+BATCH_SIZE, MAX_RETRY, WAIT_S = 50, 3, 5
+PAUSE_PAGINATION_S = 0.3
+MAX_WORKERS_PARTITIONS = 4  # parcours partitionnés simultanés (voir partitions_date_creation)
+# Transport HTTP partagé : pool de connexions keep-alive, HTTP/2 si NOTION_HTTP2=1 et h2 installé
+NOTION_TIMEOUT_S = 60
+NOTION_MAX_CONNEXIONS = 10
+NOTION_KEEPALIVE_S = 60
+notion = None
+
+def secret_notion(cle):
+    """Variable d'environnement en majuscules (ex. NOTION_API_KEY) si définie, sinon st.secrets."""
+    return os.environ.get(cle.upper()) or st.secrets[cle]
+
+@st.cache_resource(show_spinner=False)
+def client_notion_partage(cle_api):
+    """
+    Client Notion unique par clé et par processus, partagé par toutes les
+    sessions Streamlit, Generateur.py et les threads de chargement/envoi
+    (httpx.Client est thread-safe).
+    """
+    http2 = os.environ.get("NOTION_HTTP2") == "1"
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("NOTION_HTTP2=1 mais le paquet h2 n'est pas installé : HTTP/1.1 utilisé.")
+        http2 = False
+    transport = httpx.Client(
+        http2=http2,
+        timeout=httpx.Timeout(NOTION_TIMEOUT_S),
+        limits=httpx.Limits(
+            max_connections=NOTION_MAX_CONNEXIONS,
+            max_keepalive_connections=NOTION_MAX_CONNEXIONS,
+            keepalive_expiry=NOTION_KEEPALIVE_S,
+        ),
+    )
+    return Client(auth=cle_api, client=transport, timeout_ms=NOTION_TIMEOUT_S * 1000)
+
+def get_notion_client():
+    global notion
+    if notion is None:
+        notion = client_notion_partage(secret_notion(CLE_API_KEY))
+    return notion
+
+# ────── PROJECTION DES PROPRIÉTÉS (filter_properties) ───────────
+# Sans projection, Notion renvoie toutes les propriétés de chaque page
+# (rollups, formules, relations…), y compris celles qu'aucune extraction ne
+# lit. Chaque extraction déclare les propriétés dont elle a besoin ; leurs
+# identifiants sont résolus une fois par base à partir du schéma, puis
+# envoyés dans `filter_properties`.
+_SCHEMAS_BASES = {}
+_VERROU_SCHEMAS = threading.Lock()
+
+def ids_proprietes(db_id, noms, client=None):
+    """
+    Identifiants des propriétés `noms` de la base `db_id` (schéma lu une
+    seule fois par processus). None si le schéma est illisible : la requête
+    se fait alors sans projection.
+    """
+    with _VERROU_SCHEMAS:
+        schema = _SCHEMAS_BASES.get(db_id)
+    if schema is None:
+        client = client or get_notion_client()
+        try:
+            proprietes = client.databases.retrieve(database_id=db_id)["properties"]
+        except (RequestTimeoutError, httpx.TimeoutException, APIResponseError) as e:
+            logger.warning(f"Schéma de la base {db_id} illisible, requête sans projection : {e}")
+            return None
+        schema = {nom: prop["id"] for nom, prop in proprietes.items()}
+        with _VERROU_SCHEMAS:
+            _SCHEMAS_BASES[db_id] = schema
+    absentes = [nom for nom in noms if nom not in schema]
+    if absentes:
+        logger.warning(f"Propriété(s) absente(s) de la base {db_id} : {', '.join(absentes)}")
+    return [schema[nom] for nom in noms if nom in schema]
+
+# ────── AJOUT DES FONCTIONS D'EXTRACTION NOTION ─────────────────
+# Les pages de requêtes sont espacées d'au moins PAUSE_PAGINATION_S pour tout
+# le processus (parcours partitionnés en parallèle compris).
+_VERROU_DEBIT = threading.Lock()
+_prochaine_requete = 0.0
+
+def _attendre_tour():
+    global _prochaine_requete
+    with _VERROU_DEBIT:
+        maintenant = time.monotonic()
+        attente = _prochaine_requete - maintenant
+        _prochaine_requete = max(maintenant, _prochaine_requete) + PAUSE_PAGINATION_S
+    if attente > 0:
+        time.sleep(attente)
+
+# ────── REPRISE DES PARCOURS INTERROMPUS ────────────────────────
+# Chaque page reçue est ajoutée à un journal sur disque (une ligne JSON :
+# pages et curseur suivant), propre à la base et à la requête. Si le
+# parcours échoue (timeouts répétés, erreur API, arrêt du processus), le
+# parcours suivant de la même requête repart du dernier curseur au lieu de
+# la première page. Le journal est supprimé quand le parcours aboutit et
+# ignoré s'il n'a pas avancé depuis AGE_MAX_REPRISE_S.
+# Un seul parcours à la fois utilise un journal donné : il le réserve par un
+# fichier verrou créé de façon exclusive (os.O_EXCL, valable entre threads et
+# entre processus, Windows compris). Un parcours concurrent de la même
+# requête se fait sans journal. Le verrou est rafraîchi à chaque page ; un
+# verrou inchangé depuis AGE_MAX_VERROU_S (processus arrêté) est repris.
+DOSSIER_REPRISE_PARCOURS = os.path.join(".cache", "parcours")
+AGE_MAX_REPRISE_S = 3600
+AGE_MAX_VERROU_S = 600
+
+class PointReprise:
+    def __init__(self, db_id, requete, dossier=DOSSIER_REPRISE_PARCOURS):
+        cle = json.dumps([db_id, requete], sort_keys=True, ensure_ascii=False)
+        base = os.path.join(dossier, hashlib.sha256(cle.encode("utf-8")).hexdigest()[:24])
+        self.chemin, self.chemin_verrou = base + ".jsonl", base + ".verrou"
+        self.actif = False
+        os.makedirs(dossier, exist_ok=True)
+
+    def __enter__(self):
+        self.actif = self._reserver()
+        if not self.actif:
+            logger.info(f"Journal {self.chemin} utilisé par un autre parcours : parcours sans reprise.")
+        return self
+
+    def __exit__(self, *exc):
+        if self.actif:
+            self.actif = False
+            with suppress(OSError):
+                os.remove(self.chemin_verrou)
+
+    def _reserver(self):
+        for _ in range(2):
+            try:
+                fd = os.open(self.chemin_verrou, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.chemin_verrou) <= AGE_MAX_VERROU_S:
+                        return False
+                    os.remove(self.chemin_verrou)  # verrou abandonné
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def relire(self):
+        """(pages déjà reçues, curseur suivant), ou ([], None)."""
+        if not self.actif:
+            return [], None
+        try:
+            if time.time() - os.path.getmtime(self.chemin) > AGE_MAX_REPRISE_S:
+                self.effacer()
+                return [], None
+            with open(self.chemin, encoding="utf-8") as f:
+                lignes = f.readlines()
+        except FileNotFoundError:
+            return [], None
+        entrees = []
+        for ligne in lignes:
+            try:
+                entrees.append(json.loads(ligne))
+            except ValueError:  # dernière ligne tronquée par un arrêt brutal
+                with open(self.chemin, "w", encoding="utf-8") as f:
+                    f.writelines(lignes[:len(entrees)])
+                break
+        if not entrees:
+            return [], None
+        return [page for entree in entrees for page in entree["pages"]], entrees[-1]["curseur"]
+
+    def ajouter(self, pages, curseur):
+        if not self.actif:
+            return
+        with open(self.chemin, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"pages": pages, "curseur": curseur}, ensure_ascii=False) + "\n")
+        with suppress(OSError):
+            os.utime(self.chemin_verrou)
+
+    def effacer(self):
+        if not self.actif:
+            return
+        with suppress(FileNotFoundError):
+            os.remove(self.chemin)
+
+class ParcoursIncomplet(RuntimeError):
+    """Parcours arrêté avant sa dernière page (timeouts répétés, erreur API) ; `pages` : pages déjà reçues."""
+    def __init__(self, message, pages):
+        super().__init__(message)
+        self.pages = pages
+
+def _parcourir(client, db_id, kwargs):
+    with PointReprise(db_id, kwargs) as reprise:
+        out, cur = reprise.relire()
+        repris, retry = cur is not None, 0
+        if repris:
+            logger.info(f"Reprise du parcours de la base {db_id} : {len(out)} page(s) déjà reçue(s).")
+        while True:
+            try:
+                _attendre_tour()
+                resp = client.databases.query(database_id=db_id,
+                                              start_cursor=cur,
+                                              page_size=BATCH_SIZE,
+                                              **kwargs)
+                out.extend(resp["results"])
+                repris = False
+                if not resp["has_more"]:
+                    reprise.effacer()
+                    break
+                cur = resp["next_cursor"]
+                reprise.ajouter(resp["results"], cur)
+                retry = 0
+            except (RequestTimeoutError, httpx.TimeoutException, httpx.ReadTimeout):
+                retry += 1
+                if retry > MAX_RETRY:
+                    # Appelé depuis des threads sans contexte Streamlit : journal et exception, l'appelant affiche
+                    message = f"Base {db_id} : timeout répété, parcours interrompu (le prochain chargement reprendra à cette page)."
+                    logger.error(message)
+                    raise ParcoursIncomplet(message, out)
+                time.sleep(WAIT_S * retry)
+            except APIResponseError as e:
+                if repris:
+                    # Curseur refusé (expiré, base modifiée) : on repart de la première page
+                    logger.warning(f"Reprise impossible pour la base {db_id} ({e}) : parcours complet.")
+                    reprise.effacer()
+                    out, cur, repris = [], None, False
+                    continue
+                message = f"Base {db_id} : erreur API, parcours interrompu : {e}"
+                logger.error(message)
+                raise ParcoursIncomplet(message, out) from e
+    return out
+
+def _et(*filtres):
+    """Conjonction de filtres Notion, à plat (Notion limite l'imbrication à deux niveaux)."""
+    conditions = []
+    for filtre in filtres:
+        if filtre:
+            conditions.extend(filtre["and"] if "and" in filtre else [filtre])
+    return conditions[0] if len(conditions) == 1 else {"and": conditions}
+
+def paginate(db_id, proprietes=None, partitions=None, **kwargs):
+    """
+    `proprietes` : noms des propriétés à renvoyer (toutes si None).
+    `partitions` : filtres disjoints (voir partitions_date_creation) combinés
+    au filtre de la requête ; chaque partition est parcourue dans son propre
+    thread et les pages sont fusionnées, sans doublon d'id.
+    Lève ParcoursIncomplet si un parcours s'arrête avant sa dernière page :
+    aucun appelant ne reçoit une base tronquée.
+    """
+    client = get_notion_client()
+    if proprietes:
+        ids = ids_proprietes(db_id, proprietes, client)
+        if ids:
+            kwargs["filter_properties"] = ids
+    if not partitions:
+        return _parcourir(client, db_id, kwargs)
+
+    filtre = kwargs.pop("filter", None)
+    requetes = [{**kwargs, "filter": _et(filtre, partition)} for partition in partitions]
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS_PARTITIONS, len(requetes))) as executor:
+        resultats = list(executor.map(lambda requete: _parcourir(client, db_id, requete), requetes))
+    out, vus = [], set()
+    for pages in resultats:
+        for page in pages:
+            if page["id"] not in vus:
+                vus.add(page["id"])
+                out.append(page)
+    return out
+
+# ────── PARCOURS PARTITIONNÉ ────────────────────────────────────
+# La pagination par curseur est séquentielle : pour une grande base, on
+# découpe la requête en tranches de date de création (immuable, donc
+# tranches disjointes) parcourues en parallèle. Les bornes sont arrondies à
+# la minute, précision des created_time de Notion.
+
+def _date_creation_extreme(client, db_id, direction, filtre):
+    _attendre_tour()
+    requete = {"sorts": [{"timestamp": "created_time", "direction": direction}], "page_size": 1}
+    if filtre:
+        requete["filter"] = filtre
+    resp = client.databases.query(database_id=db_id, **requete)
+    return resp["results"][0]["created_time"] if resp["results"] else None, resp["has_more"]
+
+def partitions_date_creation(db_id, nb_partitions, filtre=None):
+    """
+    `nb_partitions` filtres created_time couvrant toute la base (première et
+    dernière tranches ouvertes), ou None si la base tient en une page ou si
+    ses bornes sont illisibles.
+    """
+    client = get_notion_client()
+    try:
+        premiere, plusieurs = _date_creation_extreme(client, db_id, "ascending", filtre)
+        if premiere is None or not plusieurs:
+            return None
+        derniere, _ = _date_creation_extreme(client, db_id, "descending", filtre)
+    except (RequestTimeoutError, httpx.TimeoutException, APIResponseError) as e:
+        logger.warning(f"Bornes de création de la base {db_id} illisibles, parcours séquentiel : {e}")
+        return None
+    debut = pd.Timestamp(premiere)
+    pas = (pd.Timestamp(derniere) - debut) / nb_partitions
+    if nb_partitions < 2 or pas <= pd.Timedelta(0):
+        return None
+    bornes = sorted({(debut + pas * i).floor("min") for i in range(1, nb_partitions)} - {debut.floor("min")})
+    if not bornes:
+        return None
+    bornes = [borne.isoformat() for borne in bornes]
+    partitions = [{"timestamp": "created_time", "created_time": {"before": bornes[0]}}]
+    partitions += [_et({"timestamp": "created_time", "created_time": {"on_or_after": a}},
+                       {"timestamp": "created_time", "created_time": {"before": b}})
+                   for a, b in zip(bornes, bornes[1:])]
+    partitions.append({"timestamp": "created_time", "created_time": {"on_or_after": bornes[-1]}})
+    return partitions
+
+# ────── RELATIONS TRONQUÉES (> 25 éléments) ──────────────────────
+# Dans les résultats d'une requête, Notion ne renvoie que les 25 premiers
+# éléments d'une relation (avec "has_more": true). La liste complète se lit
+# via l'endpoint de propriété de page, interrogé en parallèle pour toutes
+# les pages concernées. Ces appels passent par le même espacement que les
+# requêtes de pagination ; une réponse rate_limited (429) est réessayée
+# après le délai Retry-After.
+MAX_WORKERS_RELATIONS = 4
+
+def _delai_limite(e, retry):
+    """Attente avant de réessayer après un 429 : Retry-After si fourni, sinon WAIT_S * retry."""
+    try:
+        return float(e.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return WAIT_S * retry
+
+def _lire_relation_complete(client, page_id, prop_id):
+    ids, cur, retry = [], None, 0
+    while True:
+        try:
+            _attendre_tour()
+            resp = client.pages.properties.retrieve(page_id=page_id,
+                                                    property_id=prop_id,
+                                                    start_cursor=cur,
+                                                    page_size=100)
+            ids.extend(it["relation"]["id"] for it in resp["results"] if it.get("type") == "relation")
+            if not resp.get("has_more"):
+                return ids
+            cur = resp["next_cursor"]
+            retry = 0
+        except (RequestTimeoutError, httpx.TimeoutException, httpx.ReadTimeout):
+            retry += 1
+            if retry > MAX_RETRY:
+                raise
+            time.sleep(WAIT_S * retry)
+        except APIResponseError as e:
+            if e.code != APIErrorCode.RateLimited:
+                raise
+            retry += 1
+            if retry > MAX_RETRY:
+                raise
+            time.sleep(_delai_limite(e, retry))
+
+def completer_relations(pages, nom_prop, client=None):
+    """Complète en place les relations tronquées de `nom_prop` et renvoie `pages`."""
+    client = client or get_notion_client()
+    tronquees = [p for p in pages
+                 if (p["properties"].get(nom_prop) or {}).get("type") == "relation"
+                 and p["properties"][nom_prop].get("has_more")]
+    if not tronquees:
+        return pages
+    logger.info(f"{len(tronquees)} relation(s) '{nom_prop}' tronquée(s) : lecture complète en parallèle.")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS_RELATIONS) as executor:
+        futures = {
+            executor.submit(_lire_relation_complete, client, p["id"], p["properties"][nom_prop]["id"]): p
+            for p in tronquees
+        }
+        for future, page in futures.items():
+            prop = page["properties"][nom_prop]
+            try:
+                prop["relation"] = [{"id": rel_id} for rel_id in future.result()]
+                prop["has_more"] = False
+            except (RequestTimeoutError, httpx.TimeoutException, APIResponseError) as e:
+                # On garde les 25 premiers éléments plutôt que d'abandonner l'extraction
+                logger.error(f"Relation '{nom_prop}' incomplète pour la page {page['id']} : {e}")
+    return pages
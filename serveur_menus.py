@@ -0,0 +1,186 @@
+"""
+Petit serveur HTTP local (ASGI, Starlette + uvicorn) autour du moteur de
+Generateur_menus.py. Les bases sont chargées et indexées une seule fois au
+démarrage puis gardées en mémoire ; chaque requête ne fait que la génération.
+
+    python menus.py serve --snapshot snapshot/ [--port 8000] [--concurrence 2]
+
+    POST /generate       {"planning": [...], "params": {...}, "stock": {...}, "graine": 42, "alternatif": true}
+    POST /shopping-list  {"planning": [...], "params": {...}, "stock": {...}, "graine": 42}
+    GET  /health
+
+"planning" est une liste de repas {"Date": "2026-01-05 12:00", "Participants":
+"A, B2, C", "Transportable": "", "Temps": "", "Nutrition": ""} (dates ISO).
+Avec une "graine", une requête déjà traitée (mêmes données, planning,
+paramètres) est servie depuis un cache en mémoire. Au-delà de `concurrence`
+générations simultanées, les requêtes attendent leur
+tour ; la génération tourne dans un thread pour ne pas bloquer la boucle.
+"""
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+
+import pandas as pd
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import Generateur_menus as moteur
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCE_DEFAUT = 2
+
+
+class RequeteInvalide(ValueError):
+    pass
+
+
+def _planning_depuis_json(lignes):
+    if not isinstance(lignes, list) or not lignes:
+        raise RequeteInvalide("'planning' doit être une liste non vide de repas")
+    df = pd.DataFrame(lignes)
+    moteur.verifier_colonnes(df, moteur.COLONNES_ATTENDUES["Planning"], "planning")
+    try:
+        df["Date"] = pd.to_datetime(df["Date"], format="ISO8601")
+    except (ValueError, TypeError) as e:
+        raise RequeteInvalide(f"Date de planning invalide : {e}")
+    return df.fillna("")
+
+
+def _enregistrements(df):
+    """DataFrame → liste de dicts JSON (NaN → null)."""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _objet(corps, cle):
+    """Champ optionnel `cle` du corps, qui doit être un objet JSON ({} si absent ou null)."""
+    valeur = corps.get(cle)
+    if valeur is None:
+        return {}
+    if not isinstance(valeur, dict):
+        raise RequeteInvalide(f"'{cle}' doit être un objet JSON")
+    return valeur
+
+
+def _graine(corps):
+    graine = corps.get("graine")
+    if graine is not None and (isinstance(graine, bool) or not isinstance(graine, int) or graine < 0):
+        raise RequeteInvalide("'graine' doit être un entier positif ou null")
+    return graine
+
+
+def _params(corps):
+    """Paramètres par défaut complétés par ceux du corps : clés connues, valeurs numériques positives."""
+    params = moteur.params_par_defaut()
+    for cle, valeur in _objet(corps, "params").items():
+        if cle not in params:
+            raise RequeteInvalide(f"paramètre inconnu : '{cle}' (attendus : {', '.join(params)})")
+        if isinstance(valeur, bool) or not isinstance(valeur, (int, float)) or not math.isfinite(valeur) or valeur < 0:
+            raise RequeteInvalide(f"le paramètre '{cle}' doit être un nombre positif")
+        params[cle] = valeur
+    return params
+
+
+def _booleen(corps, cle, defaut):
+    valeur = corps.get(cle, defaut)
+    if not isinstance(valeur, bool):
+        raise RequeteInvalide(f"'{cle}' doit être true ou false")
+    return valeur
+
+
+def _generer(donnees_indexees, cache, corps, alternatif):
+    params = _params(corps)
+    diagnostics = moteur.Diagnostics()
+    resultat = moteur.generer_menus(
+        {"Planning": _planning_depuis_json(corps.get("planning"))}, params,
+        diagnostics=diagnostics, donnees_indexees=donnees_indexees,
+        stock_overrides=_objet(corps, "stock") or None, alternatif=alternatif,
+        graine=_graine(corps), cache=cache, avec_generateurs=False
+    )
+    resultat["diagnostics"] = {nom: round(duree * 1000, 1) for nom, duree in diagnostics.durees.items()}
+    return resultat
+
+
+def creer_app(charger_donnees, concurrence=CONCURRENCE_DEFAUT):
+    """
+    `charger_donnees` : fonction sans argument renvoyant les quatre tables
+    (Recettes, Menus, Ingredients, Ingredients_recettes), appelée une fois au
+    démarrage.
+    """
+    @asynccontextmanager
+    async def lifespan(app):
+        debut = time.perf_counter()
+        dataframes = await run_in_threadpool(charger_donnees)
+        moteur.verifier_donnees(dataframes)
+        app.state.donnees = await run_in_threadpool(moteur.DonneesIndexees.depuis_dataframes, dataframes)
+        app.state.limite = asyncio.Semaphore(concurrence)
+        app.state.cache = moteur.CacheResultats()
+        logger.info("Index chargés en %.2fs (%d recettes).", time.perf_counter() - debut,
+                    len(app.state.donnees.recette_manager.ids_recettes))
+        yield
+
+    async def executer(request, alternatif=None):
+        try:
+            corps = await request.json()
+        except ValueError:
+            return JSONResponse({"erreur": "corps JSON invalide"}, status_code=400)
+        if not isinstance(corps, dict):
+            return JSONResponse({"erreur": "le corps doit être un objet JSON"}, status_code=400)
+        if alternatif is None:
+            try:
+                alternatif = _booleen(corps, "alternatif", True)
+            except RequeteInvalide as e:
+                return JSONResponse({"erreur": str(e)}, status_code=400)
+        debut = time.perf_counter()
+        async with request.app.state.limite:
+            try:
+                resultat = await run_in_threadpool(_generer, request.app.state.donnees, request.app.state.cache, corps, alternatif)
+            except (ValueError, TypeError) as e:  # RequeteInvalide, colonnes manquantes, valeurs mal typées
+                return JSONResponse({"erreur": str(e)}, status_code=400)
+        resultat["duree_ms"] = round((time.perf_counter() - debut) * 1000, 1)
+        resultat["alternatif"] = alternatif
+        return resultat
+
+    async def generate(request):
+        resultat = await executer(request)
+        if isinstance(resultat, JSONResponse):
+            return resultat
+        reponse = {
+            "menu": _enregistrements(resultat["df_menu_realiste"]),
+            "liste_courses": resultat["liste_courses_realiste"],
+            "journal": resultat["journal_realiste"],
+            "diagnostics": resultat["diagnostics"],
+            "duree_ms": resultat["duree_ms"],
+        }
+        if resultat["alternatif"]:
+            reponse["menu_alternatif"] = _enregistrements(resultat["df_menu_alternatif"])
+            reponse["liste_courses_alternatif"] = resultat["liste_courses_alternatif"]
+            reponse["journal_alternatif"] = resultat["journal_alternatif"]
+        return JSONResponse(reponse)
+
+    async def shopping_list(request):
+        resultat = await executer(request, alternatif=False)
+        if isinstance(resultat, JSONResponse):
+            return resultat
+        return JSONResponse({"liste_courses": resultat["liste_courses_realiste"], "duree_ms": resultat["duree_ms"]})
+
+    async def health(request):
+        return JSONResponse({"ok": True, "recettes": len(request.app.state.donnees.recette_manager.ids_recettes)})
+
+    return Starlette(
+        routes=[
+            Route("/generate", generate, methods=["POST"]),
+            Route("/shopping-list", shopping_list, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def servir(charger_donnees, hote="127.0.0.1", port=8000, concurrence=CONCURRENCE_DEFAUT):
+    uvicorn.run(creer_app(charger_donnees, concurrence), host=hote, port=port, log_level="info")